@@ -5,23 +5,34 @@ hacomono APIを使用した予約システムのバックエンドAPI
 """
 
 import os
+import re
+import secrets
+import sys
 import json
 import logging
 import hashlib
 import hmac
+import threading
+import time
+from bisect import bisect_right
 from datetime import datetime, timedelta, timezone
-from functools import wraps
+from functools import wraps, lru_cache
+from operator import itemgetter
 from pathlib import Path
+from urllib.parse import quote, urlencode
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from collections import Counter, defaultdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from dotenv import load_dotenv
 load_dotenv()
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, has_request_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import requests
+from urllib3.util.retry import Retry
 import boto3
 from botocore.exceptions import ClientError
 
@@ -35,6 +46,20 @@ except ImportError:
     logger = logging.getLogger(__name__)
     # Note: logger might not be available at import time
 
+# レスポンス圧縮（未インストール時は無圧縮で返す）
+try:
+    from flask_compress import Compress
+    COMPRESS_AVAILABLE = True
+except ImportError:
+    COMPRESS_AVAILABLE = False
+
+# 高速JSONシリアライザ（未インストール時は標準のjsonを使用）
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 from hacomono_client import (
     HacomonoClient,
     HacomonoAPIError,
@@ -49,9 +74,67 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """orjsonでシリアライズするFlask JSONプロバイダ
+    
+    jsonify() / request.get_json() をそのまま高速化する。
+    datetime等はFlask標準と同じ形式で出力するため default() に委譲し、
+    orjsonで扱えない値（64bit超の整数など）は標準のjsonにフォールバックする。
+    """
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if ORJSON_AVAILABLE else 0
+
+    def _orjson_dumps(self, obj) -> bytes:
+        return orjson.dumps(obj, default=self.default, option=self.ORJSON_OPTIONS)
+
+    def dumps(self, obj, **kwargs) -> str:
+        try:
+            return self._orjson_dumps(obj).decode("utf-8")
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = self._orjson_dumps(obj)
+        except TypeError:
+            return super().response(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
 # Flask アプリケーション
 app = Flask(__name__)
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
 app.json.ensure_ascii = False  # 日本語をUnicodeエスケープしない
+app.json.sort_keys = False  # キーのソートを省略（orjsonと同じく挿入順で出力）
+app.json.compact = True  # 整形用の空白を出力しない（スケジュール系の大きなレスポンス向け）
+
+
+def _json_dumps_bytes(obj) -> bytes:
+    """JSONをbytesで返す（orjson利用時はstrへの変換を省略）"""
+    if isinstance(app.json, OrjsonProvider):
+        try:
+            return app.json._orjson_dumps(obj)
+        except TypeError:
+            pass
+    return app.json.dumps(obj).encode("utf-8")
+
+
+class _LazyJsonLog:
+    """ログが実際に出力されるときだけJSON文字列化する（logger の %s 引数として渡す）"""
+    __slots__ = ("_obj",)
+    
+    def __init__(self, obj):
+        self._obj = obj  # dict などのオブジェクト、またはシリアライズ済みのJSON（bytes）
+    
+    def __str__(self) -> str:
+        data = self._obj if isinstance(self._obj, bytes) else _json_dumps_bytes(self._obj)
+        return data.decode("utf-8")
+
 
 # 会員登録時のデフォルト生年月日（空文字の場合は送信しない）
 MEMBER_DEFAULT_BIRTHDAY = os.environ.get("MEMBER_DEFAULT_BIRTHDAY", "").strip()
@@ -61,55 +144,320 @@ CORS(app,
      origins=os.environ.get("CORS_ORIGINS", "*").split(","),
      supports_credentials=True,
      allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
+     expose_headers=["X-Happle-Included"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 
+# レスポンス圧縮（スケジュール系のJSONは同じキーの繰り返しが多く、圧縮効果が大きい）
+if COMPRESS_AVAILABLE:
+    app.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+    app.config["COMPRESS_ALGORITHM_STREAMING"] = ["br", "deflate"]  # ストリーミング返却（choice-schedule-range）用
+    app.config["COMPRESS_MIN_SIZE"] = 2048  # 小さいレスポンスは圧縮しない
+    Compress(app)
+
 # hacomono クライアント（遅延初期化）
 _hacomono_client = None
+_hacomono_client_lock = threading.Lock()
 
 
 def get_hacomono_client() -> HacomonoClient:
-    """hacomonoクライアントを取得（シングルトン）"""
+    """hacomonoクライアントを取得（シングルトン）
+    
+    トークン・HTTPセッション・レート制限を全リクエストで共有するため、
+    起動直後の同時アクセスでも1つだけ作成する。
+    """
     global _hacomono_client
     if _hacomono_client is None:
-        _hacomono_client = HacomonoClient.from_env()
+        with _hacomono_client_lock:
+            if _hacomono_client is None:
+                _hacomono_client = HacomonoClient.from_env()
     return _hacomono_client
 
 
+# バックグラウンド実行用スレッドプール（レスポンスに結果を使わない外部送信をリクエストスレッドから切り離す）
+_background_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="background")
+
+# リクエストを同時に処理するスレッド数（gunicorn の --threads と合わせる）
+# リクエスト内で並列に発行する取得用のプールは「同時リクエスト数 × 1リクエストの並列数」で確保し、
+# 同時に来たリクエストが互いの取得待ちの後ろに並ばないようにする
+WORKER_THREADS = int(os.environ.get("WORKER_THREADS", "8"))
+
+# スケジュール取得用スレッドプール（hacomonoへの独立した問い合わせを並列に発行する。1リクエストで2件）
+_schedule_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("SCHEDULE_EXECUTOR_MAX_WORKERS", WORKER_THREADS * 2)),
+    thread_name_prefix="schedule"
+)
+
+# 予約作成用スレッドプール（レッスンに紐づくプログラム・スペース・予約済み席・店舗を並列に取得する。1リクエストで最大4件）
+_reservation_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("RESERVATION_EXECUTOR_MAX_WORKERS", WORKER_THREADS * 4)),
+    thread_name_prefix="reservation"
+)
+
+
+def run_in_background(func, *args, **kwargs):
+    """関数をバックグラウンドスレッドで実行（例外はログに記録して握りつぶす）"""
+    def run():
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f"Background task {func.__name__} failed: {e}")
+    return _background_executor.submit(run)
+
+
 # キャッシュ: スタッフのスタジオ紐付け情報
 _instructor_studio_map_cache = None
-_instructor_studio_map_cache_time = None
+_instructor_studio_map_cache_time = None  # 取得した時刻（time.monotonic()）
+_instructor_studio_map_refresh_lock = threading.Lock()  # 期限切れ時の再取得を1スレッドに限定する
 INSTRUCTOR_CACHE_TTL_SECONDS = 60  # 60秒間キャッシュ
+_instructor_studio_map_failure_time = None  # 取得に失敗した時刻（time.monotonic()）
+INSTRUCTOR_CACHE_FAILURE_TTL_SECONDS = 10  # 失敗後10秒間は再取得しない（hacomono障害時のリトライ集中を防ぐ）
+_instructor_studio_sets_cache = (None, {})  # (元の紐付け情報, { instructor_id: frozenset(studio_ids) })
+
+
+class InstructorStudioMapUnavailableError(Exception):
+    """スタッフのスタジオ紐付け情報を取得できない（空の紐付け＝全店舗対応可能と誤判定しないために送出）"""
+    pass
 
 # キャッシュ: 設備情報（同時予約可能数を含む）- 店舗ごとにキャッシュ
 _resources_cache_by_studio: dict = {}  # { studio_id: { resource_id: {...} } }
-_resources_cache_time_by_studio: dict = {}  # { studio_id: datetime }
+_resources_cache_time_by_studio: dict = {}  # { studio_id: time.monotonic() }
 RESOURCES_CACHE_TTL_SECONDS = 300  # 5分間キャッシュ（設備情報は頻繁に変わらない）
 
+# キャッシュ: メールアドレス → 既存会員ID（登録済みと分かったメールアドレスのみ保持）
+# メールアドレスはそのまま保持せず、プロセスごとのランダム鍵で正規化後のアドレスをハッシュしたキーで持つ
+_member_id_by_email_cache: dict = {}  # { email_key: member_id }
+_member_id_by_email_cache_time: dict = {}  # { email_key: time.monotonic() }
+_member_id_by_email_cache_lock = threading.Lock()  # 複数スレッドからの読み書き・破棄を直列化する
+_member_email_cache_key = secrets.token_bytes(32)
+MEMBER_EMAIL_CACHE_TTL_SECONDS = 300  # 5分間キャッシュ
+MEMBER_EMAIL_CACHE_MAX_ENTRIES = 4096
+
 # ==================== マスタデータキャッシュ ====================
 # 店舗一覧キャッシュ（ほとんど変わらない）
 _studios_cache = None
-_studios_cache_time = None
+_studios_cache_time = None  # time.monotonic()
 STUDIOS_CACHE_TTL_SECONDS = 600  # 10分間キャッシュ
 
 # プログラム一覧キャッシュ（店舗ごと）
 _programs_cache_by_studio: dict = {}  # { studio_id: [programs] }
-_programs_cache_time_by_studio: dict = {}  # { studio_id: datetime }
+_programs_cache_time_by_studio: dict = {}  # { studio_id: time.monotonic() }
 PROGRAMS_CACHE_TTL_SECONDS = 300  # 5分間キャッシュ
 
+# プログラム詳細キャッシュ（プログラムIDごと）
+_program_detail_cache: dict = {}  # { program_id: program }
+_program_detail_cache_time: dict = {}  # { program_id: time.monotonic() }
+PROGRAM_DETAIL_CACHE_TTL_SECONDS = 60  # 60秒間キャッシュ
+
+# スタッフ一覧キャッシュ（店舗ごと）
+_instructors_cache_by_studio: dict = {}  # { studio_id: [instructors] }
+_instructors_cache_time_by_studio: dict = {}  # { studio_id: time.monotonic() }
+INSTRUCTORS_CACHE_TTL_SECONDS = 60  # 60秒間キャッシュ
+
 # スタジオルーム一覧キャッシュ（店舗ごと）
 _studio_rooms_cache_by_studio: dict = {}  # { studio_id: [rooms] }
-_studio_rooms_cache_time_by_studio: dict = {}  # { studio_id: datetime }
+_studio_rooms_cache_time_by_studio: dict = {}  # { studio_id: time.monotonic() }
 STUDIO_ROOMS_CACHE_TTL_SECONDS = 300  # 5分間キャッシュ
 
+# スペース情報キャッシュ（予約可能なスペースIDと席数をまとめて保持）
+_studio_room_spaces_cache = None  # (reservable_space_ids, space_capacities)
+_studio_room_spaces_cache_time = None  # time.monotonic()
+_studio_room_spaces_refresh_lock = threading.Lock()  # 期限切れ時の再取得を1スレッドに限定する
+STUDIO_ROOM_SPACES_CACHE_TTL_SECONDS = 300  # 5分間キャッシュ
+
 # 自由枠スケジュールキャッシュ（room_id + date ごと）- 短時間キャッシュ
 _choice_schedule_cache: dict = {}  # { "room_id:date": schedule }
-_choice_schedule_cache_time: dict = {}  # { "room_id:date": datetime }
+_choice_schedule_cache_time: dict = {}  # { "room_id:date": time.monotonic() }
 CHOICE_SCHEDULE_CACHE_TTL_SECONDS = 900  # 15分間キャッシュ（GitHub Actions cronと同期）
 
 # choice-schedule-range キャッシュ（完全なレスポンス）
 _choice_schedule_range_cache: dict = {}  # { "room_id:from:to:program": response }
-_choice_schedule_range_cache_time: dict = {}  # { "room_id:from:to:program": datetime }
+_choice_schedule_range_cache_time: dict = {}  # { "room_id:from:to:program": time.monotonic() }
 CHOICE_SCHEDULE_RANGE_CACHE_TTL_SECONDS = 900  # 15分間キャッシュ
+CHOICE_SCHEDULE_RANGE_MAX_DAYS = 31  # 1リクエストで取得できる最大日数
+CHOICE_SCHEDULE_RANGE_MAX_WORKERS = 7  # 日付ごとのスケジュール取得の最大並列数
+_choice_schedule_range_body_cache: dict = {}  # { "room_id:from:to:program": (response, 日付ごとのシリアライズ済みJSON, ETag) }
+CHOICE_SCHEDULE_RANGE_LOCK_STRIPES = 64
+# キーのハッシュで選ぶ固定数のロック（同一キーの同時取得を1回にまとめる。クエリ文字列由来のキーでロックが増え続けないよう数を固定）
+_choice_schedule_range_locks = tuple(threading.Lock() for _ in range(CHOICE_SCHEDULE_RANGE_LOCK_STRIPES))
+
+# 予定ブロック・固定枠レッスンの短時間キャッシュ（同じ店舗・日付の閲覧や予約後のキャッシュ更新で取得を共有）
+_shift_slots_cache: dict = {}  # { "studio_id:date": [shift_slots] }
+_shift_slots_cache_time: dict = {}  # { "studio_id:date": time.monotonic() }
+SHIFT_SLOTS_CACHE_TTL_SECONDS = int(os.environ.get("SHIFT_SLOTS_CACHE_TTL_SECONDS", "60"))  # 60秒間キャッシュ
+SHIFT_SLOTS_CACHE_MAX_ENTRIES = 512
+_studio_lessons_cache: dict = {}  # { "studio_id:date_from:date_to": [lessons] }
+_studio_lessons_cache_time: dict = {}  # { "studio_id:date_from:date_to": time.monotonic() }
+STUDIO_LESSONS_CACHE_TTL_SECONDS = int(os.environ.get("STUDIO_LESSONS_CACHE_TTL_SECONDS", "60"))  # 60秒間キャッシュ
+STUDIO_LESSONS_CACHE_MAX_ENTRIES = 256
+SHIFT_SLOTS_FETCH_MAX_WORKERS = 4  # 日付ごとの予定ブロック取得の最大並列数
+
+
+# ==================== 日時パースヘルパー ====================
+
+# 日本時間（夏時間がないため固定オフセットで Asia/Tokyo と同じ。tzdata の有無にも依存しない）
+JST = timezone(timedelta(hours=9))
+
+if sys.version_info >= (3, 11):
+    # Python 3.11以降の fromisoformat は末尾の "Z" をそのまま解釈できる
+    _fromisoformat = datetime.fromisoformat
+else:
+    def _fromisoformat(value: str) -> datetime:
+        """ISO8601形式の日時文字列をパース（末尾の "Z" を "+00:00" として扱う）"""
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        return datetime.fromisoformat(value)
+
+
+def _parse_iso_datetime(value: str) -> datetime:
+    """ISO8601形式の日時文字列をパース（"Z"にも対応）"""
+    return _fromisoformat(value)
+
+
+@lru_cache(maxsize=4096)
+def _iso_to_timestamp(value: str) -> float:
+    """ISO8601形式の日時文字列をUNIX時刻（秒）に変換（時間帯の重なり判定を数値比較で行うため）"""
+    return _parse_iso_datetime(value).timestamp()
+
+
+def _shift_iso_minutes(value: str, delta_minutes: int) -> str:
+    """ISO8601形式の日時文字列を指定分だけずらして返す（出力は datetime.isoformat() と同じ形式）
+    
+    hacomonoの "YYYY-MM-DDTHH:MM:SS" + ("Z" | "+HH:MM") 形式は文字列の分解と整数演算だけで処理し、
+    それ以外の形式は datetime を経由して計算する。
+    """
+    length = len(value)
+    if ((length == 20 and value[19] == "Z") or (length == 25 and value[19] in "+-")) and \
+            value[10] == "T" and value[13] == ":" and value[16] == ":":
+        try:
+            hour = int(value[11:13])
+            minute = int(value[14:16])
+        except ValueError:
+            hour = minute = -1
+        if 0 <= hour < 24 and 0 <= minute < 60:
+            days, total_minutes = divmod(hour * 60 + minute + delta_minutes, 1440)
+            date_part = value[:10]
+            if days:
+                date_part = (datetime.fromisoformat(date_part) + timedelta(days=days)).strftime("%Y-%m-%d")
+            tz_suffix = "+00:00" if length == 20 else value[19:]
+            return f"{date_part}T{total_minutes // 60:02d}:{total_minutes % 60:02d}{value[16:19]}{tz_suffix}"
+    return (_parse_iso_datetime(value) + timedelta(minutes=delta_minutes)).isoformat()
+
+
+@lru_cache(maxsize=4096)
+def _fixed_slot_block_times(start_at_str: str, end_at_str: str) -> tuple:
+    """固定枠レッスンのスタッフブロック時間（前後インターバル込み）をISO文字列で返す
+    
+    キャッシュ更新ではプログラムごと・週ごとに同じレッスンを何度も処理するため、結果をメモ化する。
+    
+    Returns:
+        (blocked_start_iso, blocked_end_iso) のタプル
+    """
+    return (
+        _shift_iso_minutes(start_at_str, -FIXED_SLOT_BEFORE_INTERVAL_MINUTES),
+        _shift_iso_minutes(end_at_str, FIXED_SLOT_AFTER_INTERVAL_MINUTES)
+    )
+
+
+# ==================== 予定ブロックヘルパー ====================
+
+# 予約データに埋め込む種別文字列（全予約dictで同じ文字列オブジェクトを共有する）
+ENTITY_TYPE_INSTRUCTOR = "INSTRUCTOR"
+ENTITY_TYPE_RESOURCE = "RESOURCE"
+RESERVATION_TYPE_SHIFT_SLOT = "SHIFT_SLOT"
+RESERVATION_TYPE_FIXED_SLOT_LESSON = "FIXED_SLOT_LESSON"
+
+# 休憩ブロックとして扱う予約種別（大文字で比較。インターバルを付けずにそのままブロックする）
+_BLOCK_RESERVATION_TYPES = frozenset({"BREAK", "BLOCK", "REST", RESERVATION_TYPE_SHIFT_SLOT, "休憩", "ブロック"})
+
+
+def _is_block_reservation_type(reservation_type) -> bool:
+    """休憩ブロックの予約種別か判定
+    
+    hacomonoの値はほぼ大文字のため、そのまま一致しない小文字混じりの値だけ upper() して比較する
+    （通常予約の CHOICE などで毎回文字列を作らない）。
+    """
+    if not reservation_type:
+        return False
+    if reservation_type in _BLOCK_RESERVATION_TYPES:
+        return True
+    return not reservation_type.isupper() and reservation_type.upper() in _BLOCK_RESERVATION_TYPES
+
+
+def _split_shift_slot_reservations(shift_slots: list) -> tuple:
+    """予定ブロック（休憩ブロック）をスタッフ用・設備用の予約データに1回の走査で振り分ける
+    
+    Returns:
+        (instructor_reservations, resource_reservations) のタプル
+    """
+    reservations_by_type = {ENTITY_TYPE_INSTRUCTOR: [], ENTITY_TYPE_RESOURCE: []}
+    for slot in shift_slots:
+        entity_type = (slot.get("entity_type") or "").upper()
+        reservations = reservations_by_type.get(entity_type)
+        if reservations is None:
+            continue
+        reservations.append({
+            "entity_id": slot.get("entity_id"),
+            "entity_type": entity_type,
+            "start_at": slot.get("start_at"),
+            "end_at": slot.get("end_at"),
+            "reservation_type": RESERVATION_TYPE_SHIFT_SLOT,
+            "title": slot.get("title", ""),
+            "description": slot.get("description", "")
+        })
+    return reservations_by_type[ENTITY_TYPE_INSTRUCTOR], reservations_by_type[ENTITY_TYPE_RESOURCE]
+
+
+def _build_busy_intervals(reservations: list, before_minutes: int = 0, after_minutes: int = 0) -> dict:
+    """予約・休憩ブロックを entity_id ごとの埋まっている時間帯（UNIX時刻）にまとめる
+    
+    通常の予約はインターバル分（開始前 before_minutes・終了後 after_minutes）広げ、休憩ブロックはそのまま扱う。
+    重なる時間帯は結合して開始時刻順の重ならない区間にしておき、重なり判定を二分探索1回で行えるようにする。
+    
+    Returns:
+        { entity_id: (開始時刻のリスト, 終了時刻のリスト) }
+    """
+    intervals_by_entity = defaultdict(list)
+    before_seconds = before_minutes * 60
+    after_seconds = after_minutes * 60
+    for reserved in reservations:
+        reserved_start_str = reserved.get("start_at", "")
+        reserved_end_str = reserved.get("end_at", "")
+        if not reserved_start_str or not reserved_end_str:
+            continue
+        try:
+            reserved_start = _iso_to_timestamp(reserved_start_str)
+            reserved_end = _iso_to_timestamp(reserved_end_str)
+        except Exception as e:
+            logger.warning("Failed to parse reserved time: %s", e)
+            continue
+        if not _is_block_reservation_type(reserved.get("reservation_type")):
+            reserved_start -= before_seconds
+            reserved_end += after_seconds
+        intervals_by_entity[reserved.get("entity_id")].append((reserved_start, reserved_end))
+    
+    busy_intervals = {}
+    for entity_id, intervals in intervals_by_entity.items():
+        intervals.sort()
+        starts, ends = [], []
+        for reserved_start, reserved_end in intervals:
+            if ends and reserved_start <= ends[-1]:
+                # 直前の区間と重なる（接する）場合は結合する
+                if reserved_end > ends[-1]:
+                    ends[-1] = reserved_end
+            else:
+                starts.append(reserved_start)
+                # 終了が開始より前の不正なデータでも終了時刻のリストが昇順になるようにする
+                ends.append(max(reserved_start, reserved_end))
+        busy_intervals[entity_id] = (starts, ends)
+    return busy_intervals
+
+
+def _overlaps_busy_intervals(busy_intervals: tuple, start_ts: float, end_ts: float) -> bool:
+    """_build_busy_intervals の区間のいずれかが [start_ts, end_ts) と重なるか判定"""
+    starts, ends = busy_intervals
+    # start_ts より後に終わる最初の区間だけを見ればよい
+    index = bisect_right(ends, start_ts)
+    return index < len(starts) and starts[index] < end_ts
 
 
 # ==================== キャッシュ操作関数 ====================
@@ -150,6 +498,7 @@ def invalidate_choice_schedule_cache(studio_room_id: int, date: str) -> bool:
     for key in keys_to_delete:
         _choice_schedule_range_cache.pop(key, None)
         _choice_schedule_range_cache_time.pop(key, None)
+        _choice_schedule_range_body_cache.pop(key, None)
         logger.info(f"Invalidated range cache: {key}")
     
     if invalidated:
@@ -176,18 +525,15 @@ def refresh_choice_schedule_range_cache(client: HacomonoClient, studio_room_id:
     cache_key = f"{studio_room_id}:{date_from}:{date_to}:{program_id or 'none'}"
     
     # 日付リストを生成
-    start_date = datetime.strptime(date_from, "%Y-%m-%d")
-    end_date = datetime.strptime(date_to, "%Y-%m-%d")
+    start_date = datetime.fromisoformat(date_from)
+    end_date = datetime.fromisoformat(date_to)
     dates = []
     current = start_date
     while current <= end_date:
         dates.append(current.strftime("%Y-%m-%d"))
         current += timedelta(days=1)
     
-    # 1. スタッフのスタジオ紐付け情報を取得
-    instructor_studio_map = get_cached_instructor_studio_map(client)
-    
-    # 2. 各日付のchoice/scheduleを並列取得
+    # 2. 各日付のchoice/scheduleを並列取得（スタッフのスタジオ紐付け情報も同時に取得）
     schedules = {}
     actual_studio_id = None
     
@@ -206,7 +552,9 @@ def refresh_choice_schedule_range_cache(client: HacomonoClient, studio_room_id:
             logger.warning(f"Failed to get schedule for {date}: {e}")
             return date, None
     
-    with ThreadPoolExecutor(max_workers=7) as executor:
+    with ThreadPoolExecutor(max_workers=min(len(dates), CHOICE_SCHEDULE_RANGE_MAX_WORKERS) + 1) as executor:
+        # 1. スタッフのスタジオ紐付け情報を取得
+        instructor_studio_map_future = executor.submit(get_cached_instructor_studio_map, client)
         futures = {executor.submit(fetch_schedule, date): date for date in dates}
         for future in as_completed(futures):
             date, schedule_data = future.result()
@@ -214,125 +562,89 @@ def refresh_choice_schedule_range_cache(client: HacomonoClient, studio_room_id:
             if schedule_data and not actual_studio_id:
                 studio_room = schedule_data.get("studio_room_service", {})
                 actual_studio_id = studio_room.get("studio_id") if studio_room else None
+        instructor_studio_map = instructor_studio_map_future.result()
     
     # 3. 固定枠レッスンを範囲全体で1回だけ取得
-    fixed_slot_lessons_by_date = {date: [] for date in dates}
-    fixed_slot_reservations_by_date = {date: [] for date in dates}
+    dates_set = frozenset(dates)
+    fixed_slot_lessons_by_date = defaultdict(list)
+    fixed_slot_reservations_by_date = defaultdict(list)
     
-    if actual_studio_id:
+    def fetch_fixed_slot_lessons():
         try:
-            lessons_response = client.get_studio_lessons(
-                query={"studio_id": actual_studio_id},
-                date_from=date_from,
-                date_to=date_to,
-                fetch_all=True
-            )
-            lessons = lessons_response.get("data", {}).get("studio_lessons", {}).get("list", [])
+            # 予約後のキャッシュ更新ではプログラムごとに同じ範囲を取得するため、短時間キャッシュを共有する
+            lessons = get_cached_studio_lessons(client, actual_studio_id, date_from, date_to)
             
             for lesson in lessons:
                 start_at_str = lesson.get("start_at")
                 if not start_at_str:
                     continue
                 lesson_date = start_at_str[:10]
-                if lesson_date not in fixed_slot_lessons_by_date:
+                if lesson_date not in dates_set:
                     continue
                 
+                # レッスンのフィールドは1回だけ取り出して使い回す
+                end_at_str = lesson.get("end_at")
+                lesson_instructor_id = lesson.get("instructor_id")
+                lesson_instructor_ids = lesson.get("instructor_ids", [])
+                
                 fixed_slot_lessons_by_date[lesson_date].append({
                     "id": lesson.get("id"),
-                    "start_at": lesson.get("start_at"),
-                    "end_at": lesson.get("end_at"),
-                    "instructor_id": lesson.get("instructor_id"),
-                    "instructor_ids": lesson.get("instructor_ids", []),
+                    "start_at": start_at_str,
+                    "end_at": end_at_str,
+                    "instructor_id": lesson_instructor_id,
+                    "instructor_ids": lesson_instructor_ids,
                     "program_id": lesson.get("program_id"),
                     "studio_id": lesson.get("studio_id"),
                     "capacity": lesson.get("capacity", 0)
                 })
                 
-                instructor_ids = lesson.get("instructor_ids", [])
-                if not instructor_ids and lesson.get("instructor_id"):
-                    instructor_ids = [lesson.get("instructor_id")]
+                instructor_ids = [i for i in (lesson_instructor_ids or [lesson_instructor_id]) if i]
+                if not end_at_str or not instructor_ids:
+                    continue
                 
-                end_at_str = lesson.get("end_at")
-                if not end_at_str:
+                # ブロック時間はレッスンごとに1回だけ計算し、担当スタッフ全員で共有
+                try:
+                    blocked_start_iso, blocked_end_iso = _fixed_slot_block_times(start_at_str, end_at_str)
+                except Exception as e:
+                    logger.warning(f"Failed to parse lesson time: {e}")
                     continue
                 
-                for instructor_id in instructor_ids:
-                    if instructor_id:
-                        try:
-                            start_at = datetime.fromisoformat(start_at_str.replace("Z", "+00:00"))
-                            end_at = datetime.fromisoformat(end_at_str.replace("Z", "+00:00"))
-                            blocked_start = start_at - timedelta(minutes=FIXED_SLOT_BEFORE_INTERVAL_MINUTES)
-                            blocked_end = end_at + timedelta(minutes=FIXED_SLOT_AFTER_INTERVAL_MINUTES)
-                            
-                            fixed_slot_reservations_by_date[lesson_date].append({
-                                "entity_id": instructor_id,
-                                "entity_type": "INSTRUCTOR",
-                                "start_at": blocked_start.isoformat(),
-                                "end_at": blocked_end.isoformat(),
-                                "type": "FIXED_SLOT_LESSON"
-                            })
-                        except Exception as e:
-                            logger.warning(f"Failed to parse lesson time: {e}")
+                # スタッフごとに異なるのは entity_id だけなので、共通部分を1つ作って展開する
+                lesson_block = {
+                    "entity_type": ENTITY_TYPE_INSTRUCTOR,
+                    "start_at": blocked_start_iso,
+                    "end_at": blocked_end_iso,
+                    "type": RESERVATION_TYPE_FIXED_SLOT_LESSON
+                }
+                fixed_slot_reservations_by_date[lesson_date].extend(
+                    {"entity_id": instructor_id, **lesson_block} for instructor_id in instructor_ids
+                )
         except Exception as e:
             logger.warning(f"Failed to get fixed slot lessons: {e}")
     
-    # 4. 予定ブロックを各日付ごとに並列取得
+    # 4. 予定ブロックを日付ごとに並列取得（60秒間キャッシュ、取得に失敗した日付は空のまま）
     shift_slots_by_date = {date: [] for date in dates}
     shift_slot_reservations_by_date = {date: [] for date in dates}
     resource_shift_slot_reservations_by_date = {date: [] for date in dates}
     
-    if actual_studio_id:
-        def fetch_shift_slots(date: str):
-            try:
-                shift_slots_response = client.get_shift_slots({"studio_id": actual_studio_id, "date": date})
-                shift_slots_data = shift_slots_response.get("data", {}).get("shift_slots", {})
-                shift_slots = shift_slots_data.get("list", []) if isinstance(shift_slots_data, dict) else shift_slots_data
-                
-                instructor_reservations = []
-                resource_reservations = []
-                
-                for slot in shift_slots:
-                    entity_type = slot.get("entity_type", "").upper()
-                    if entity_type == "INSTRUCTOR":
-                        instructor_reservations.append({
-                            "entity_id": slot.get("entity_id"),
-                            "entity_type": "INSTRUCTOR",
-                            "start_at": slot.get("start_at"),
-                            "end_at": slot.get("end_at"),
-                            "reservation_type": "SHIFT_SLOT",
-                            "title": slot.get("title", ""),
-                            "description": slot.get("description", "")
-                        })
-                    elif entity_type == "RESOURCE":
-                        resource_reservations.append({
-                            "entity_id": slot.get("entity_id"),
-                            "entity_type": "RESOURCE",
-                            "start_at": slot.get("start_at"),
-                            "end_at": slot.get("end_at"),
-                            "reservation_type": "SHIFT_SLOT",
-                            "title": slot.get("title", ""),
-                            "description": slot.get("description", "")
-                        })
-                
-                return date, shift_slots, instructor_reservations, resource_reservations
-            except Exception as e:
-                logger.warning(f"Failed to get shift slots for {date}: {e}")
-                return date, [], [], []
-        
-        with ThreadPoolExecutor(max_workers=7) as executor:
-            futures = {executor.submit(fetch_shift_slots, date): date for date in dates}
-            for future in as_completed(futures):
-                date, shift_slots, instructor_res, resource_res = future.result()
-                shift_slots_by_date[date] = shift_slots
-                shift_slot_reservations_by_date[date] = instructor_res
-                resource_shift_slot_reservations_by_date[date] = resource_res
+    def fetch_shift_slots_for_date(date: str) -> list:
+        try:
+            return get_cached_shift_slots(client, actual_studio_id, date)
+        except Exception as e:
+            logger.warning(f"Failed to get shift slots for {date}: {e}")
+            return []
     
-    # 5. 設備情報を取得
-    resources_info = get_cached_resources(client, actual_studio_id)
+    def fetch_shift_slots():
+        with ThreadPoolExecutor(max_workers=min(len(dates), SHIFT_SLOTS_FETCH_MAX_WORKERS)) as shift_slots_executor:
+            for date, shift_slots in zip(dates, shift_slots_executor.map(fetch_shift_slots_for_date, dates)):
+                shift_slots_by_date[date] = shift_slots
+                shift_slot_reservations_by_date[date], resource_shift_slot_reservations_by_date[date] = \
+                    _split_shift_slot_reservations(shift_slots)
     
     # 6. プログラムの予約数を日付範囲全体で取得
     program_reservation_counts = {date: 0 for date in dates}
-    if program_id:
+    
+    def fetch_program_reservation_counts():
         try:
             reservations_response = client.get_reservations({
                 "program_id": program_id,
@@ -351,6 +663,21 @@ def refresh_choice_schedule_range_cache(client: HacomonoClient, studio_room_id:
         except Exception as e:
             logger.warning(f"Failed to get program reservations: {e}")
     
+    # 3〜6 は互いに独立しているため、まとめて並列に取得する
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        # 5. 設備情報を取得
+        resources_future = executor.submit(get_cached_resources, client, actual_studio_id)
+        other_futures = []
+        if actual_studio_id:
+            other_futures.append(executor.submit(fetch_fixed_slot_lessons))
+            other_futures.append(executor.submit(fetch_shift_slots))
+        if program_id:
+            other_futures.append(executor.submit(fetch_program_reservation_counts))
+        
+        for future in other_futures:
+            future.result()
+        resources_info = resources_future.result()
+    
     # 7. 結果を統合
     result_schedules = {}
     for date in dates:
@@ -393,7 +720,7 @@ def refresh_choice_schedule_range_cache(client: HacomonoClient, studio_room_id:
     
     # キャッシュに保存
     _choice_schedule_range_cache[cache_key] = response_data
-    _choice_schedule_range_cache_time[cache_key] = datetime.now()
+    _choice_schedule_range_cache_time[cache_key] = time.monotonic()
     logger.info(f"Cached choice-schedule-range for {cache_key}")
     
     return response_data
@@ -442,7 +769,6 @@ def refresh_all_choice_schedule_cache(client: HacomonoClient, days: int = 14, st
     start_date = today + timedelta(days=start_offset_days)
     date_from = start_date.strftime("%Y-%m-%d")
     date_to = (start_date + timedelta(days=days-1)).strftime("%Y-%m-%d")
-    dates = [(start_date + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
     
     cached_count = 0
     range_cached_count = 0
@@ -527,18 +853,61 @@ def refresh_all_choice_schedule_cache(client: HacomonoClient, days: int = 14, st
 def get_cached_instructor_studio_map(client: HacomonoClient) -> dict:
     """スタッフのスタジオ紐付け情報をキャッシュ付きで取得
     
-    並列リクエストでのレート制限を回避するため、60秒間キャッシュする
+    並列リクエストでのレート制限を回避するため、60秒間キャッシュする。
+    同一リクエスト内では1回だけ取得し、取得に失敗した直後は一定時間再取得しない。
+    期限切れ時は1スレッドだけが再取得し、その間ほかのスレッドは古いキャッシュを返す。
+    取得に失敗して古いキャッシュもない場合は InstructorStudioMapUnavailableError を送出する。
     """
-    global _instructor_studio_map_cache, _instructor_studio_map_cache_time
+    # 同一リクエスト内で取得済みならそれを返す（TTL切れの境界でも1リクエスト1回まで）
+    if has_request_context():
+        request_cached = g.get("_instructor_studio_map")
+        if request_cached is not None:
+            return request_cached
+    
+    cached = _get_valid_instructor_studio_map_cache()
+    if cached is not None:
+        logger.debug("Using cached instructor studio map")
+        return _remember_instructor_studio_map(cached)
     
-    now = datetime.now()
+    if _instructor_studio_map_cache is not None:
+        # 古いキャッシュがある場合: 再取得中のスレッドがいればそれを待たずに古いキャッシュを返す
+        if not _instructor_studio_map_refresh_lock.acquire(blocking=False):
+            logger.debug("Instructor studio map refresh in progress, using stale cache")
+            return _remember_instructor_studio_map(_instructor_studio_map_cache)
+    else:
+        # キャッシュが無い場合: 返せるものが無いので、先行スレッドの取得完了を待つ
+        _instructor_studio_map_refresh_lock.acquire()
+        cached = _get_valid_instructor_studio_map_cache()
+        if cached is not None:
+            _instructor_studio_map_refresh_lock.release()
+            return _remember_instructor_studio_map(cached)
     
-    # キャッシュが有効ならそれを返す
-    if (_instructor_studio_map_cache is not None and 
+    try:
+        return _remember_instructor_studio_map(_load_instructor_studio_map(client))
+    finally:
+        _instructor_studio_map_refresh_lock.release()
+
+
+def _get_valid_instructor_studio_map_cache():
+    """有効期限内のスタッフのスタジオ紐付けキャッシュを返す（なければNone）"""
+    if (_instructor_studio_map_cache is not None and
         _instructor_studio_map_cache_time is not None and
-        (now - _instructor_studio_map_cache_time).total_seconds() < INSTRUCTOR_CACHE_TTL_SECONDS):
-        logger.debug("Using cached instructor studio map")
+        time.monotonic() - _instructor_studio_map_cache_time < INSTRUCTOR_CACHE_TTL_SECONDS):
         return _instructor_studio_map_cache
+    return None
+
+
+def _load_instructor_studio_map(client: HacomonoClient) -> dict:
+    """スタッフのスタジオ紐付け情報をhacomonoから取得してキャッシュを更新（リトライ付き）"""
+    global _instructor_studio_map_cache, _instructor_studio_map_cache_time, _instructor_studio_map_failure_time
+    
+    # 直前に取得が失敗していれば、しばらくはhacomonoに問い合わせない（ネガティブキャッシュ）
+    if (_instructor_studio_map_failure_time is not None and
+        time.monotonic() - _instructor_studio_map_failure_time < INSTRUCTOR_CACHE_FAILURE_TTL_SECONDS):
+        logger.debug("Skipping instructor studio map fetch (recent failure)")
+        if _instructor_studio_map_cache is not None:
+            return _instructor_studio_map_cache
+        raise InstructorStudioMapUnavailableError("Instructor studio map is unavailable (recent failure)")
     
     # 新規取得（リトライ付き）
     instructor_studio_map = {}
@@ -555,23 +924,50 @@ def get_cached_instructor_studio_map(client: HacomonoClient) -> dict:
             
             # キャッシュを更新
             _instructor_studio_map_cache = instructor_studio_map
-            _instructor_studio_map_cache_time = now
-            logger.info(f"Loaded instructor studio map (attempt {attempt + 1}): {instructor_studio_map}")
+            _instructor_studio_map_cache_time = time.monotonic()
+            _instructor_studio_map_failure_time = None
+            logger.info("Loaded instructor studio map (attempt %s): %s", attempt + 1, instructor_studio_map)
             return instructor_studio_map
         except Exception as e:
             logger.warning(f"Failed to get instructor studio map (attempt {attempt + 1}): {e}")
             if attempt < max_retries - 1:
-                import time
-                time.sleep(0.5)  # リトライ前に少し待機
+                time.sleep(0.5 * (attempt + 1))  # リトライ前に少し待機（回数に応じて延ばす）
+    
+    _instructor_studio_map_failure_time = time.monotonic()
     
     # 全てのリトライが失敗した場合、キャッシュがあればそれを返す
     if _instructor_studio_map_cache is not None:
         logger.warning("Using stale cache for instructor studio map")
         return _instructor_studio_map_cache
     
+    # 空の紐付け情報は「全スタッフが全店舗対応可能」と解釈されるため返さない
+    raise InstructorStudioMapUnavailableError("Failed to load instructor studio map")
+
+
+def _remember_instructor_studio_map(instructor_studio_map: dict) -> dict:
+    """リクエスト処理中なら、取得したスタッフのスタジオ紐付け情報をリクエスト内で使い回せるよう保持"""
+    if has_request_context():
+        g._instructor_studio_map = instructor_studio_map
     return instructor_studio_map
 
 
+def get_instructor_studio_sets(instructor_studio_map: dict) -> dict:
+    """スタッフのスタジオ紐付け情報を所属判定用の frozenset に変換（同じ紐付け情報なら変換結果を再利用）
+    
+    紐付け情報自体はAPIレスポンスにもそのまま含めるためリストのまま保持し、
+    こちらは予約時のスタジオ所属チェック（O(1)判定）にだけ使う。
+    """
+    global _instructor_studio_sets_cache
+    source, instructor_studio_sets = _instructor_studio_sets_cache
+    if source is not instructor_studio_map:
+        instructor_studio_sets = {
+            instructor_id: frozenset(studio_ids or ())
+            for instructor_id, studio_ids in instructor_studio_map.items()
+        }
+        _instructor_studio_sets_cache = (instructor_studio_map, instructor_studio_sets)
+    return instructor_studio_sets
+
+
 def get_cached_resources(client: HacomonoClient, studio_id: int = None) -> dict:
     """設備情報をキャッシュ付きで取得（店舗ごと）
     
@@ -584,7 +980,7 @@ def get_cached_resources(client: HacomonoClient, studio_id: int = None) -> dict:
     """
     global _resources_cache_by_studio, _resources_cache_time_by_studio
     
-    now = datetime.now()
+    now = time.monotonic()
     cache_key = studio_id or "all"  # 店舗IDがない場合は"all"をキーに
     
     # キャッシュが有効ならそれを返す
@@ -592,7 +988,7 @@ def get_cached_resources(client: HacomonoClient, studio_id: int = None) -> dict:
     cached_time = _resources_cache_time_by_studio.get(cache_key)
     if (cached_data is not None and 
         cached_time is not None and
-        (now - cached_time).total_seconds() < RESOURCES_CACHE_TTL_SECONDS):
+        now - cached_time < RESOURCES_CACHE_TTL_SECONDS):
         logger.debug(f"Using cached resources for studio {cache_key}")
         return cached_data
     
@@ -637,11 +1033,11 @@ def get_cached_studios(client: HacomonoClient) -> list:
     """店舗一覧をキャッシュ付きで取得（10分間）"""
     global _studios_cache, _studios_cache_time
     
-    now = datetime.now()
+    now = time.monotonic()
     
     if (_studios_cache is not None and 
         _studios_cache_time is not None and
-        (now - _studios_cache_time).total_seconds() < STUDIOS_CACHE_TTL_SECONDS):
+        now - _studios_cache_time < STUDIOS_CACHE_TTL_SECONDS):
         logger.debug("Using cached studios")
         return _studios_cache
     
@@ -663,14 +1059,14 @@ def get_cached_programs(client: HacomonoClient, studio_id: int = None) -> list:
     """プログラム一覧をキャッシュ付きで取得（5分間、店舗ごと）"""
     global _programs_cache_by_studio, _programs_cache_time_by_studio
     
-    now = datetime.now()
+    now = time.monotonic()
     cache_key = studio_id or "all"
     
     cached_data = _programs_cache_by_studio.get(cache_key)
     cached_time = _programs_cache_time_by_studio.get(cache_key)
     if (cached_data is not None and 
         cached_time is not None and
-        (now - cached_time).total_seconds() < PROGRAMS_CACHE_TTL_SECONDS):
+        now - cached_time < PROGRAMS_CACHE_TTL_SECONDS):
         logger.debug(f"Using cached programs for studio {cache_key}")
         return cached_data
     
@@ -758,18 +1154,82 @@ def get_reservable_programs(client: HacomonoClient, studio_id: int) -> list:
     return [p for p in programs if is_program_fully_configured(p)]
 
 
+def get_cached_program(client: HacomonoClient, program_id: int) -> tuple:
+    """プログラム詳細をキャッシュ付きで取得（60秒間、プログラムIDごと）
+    
+    Returns:
+        (program, キャッシュヒットしたか) のタプル。キャッシュがなく取得に失敗した場合は例外を送出
+    """
+    now = time.monotonic()
+    
+    cached_data = _program_detail_cache.get(program_id)
+    cached_time = _program_detail_cache_time.get(program_id)
+    if (cached_data is not None and 
+        cached_time is not None and
+        now - cached_time < PROGRAM_DETAIL_CACHE_TTL_SECONDS):
+        logger.debug(f"Using cached program {program_id}")
+        return cached_data, True
+    
+    try:
+        # このキャッシュだけで鮮度を管理するため、クライアント側のマスタキャッシュは通さない
+        response = client.get_program(program_id, use_cache=False)
+        program = response.get("data", {}).get("program", {})
+        _program_detail_cache[program_id] = program
+        _program_detail_cache_time[program_id] = now
+        return program, False
+    except Exception as e:
+        if cached_data is None:
+            raise
+        logger.warning(f"Failed to get program {program_id}, using stale cache: {e}")
+        return cached_data, True
+
+
+def get_cached_instructors(client: HacomonoClient, studio_id: int = None) -> tuple:
+    """有効なスタッフ一覧をキャッシュ付きで取得（60秒間、店舗ごと）
+    
+    Returns:
+        (instructors, キャッシュヒットしたか) のタプル。キャッシュがなく取得に失敗した場合は例外を送出
+    """
+    now = time.monotonic()
+    cache_key = studio_id or "all"
+    
+    cached_data = _instructors_cache_by_studio.get(cache_key)
+    cached_time = _instructors_cache_time_by_studio.get(cache_key)
+    if (cached_data is not None and 
+        cached_time is not None and
+        now - cached_time < INSTRUCTORS_CACHE_TTL_SECONDS):
+        logger.debug(f"Using cached instructors for studio {cache_key}")
+        return cached_data, True
+    
+    try:
+        query = {"is_active": True}
+        if studio_id:
+            query["studio_id"] = studio_id
+        response = client.get_instructors(query)
+        instructors = response.get("data", {}).get("instructors", {}).get("list", [])
+        _instructors_cache_by_studio[cache_key] = instructors
+        _instructors_cache_time_by_studio[cache_key] = now
+        logger.info(f"Loaded instructors cache for studio {cache_key}: {len(instructors)} instructors")
+        return instructors, False
+    except Exception as e:
+        if cached_data is None:
+            raise
+        logger.warning(f"Failed to get instructors for studio {cache_key}, using stale cache: {e}")
+        return cached_data, True
+
+
 def get_cached_studio_rooms(client: HacomonoClient, studio_id: int = None) -> list:
     """スタジオルーム一覧をキャッシュ付きで取得（5分間、店舗ごと）"""
     global _studio_rooms_cache_by_studio, _studio_rooms_cache_time_by_studio
     
-    now = datetime.now()
+    now = time.monotonic()
     cache_key = studio_id or "all"
     
     cached_data = _studio_rooms_cache_by_studio.get(cache_key)
     cached_time = _studio_rooms_cache_time_by_studio.get(cache_key)
     if (cached_data is not None and 
         cached_time is not None and
-        (now - cached_time).total_seconds() < STUDIO_ROOMS_CACHE_TTL_SECONDS):
+        now - cached_time < STUDIO_ROOMS_CACHE_TTL_SECONDS):
         logger.debug(f"Using cached studio rooms for studio {cache_key}")
         return cached_data
     
@@ -794,14 +1254,14 @@ def get_cached_choice_schedule(client: HacomonoClient, studio_room_id: int, date
     """自由枠スケジュールをキャッシュ付きで取得（30秒間）"""
     global _choice_schedule_cache, _choice_schedule_cache_time
     
-    now = datetime.now()
+    now = time.monotonic()
     cache_key = f"{studio_room_id}:{date}"
     
     cached_data = _choice_schedule_cache.get(cache_key)
     cached_time = _choice_schedule_cache_time.get(cache_key)
     if (cached_data is not None and 
         cached_time is not None and
-        (now - cached_time).total_seconds() < CHOICE_SCHEDULE_CACHE_TTL_SECONDS):
+        now - cached_time < CHOICE_SCHEDULE_CACHE_TTL_SECONDS):
         logger.debug(f"Using cached choice schedule for {cache_key}")
         return cached_data
     
@@ -819,6 +1279,82 @@ def get_cached_choice_schedule(client: HacomonoClient, studio_room_id: int, date
         raise
 
 
+def _store_bounded_cache(cache: dict, cache_time: dict, cache_key: str, value, now: float, max_entries: int):
+    """キャッシュに値を保存（上限を超えたら古いものから破棄）"""
+    cache.pop(cache_key, None)
+    cache[cache_key] = value
+    cache_time[cache_key] = now
+    while len(cache) > max_entries:
+        oldest = next(iter(cache))
+        cache.pop(oldest, None)
+        cache_time.pop(oldest, None)
+
+
+def get_cached_shift_slots(client: HacomonoClient, studio_id: int, date: str, bypass_cache: bool = False) -> list:
+    """予定ブロック（休憩ブロック）をキャッシュ付きで取得（60秒間、店舗 + 日付ごと）
+    
+    bypass_cache=True の場合はキャッシュを使わずに取得し（結果はキャッシュに保存する）、
+    取得に失敗しても古いキャッシュは返さない。予約作成時の検証など、直前の変更を見落とせない場合に使う。
+    """
+    now = time.monotonic()
+    cache_key = f"{studio_id}:{date}"
+    
+    if bypass_cache:
+        cached_data = cached_time = None
+    else:
+        cached_data = _shift_slots_cache.get(cache_key)
+        cached_time = _shift_slots_cache_time.get(cache_key)
+    if (cached_data is not None and
+        cached_time is not None and
+        now - cached_time < SHIFT_SLOTS_CACHE_TTL_SECONDS):
+        logger.debug(f"Using cached shift slots for {cache_key}")
+        return cached_data
+    
+    try:
+        response = client.get_shift_slots({"studio_id": studio_id, "date": date})
+        shift_slots_data = response.get("data", {}).get("shift_slots", {})
+        shift_slots = shift_slots_data.get("list", []) if isinstance(shift_slots_data, dict) else shift_slots_data
+        _store_bounded_cache(_shift_slots_cache, _shift_slots_cache_time, cache_key, shift_slots, now,
+                             SHIFT_SLOTS_CACHE_MAX_ENTRIES)
+        return shift_slots
+    except Exception as e:
+        logger.warning(f"Failed to get shift slots for {cache_key}: {e}")
+        if cached_data is not None:
+            return cached_data
+        raise
+
+
+def get_cached_studio_lessons(client: HacomonoClient, studio_id: int, date_from: str, date_to: str) -> list:
+    """固定枠レッスンをキャッシュ付きで取得（60秒間、店舗 + 日付範囲ごと）"""
+    now = time.monotonic()
+    cache_key = f"{studio_id}:{date_from}:{date_to}"
+    
+    cached_data = _studio_lessons_cache.get(cache_key)
+    cached_time = _studio_lessons_cache_time.get(cache_key)
+    if (cached_data is not None and
+        cached_time is not None and
+        now - cached_time < STUDIO_LESSONS_CACHE_TTL_SECONDS):
+        logger.debug(f"Using cached studio lessons for {cache_key}")
+        return cached_data
+    
+    try:
+        response = client.get_studio_lessons(
+            query={"studio_id": studio_id},
+            date_from=date_from,
+            date_to=date_to,
+            fetch_all=True
+        )
+        lessons = response.get("data", {}).get("studio_lessons", {}).get("list", [])
+        _store_bounded_cache(_studio_lessons_cache, _studio_lessons_cache_time, cache_key, lessons, now,
+                             STUDIO_LESSONS_CACHE_MAX_ENTRIES)
+        return lessons
+    except Exception as e:
+        logger.warning(f"Failed to get studio lessons for {cache_key}: {e}")
+        if cached_data is not None:
+            return cached_data
+        raise
+
+
 def handle_errors(f):
     """エラーハンドリングデコレータ"""
     @wraps(f)
@@ -831,6 +1367,9 @@ def handle_errors(f):
         except RateLimitError as e:
             logger.warning(f"Rate limit exceeded: {e}")
             return jsonify({"error": "Rate limit exceeded", "retry_after": e.retry_after}), 429
+        except InstructorStudioMapUnavailableError as e:
+            logger.error(f"Instructor studio map unavailable: {e}")
+            return jsonify({"error": "Service temporarily unavailable", "message": str(e)}), 503
         except HacomonoAPIError as e:
             logger.error(f"hacomono API error: {e}")
             return jsonify({"error": "API error", "message": str(e)}), e.status_code or 500
@@ -845,6 +1384,41 @@ def handle_errors(f):
 # ハッシュ生成用のシークレットソルト（環境変数から取得、なければデフォルト）
 VERIFICATION_SALT = os.environ.get("VERIFICATION_SALT", "happle-reservation-secret-salt-2024")
 
+# 認証ハッシュのバージョン接頭辞（v2: BLAKE2b 鍵付きハッシュ）
+# 接頭辞のないハッシュは旧方式（SHA256）として検証し、発行済みURLを引き続き有効にする
+VERIFICATION_HASH_PREFIX = "v2"
+
+# BLAKE2b の鍵（最大64バイトのため、長いソルトはダイジェストにして使う）
+_verification_key = VERIFICATION_SALT.encode("utf-8")
+if len(_verification_key) > hashlib.blake2b.MAX_KEY_SIZE:
+    _verification_key = hashlib.blake2b(_verification_key).digest()
+
+# 鍵ブロックを処理済みの BLAKE2b 状態（呼び出しごとに copy() して鍵の初期化を省く）
+_verification_hasher = hashlib.blake2b(key=_verification_key, digest_size=16)
+
+# 旧方式ハッシュの末尾に付けるソルト（エンコード済み）
+_legacy_verification_salt_suffix = f":{VERIFICATION_SALT}".encode("utf-8")
+
+# 電話番号の正規化で除去する文字（v2: ハイフン・半角/全角スペース・タブ）
+_PHONE_STRIP_TABLE = str.maketrans("", "", "- \t\u3000")
+# 旧方式の正規化で除去する文字（ハイフン・半角スペースのみ。発行済みURLのハッシュを変えないため据え置き）
+_LEGACY_PHONE_STRIP_TABLE = str.maketrans("", "", "- ")
+
+
+def _normalize_verification_input(email: str, phone: str, phone_strip_table: dict = _PHONE_STRIP_TABLE) -> bytes:
+    """認証ハッシュ用にメールアドレスと電話番号を正規化して結合（UTF-8 エンコード済み）"""
+    # 正規化: 小文字化、スペース・ハイフン除去
+    normalized_email = email.lower().strip()
+    normalized_phone = phone.translate(phone_strip_table).strip()
+    return f"{normalized_email}:{normalized_phone}".encode("utf-8")
+
+
+def _generate_legacy_verification_hash(email: str, phone: str) -> str:
+    """旧方式（SHA256 + ソルト、先頭16文字）の認証ハッシュを生成（発行済みURLの検証用）"""
+    digest = hashlib.sha256(_normalize_verification_input(email, phone, _LEGACY_PHONE_STRIP_TABLE))
+    digest.update(_legacy_verification_salt_suffix)
+    return digest.hexdigest()[:16]
+
 
 def generate_verification_hash(email: str, phone: str) -> str:
     """メールアドレスと電話番号から認証用ハッシュを生成
@@ -854,33 +1428,82 @@ def generate_verification_hash(email: str, phone: str) -> str:
         phone: 電話番号
         
     Returns:
-        SHA256ハッシュの先頭16文字（URLに含めやすい長さ）
+        "v2" + BLAKE2b 鍵付きハッシュ（16バイト）の16進文字列
     """
-    # 正規化: 小文字化、スペース・ハイフン除去
-    normalized_email = email.lower().strip()
-    normalized_phone = phone.replace("-", "").replace(" ", "").strip()
-    
-    # ソルト付きでハッシュ生成
-    data = f"{normalized_email}:{normalized_phone}:{VERIFICATION_SALT}"
-    hash_value = hashlib.sha256(data.encode('utf-8')).hexdigest()
-    
-    # 先頭16文字を返す（URLに含めやすい長さ）
-    return hash_value[:16]
+    return _generate_v2_verification_hash(email, phone, _PHONE_STRIP_TABLE)
+
+
+def _generate_v2_verification_hash(email: str, phone: str, phone_strip_table: dict) -> str:
+    """v2 認証ハッシュを指定した電話番号の正規化で生成"""
+    hasher = _verification_hasher.copy()
+    hasher.update(_normalize_verification_input(email, phone, phone_strip_table))
+    return f"{VERIFICATION_HASH_PREFIX}{hasher.hexdigest()}"
 
 
-def verify_hash(email: str, phone: str, provided_hash: str) -> bool:
+# 会員ごとの期待ハッシュのキャッシュ（予約詳細の閲覧ごとの再計算を省く）
+# キーは (member_id, v2かどうか)。メールアドレス・電話番号そのものは保持せず、入力が変わっていないかは
+# プロセス内のハッシュ値で確認する
+_verification_digest_cache: dict = {}  # { (member_id, is_v2): (time.monotonic(), 入力のハッシュ値, 期待ハッシュのタプル) }
+_verification_digest_cache_lock = threading.Lock()
+VERIFICATION_DIGEST_CACHE_TTL_SECONDS = 600  # 10分間キャッシュ
+VERIFICATION_DIGEST_CACHE_MAX_ENTRIES = 2048
+
+
+def _compute_expected_verification_hashes(email: str, phone: str, is_v2: bool) -> tuple:
+    """検証で受け付けるハッシュの一覧を計算"""
+    if not is_v2:
+        return (_generate_legacy_verification_hash(email, phone),)
+    expected_hashes = (generate_verification_hash(email, phone),)
+    if phone.translate(_PHONE_STRIP_TABLE) != phone.translate(_LEGACY_PHONE_STRIP_TABLE):
+        expected_hashes += (_generate_v2_verification_hash(email, phone, _LEGACY_PHONE_STRIP_TABLE),)
+    return expected_hashes
+
+
+def _get_expected_verification_hashes(email: str, phone: str, is_v2: bool, member_id: int = None) -> tuple:
+    """検証で受け付けるハッシュの一覧を取得（member_id があれば会員ごとにキャッシュ）"""
+    if not member_id:
+        return _compute_expected_verification_hashes(email, phone, is_v2)
+    
+    cache_key = (member_id, is_v2)
+    input_fingerprint = hash((email, phone))
+    now = time.monotonic()
+    with _verification_digest_cache_lock:
+        cached = _verification_digest_cache.get(cache_key)
+    if (cached is not None and
+        now - cached[0] < VERIFICATION_DIGEST_CACHE_TTL_SECONDS and
+        cached[1] == input_fingerprint):
+        return cached[2]
+    
+    expected_hashes = _compute_expected_verification_hashes(email, phone, is_v2)
+    with _verification_digest_cache_lock:
+        _verification_digest_cache.pop(cache_key, None)
+        _verification_digest_cache[cache_key] = (now, input_fingerprint, expected_hashes)
+        while len(_verification_digest_cache) > VERIFICATION_DIGEST_CACHE_MAX_ENTRIES:
+            _verification_digest_cache.pop(next(iter(_verification_digest_cache)))
+    return expected_hashes
+
+
+def verify_hash(email: str, phone: str, provided_hash: str, member_id: int = None) -> bool:
     """提供されたハッシュが正しいか検証
     
+    v2 接頭辞付きのハッシュは BLAKE2b、それ以外は旧方式（SHA256）で検証する。
+    v2 はタブ・全角スペースを除去する前の正規化で発行したURLもあるため、電話番号に
+    それらが含まれる場合は旧来の正規化（ハイフン・半角スペースのみ除去）でも照合する。
+    
     Args:
         email: メールアドレス
         phone: 電話番号
         provided_hash: URLから取得したハッシュ
+        member_id: 会員ID（指定すると期待ハッシュを会員ごとに短時間キャッシュする）
         
     Returns:
         ハッシュが一致すればTrue
     """
-    expected_hash = generate_verification_hash(email, phone)
-    return expected_hash == provided_hash
+    is_v2 = provided_hash.startswith(VERIFICATION_HASH_PREFIX)
+    expected_hashes = _get_expected_verification_hashes(email, phone, is_v2, member_id)
+    provided = provided_hash.encode("utf-8")
+    # タイミング攻撃を避けるため定数時間で比較
+    return any(hmac.compare_digest(expected.encode("utf-8"), provided) for expected in expected_hashes)
 
 
 # ==================== 予約日時バリデーション ====================
@@ -889,6 +1512,12 @@ def verify_hash(email: str, phone: str, provided_hash: str) -> bool:
 RESERVATION_MIN_MINUTES_AHEAD = int(os.environ.get("RESERVATION_MIN_MINUTES_AHEAD", "30"))  # 最低30分後から
 RESERVATION_MAX_DAYS_AHEAD = int(os.environ.get("RESERVATION_MAX_DAYS_AHEAD", "14"))  # 最大14日後まで
 
+# 設定値から決まる範囲とエラーメッセージは起動時に1回だけ作る
+_RESERVATION_MIN_AHEAD = timedelta(minutes=RESERVATION_MIN_MINUTES_AHEAD)
+_RESERVATION_MAX_AHEAD = timedelta(days=RESERVATION_MAX_DAYS_AHEAD)
+_RESERVATION_TOO_SOON_MESSAGE = f"予約は{RESERVATION_MIN_MINUTES_AHEAD}分後以降の時間を選択してください"
+_RESERVATION_TOO_FAR_MESSAGE = f"予約は{RESERVATION_MAX_DAYS_AHEAD}日後までの日付を選択してください"
+
 
 def validate_reservation_datetime(reservation_datetime: datetime) -> tuple[bool, str]:
     """予約日時が有効範囲内かチェック
@@ -902,27 +1531,37 @@ def validate_reservation_datetime(reservation_datetime: datetime) -> tuple[bool,
     now = datetime.now()
     
     # 最低30分後以降かチェック
-    min_datetime = now + timedelta(minutes=RESERVATION_MIN_MINUTES_AHEAD)
-    if reservation_datetime < min_datetime:
-        return False, f"予約は{RESERVATION_MIN_MINUTES_AHEAD}分後以降の時間を選択してください"
+    if reservation_datetime < now + _RESERVATION_MIN_AHEAD:
+        return False, _RESERVATION_TOO_SOON_MESSAGE
     
     # 最大14日後以内かチェック
-    max_datetime = now + timedelta(days=RESERVATION_MAX_DAYS_AHEAD)
-    if reservation_datetime > max_datetime:
-        return False, f"予約は{RESERVATION_MAX_DAYS_AHEAD}日後までの日付を選択してください"
+    if reservation_datetime > now + _RESERVATION_MAX_AHEAD:
+        return False, _RESERVATION_TOO_FAR_MESSAGE
     
     return True, ""
 
 
+def parse_jst_start_at(start_at: str) -> datetime:
+    """自由枠予約の start_at（"yyyy-MM-dd HH:mm:ss.fff" 形式、JST）をパース
+    
+    ミリ秒は切り捨て、タイムゾーンなしのJST日時として返す（validate_reservation_datetime にそのまま渡せる）。
+    
+    Raises:
+        ValueError: 形式が不正な場合
+    """
+    return datetime.strptime(start_at.split(".")[0], "%Y-%m-%d %H:%M:%S")
+
+
 # ==================== 店舗情報ヘルパー ====================
 
+def get_studio_attrs(studio_data: dict) -> dict:
+    """店舗のattrsを { key: value } の辞書にまとめる（同じキーが複数あれば先頭の値を優先）"""
+    return {attr.get("key"): attr.get("value", "") for attr in reversed(studio_data.get("attrs", []))}
+
+
 def get_studio_attr(studio_data: dict, key: str) -> str:
     """店舗のattrsから指定キーの値を取得"""
-    attrs = studio_data.get("attrs", [])
-    for attr in attrs:
-        if attr.get("key") == key:
-            return attr.get("value", "")
-    return ""
+    return get_studio_attrs(studio_data).get(key, "")
 
 
 def get_studio_contact_info(studio_data: dict, overrides: dict) -> dict:
@@ -946,13 +1585,16 @@ def get_studio_contact_info(studio_data: dict, overrides: dict) -> dict:
         studio_data.get("address3", "")
     ]))
     
+    # attrsは1回だけ辞書化して各キーを引く
+    studio_attrs = get_studio_attrs(studio_data)
+    
     return {
         "zip": overrides.get("studio_zip") or (f"{zip1}-{zip2}" if zip1 and zip2 else (zip1 or "")),
         "address": overrides.get("studio_address") or hacomono_address,
         "tel": overrides.get("studio_tel") or studio_data.get("tel", ""),
-        "url": overrides.get("studio_url") or get_studio_attr(studio_data, "studio_url"),
-        "email": overrides.get("studio_email") or get_studio_attr(studio_data, "studio_email"),
-        "line_url": overrides.get("line_url") or get_studio_attr(studio_data, "line_url")
+        "url": overrides.get("studio_url") or studio_attrs.get("studio_url", ""),
+        "email": overrides.get("studio_email") or studio_attrs.get("studio_email", ""),
+        "line_url": overrides.get("line_url") or studio_attrs.get("line_url", "")
     }
 
 
@@ -1010,10 +1652,20 @@ def load_ses_config_from_terraform():
     """
     tfstate_path = Path(__file__).parent.parent / "terraform" / "terraform.tfstate"
     
-    if not tfstate_path.exists():
+    try:
+        tfstate_mtime_ns = tfstate_path.stat().st_mtime_ns
+    except FileNotFoundError:
         logger.warning(f"terraform.tfstate not found at {tfstate_path}")
         return None
     
+    # 呼び出し側が結果を書き換えてもキャッシュに影響しないようコピーを返す
+    config = _load_ses_config_from_tfstate(str(tfstate_path), tfstate_mtime_ns)
+    return dict(config) if config else None
+
+
+@lru_cache(maxsize=1)
+def _load_ses_config_from_tfstate(tfstate_path: str, tfstate_mtime_ns: int):
+    """tfstateを読み込んでSES設定を取り出す（ファイルが更新されるまで結果をキャッシュ）"""
     try:
         with open(tfstate_path, "r") as f:
             tfstate = json.load(f)
@@ -1048,7 +1700,11 @@ def load_ses_config_from_terraform():
 
 
 def get_ses_config():
-    """SES設定を取得（環境変数優先、なければterraformから読み込み）"""
+    """SES設定を取得（環境変数優先、なければterraformから読み込み）
+    
+    呼び出しごとに解決し直すため、後から設定された環境変数や更新されたtfstateも反映される
+    （tfstateの読み込みはファイルが更新されるまでキャッシュされる）。
+    """
     # 環境変数から取得
     aws_access_key = os.environ.get("AWS_ACCESS_KEY_ID") or os.environ.get("SES_ACCESS_KEY_ID")
     aws_secret_key = os.environ.get("AWS_SECRET_ACCESS_KEY") or os.environ.get("SES_SECRET_ACCESS_KEY")
@@ -1188,97 +1844,8 @@ EMAILS_DIR = Path(__file__).parent / "logs" / "emails"
 EMAILS_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def send_reservation_email(
-    reservation_id: int,
-    member_id: int,
-    guest_name: str,
-    guest_email: str,
-    guest_phone: str,
-    studio_name: str,
-    studio_address: str = "",
-    studio_tel: str = "",
-    program_name: str = "",
-    reservation_date: str = "",
-    reservation_time: str = "",
-    duration_minutes: int = 0,
-    price: int = 0,
-    line_url: str = "",
-    base_url: str = "",
-    studio_contact_info: dict = None,
-    generated_password: str = None
-):
-    """予約完了メールを送信（SES使用）+ Slack通知
-    
-    Args:
-        reservation_id: 予約ID
-        member_id: メンバーID（キャンセル時に必要）
-        guest_name: ゲスト名
-        guest_email: メールアドレス
-        guest_phone: 電話番号
-        studio_name: 店舗名
-        studio_address: 店舗住所（後方互換用、studio_contact_info優先）
-        studio_tel: 店舗電話番号（後方互換用、studio_contact_info優先）
-        program_name: メニュー名
-        reservation_date: 予約日
-        reservation_time: 予約時間
-        duration_minutes: 所要時間（分）
-        price: 料金
-        line_url: LINE URL（空の場合はLINE関連セクションを除外）
-        base_url: 予約確認用ベースURL
-        studio_contact_info: 店舗連絡先情報（get_studio_contact_infoで取得）
-        generated_password: 新規登録時に生成したパスワード（既存メンバーの場合はNone）
-    
-    Returns:
-        dict: メール送信結果 {"success": bool, "message_id": str, "error": str}
-    """
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    
-    # 認証用ハッシュを生成
-    verify_hash = generate_verification_hash(guest_email, guest_phone)
-    
-    # 予約確認URL（member_id + ハッシュを含める、LINE URLがあれば追加）
-    detail_url_base = f"{base_url}/reservation-detail?reservation_id={reservation_id}&member_id={member_id}&verify={verify_hash}" if base_url else f"/reservation-detail?reservation_id={reservation_id}&member_id={member_id}&verify={verify_hash}"
-    if line_url:
-        from urllib.parse import quote
-        detail_url = f"{detail_url_base}&line_url={quote(line_url, safe='')}"
-    else:
-        detail_url = detail_url_base
-    
-    # LINE URLがある場合のみLINE関連セクションを含める
-    if line_url:
-        line_section = f"""
-★公式LINEの登録お願いします★
-
-登録いただくと・・・
-✅ 予約日程の変更
-✅ 施術内容の確認
-✅ 予約前の不安・質問
-✅ 不定期でお得なキャンペーン情報配信 etc..
-
-登録はこちらから公式LINE👇
-{line_url}
-
-"""
-        cancel_line_note = "◆キャンセルはご予約日の前日18時までにLINEにてご連絡くださいませ。"
-    else:
-        line_section = ""
-        cancel_line_note = "◆キャンセルはご予約日の前日18時までにご連絡くださいませ。"
-    
-    # 新規登録時のみマイページログイン情報を追加
-    if generated_password:
-        mypage_section = f"""
-▼ログイン情報
-メールアドレス: {guest_email}
-初期パスワード: {generated_password}
-
-▼パスワード変更はこちら
-https://asmy.hacomono.jp/mypage/password-change
-
-"""
-    else:
-        mypage_section = ""
-    
-    email_content = f"""{guest_name}　様
+# 予約完了メールの本文テンプレート（str.format_map で差し込む）
+_RESERVATION_EMAIL_TEMPLATE = """{guest_name}　様
 
 この度は「{studio_name}」にご予約いただき誠にありがとうございます。
 今回のご予約内容は以下のとおりです。
@@ -1295,7 +1862,7 @@ https://asmy.hacomono.jp/mypage/password-change
 {studio_name}
 
 ■施術コース
-{program_name} {f"¥{price:,}" if price else ""}
+{program_name} {price_text}
 
 ■所要時間
 {duration_minutes}分
@@ -1323,19 +1890,138 @@ https://asmy.hacomono.jp/mypage/password-change
 
 当日お会いできるのを楽しみにしております。
 
-{_generate_studio_footer(studio_name, studio_contact_info, studio_address, studio_tel)}
+{studio_footer}
 """
-    
-    # 1. ファイルに保存（ログ用）
-    filename = f"{reservation_id}_{timestamp}.txt"
-    filepath = EMAILS_DIR / filename
-    
+
+# 公式LINEの案内（LINE URLがある場合のみ本文に含める）
+_RESERVATION_EMAIL_LINE_SECTION = """
+★公式LINEの登録お願いします★
+
+登録いただくと・・・
+✅ 予約日程の変更
+✅ 施術内容の確認
+✅ 予約前の不安・質問
+✅ 不定期でお得なキャンペーン情報配信 etc..
+
+登録はこちらから公式LINE👇
+{line_url}
+
+"""
+
+_RESERVATION_EMAIL_CANCEL_NOTE_LINE = "◆キャンセルはご予約日の前日18時までにLINEにてご連絡くださいませ。"
+_RESERVATION_EMAIL_CANCEL_NOTE = "◆キャンセルはご予約日の前日18時までにご連絡くださいませ。"
+
+# マイページのログイン情報（新規登録時のみ本文に含める）
+_RESERVATION_EMAIL_MYPAGE_SECTION = """
+▼ログイン情報
+メールアドレス: {guest_email}
+初期パスワード: {generated_password}
+
+▼パスワード変更はこちら
+https://asmy.hacomono.jp/mypage/password-change
+
+"""
+
+
+def _write_email_log(filepath: Path, email_content: str):
+    """送信したメール内容をログファイルに保存"""
     try:
         with open(filepath, "w", encoding="utf-8") as f:
             f.write(email_content)
         logger.info(f"Email content saved to: {filepath}")
     except Exception as e:
         logger.error(f"Failed to save email content: {e}")
+
+
+def send_reservation_email(
+    reservation_id: int,
+    member_id: int,
+    guest_name: str,
+    guest_email: str,
+    guest_phone: str,
+    studio_name: str,
+    studio_address: str = "",
+    studio_tel: str = "",
+    program_name: str = "",
+    reservation_date: str = "",
+    reservation_time: str = "",
+    duration_minutes: int = 0,
+    price: int = 0,
+    line_url: str = "",
+    base_url: str = "",
+    studio_contact_info: dict = None,
+    generated_password: str = None
+):
+    """予約完了メールを送信（SES使用）+ Slack通知
+    
+    Args:
+        reservation_id: 予約ID
+        member_id: メンバーID（キャンセル時に必要）
+        guest_name: ゲスト名
+        guest_email: メールアドレス
+        guest_phone: 電話番号
+        studio_name: 店舗名
+        studio_address: 店舗住所（後方互換用、studio_contact_info優先）
+        studio_tel: 店舗電話番号（後方互換用、studio_contact_info優先）
+        program_name: メニュー名
+        reservation_date: 予約日
+        reservation_time: 予約時間
+        duration_minutes: 所要時間（分）
+        price: 料金
+        line_url: LINE URL（空の場合はLINE関連セクションを除外）
+        base_url: 予約確認用ベースURL
+        studio_contact_info: 店舗連絡先情報（get_studio_contact_infoで取得）
+        generated_password: 新規登録時に生成したパスワード（既存メンバーの場合はNone）
+    
+    Returns:
+        dict: メール送信結果 {"success": bool, "message_id": str, "error": str}
+    """
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    
+    # 認証用ハッシュを生成
+    verify_hash = generate_verification_hash(guest_email, guest_phone)
+    
+    # 予約確認URL（member_id + ハッシュを含める、LINE URLがあれば追加）
+    detail_params = {"reservation_id": reservation_id, "member_id": member_id, "verify": verify_hash}
+    if line_url:
+        detail_params["line_url"] = line_url
+    detail_url = f"{base_url}/reservation-detail?{urlencode(detail_params, quote_via=quote)}"
+    
+    # LINE URLがある場合のみLINE関連セクションを含める
+    if line_url:
+        line_section = _RESERVATION_EMAIL_LINE_SECTION.format(line_url=line_url)
+        cancel_line_note = _RESERVATION_EMAIL_CANCEL_NOTE_LINE
+    else:
+        line_section = ""
+        cancel_line_note = _RESERVATION_EMAIL_CANCEL_NOTE
+    
+    # 新規登録時のみマイページログイン情報を追加
+    if generated_password:
+        mypage_section = _RESERVATION_EMAIL_MYPAGE_SECTION.format(
+            guest_email=guest_email, generated_password=generated_password
+        )
+    else:
+        mypage_section = ""
+    
+    email_content = _RESERVATION_EMAIL_TEMPLATE.format_map({
+        "guest_name": guest_name,
+        "studio_name": studio_name,
+        "reservation_date": reservation_date,
+        "reservation_time": reservation_time,
+        "program_name": program_name,
+        "price_text": f"¥{price:,}" if price else "",
+        "duration_minutes": duration_minutes,
+        "guest_phone": guest_phone,
+        "detail_url": detail_url,
+        "mypage_section": mypage_section,
+        "line_section": line_section,
+        "cancel_line_note": cancel_line_note,
+        "studio_footer": _generate_studio_footer(studio_name, studio_contact_info, studio_address, studio_tel)
+    })
+    
+    # 1. ファイルに保存（ログ用、ディスク書き込みはレスポンスを待たせないようバックグラウンドで実行）
+    filename = f"{reservation_id}_{timestamp}.txt"
+    run_in_background(_write_email_log, EMAILS_DIR / filename, email_content)
     
     # 2. SESでメール送信
     subject = f"【予約確認】{studio_name} - {reservation_date} {reservation_time}"
@@ -1345,20 +2031,21 @@ https://asmy.hacomono.jp/mypage/password-change
         body_text=email_content
     )
     
-    # 3. Slackにメール内容と送信結果を通知
-    try:
-        send_email_log_to_slack(
-            reservation_id=reservation_id,
-            guest_email=guest_email,
-            guest_name=guest_name,
-            studio_name=studio_name,
-            email_content=email_content,
-            email_result=email_result,
-            reservation_date=reservation_date,
-            reservation_time=reservation_time
-        )
-    except Exception as e:
-        logger.error(f"Failed to send email log to Slack: {e}")
+    # 3. Slackにメール内容と送信結果を通知（Webhook未設定なら呼び出し自体を省く）
+    if _SLACK_ENABLED:
+        try:
+            send_email_log_to_slack(
+                reservation_id=reservation_id,
+                guest_email=guest_email,
+                guest_name=guest_name,
+                studio_name=studio_name,
+                email_content=email_content,
+                email_result=email_result,
+                reservation_date=reservation_date,
+                reservation_time=reservation_time
+            )
+        except Exception as e:
+            logger.error(f"Failed to send email log to Slack: {e}")
     
     return email_result
 
@@ -1371,6 +2058,82 @@ def send_reservation_email_mock(*args, **kwargs):
 
 # ==================== Slack通知 ====================
 
+# Slack Webhook URL（プロセス起動時に1回だけ読み込む。未設定ならSlack通知のペイロード構築ごと省く）
+_SLACK_WEBHOOK_URL = os.environ.get("SLACK_WEBHOOK_URL")
+_SLACK_ENABLED = bool(_SLACK_WEBHOOK_URL)
+
+# Slack Webhook 用の HTTP セッション（Keep-Alive で TLS ハンドシェイクを再利用）
+# 429/5xx はバックオフ付きで2回までリトライ（送信はバックグラウンドのためレスポンスは待たせない）
+_slack_session = requests.Session()
+_slack_session.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False
+    )
+))
+
+# Slack送信用スレッドプール（Webhookの応答を待たずに予約APIのレスポンスを返す）
+_slack_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="slack")
+
+
+_SLACK_JSON_HEADERS = {"Content-Type": "application/json; charset=utf-8"}
+
+
+def _post_slack_payload(webhook_url: str, payload, timeout: int, description: str):
+    """Slack Webhookにペイロードを送信（_slack_executor 上で実行される）
+    
+    payload は dict、またはシリアライズ済みのJSON（bytes）。
+    """
+    try:
+        body = payload if isinstance(payload, bytes) else _json_dumps_bytes(payload)
+        response = _slack_session.post(webhook_url, data=body, headers=_SLACK_JSON_HEADERS, timeout=timeout)
+        response.raise_for_status()
+        logger.info(f"{description} sent to Slack successfully (response_status: {response.status_code})")
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Failed to send {description} to Slack: {e}")
+        if e.response is not None:
+            logger.error(f"Response status: {e.response.status_code}, body: {e.response.text}")
+    except Exception as e:
+        logger.error(f"Unexpected error sending {description} to Slack: {e}", exc_info=True)
+
+
+def _submit_slack_payload(webhook_url: str, payload, description: str, timeout: int = 5):
+    """Slack Webhookへの送信をバックグラウンドに投入（呼び出し元は送信完了を待たない）"""
+    return _slack_executor.submit(_post_slack_payload, webhook_url, payload, timeout, description)
+
+
+# Slack通知の表示項目（タイトル, 値のキー, 横並び表示するか）
+_SLACK_RESERVATION_FIELDS = (
+    ("予約ID", "reservation_id", True),
+    ("お客様名", "guest_name", True),
+    ("メールアドレス", "guest_email", True),
+    ("電話番号", "guest_phone", True),
+    ("店舗名", "studio_name", True),
+    ("予約日時", "reservation_datetime", True),
+    ("施術コース", "program_name", False),
+)
+_SLACK_ERROR_FIELDS = (
+    ("エラーコード", "error_code", True),
+    ("エラーメッセージ", "error_message", False),
+    ("お客様名", "guest_name", True),
+    ("メールアドレス", "guest_email", True),
+    ("電話番号", "guest_phone", True),
+    ("店舗名", "studio_name", True),
+)
+
+# ステータスごとの表示（色, タイトル, 表示項目）
+_SLACK_NOTIFICATION_STYLES = {
+    "success": ("good", "✅ 予約成功", _SLACK_RESERVATION_FIELDS),  # 緑色
+    "cancel": ("warning", "⚠️ 予約キャンセル", _SLACK_RESERVATION_FIELDS),  # オレンジ色
+}
+_SLACK_ERROR_STYLE = ("danger", "❌ 予約失敗", _SLACK_ERROR_FIELDS)  # 赤色
+
+
 def send_slack_notification(
     status: str,  # "success", "error", or "cancel"
     reservation_id: int = None,
@@ -1400,132 +2163,51 @@ def send_slack_notification(
         error_message: エラーメッセージ（エラー時）
         error_code: エラーコード（エラー時）
     """
-    webhook_url = os.environ.get("SLACK_WEBHOOK_URL")
+    if not _SLACK_ENABLED:
+        logger.warning("SLACK_WEBHOOK_URL is not set, skipping Slack notification")
+        return
 
     logger.info(f"Slack notification called: status={status}, reservation_id={reservation_id}, guest_name={guest_name}")
+    # ペイロードの組み立て・ログ出力も含めて送信スレッドに任せ、呼び出し元（予約API）はすぐに戻る
+    _slack_executor.submit(
+        _send_slack_notification, status, reservation_id, guest_name, guest_email, guest_phone,
+        studio_name, reservation_date, reservation_time, program_name, error_message, error_code
+    )
 
-    if not webhook_url:
-        logger.warning("SLACK_WEBHOOK_URL is not set, skipping Slack notification")
-        return
 
+def _send_slack_notification(
+    status: str,
+    reservation_id: int,
+    guest_name: str,
+    guest_email: str,
+    guest_phone: str,
+    studio_name: str,
+    reservation_date: str,
+    reservation_time: str,
+    program_name: str,
+    error_message: str,
+    error_code: str
+):
+    """Slack通知のペイロードを組み立てて送信（_slack_executor 上で実行される）"""
     logger.info(f"SLACK_WEBHOOK_URL is set, sending notification to Slack")
 
     try:
-        if status == "success":
-            color = "good"  # 緑色
-            title = "✅ 予約成功"
-            fields = [
-                {
-                    "title": "予約ID",
-                    "value": str(reservation_id) if reservation_id else "N/A",
-                    "short": True
-                },
-                {
-                    "title": "お客様名",
-                    "value": guest_name or "N/A",
-                    "short": True
-                },
-                {
-                    "title": "メールアドレス",
-                    "value": guest_email or "N/A",
-                    "short": True
-                },
-                {
-                    "title": "電話番号",
-                    "value": guest_phone or "N/A",
-                    "short": True
-                },
-                {
-                    "title": "店舗名",
-                    "value": studio_name or "N/A",
-                    "short": True
-                },
-                {
-                    "title": "予約日時",
-                    "value": f"{reservation_date} {reservation_time}" if reservation_date and reservation_time else "N/A",
-                    "short": True
-                },
-                {
-                    "title": "施術コース",
-                    "value": program_name or "N/A",
-                    "short": False
-                }
-            ]
-        elif status == "cancel":
-            color = "warning"  # オレンジ色
-            title = "⚠️ 予約キャンセル"
-            fields = [
-                {
-                    "title": "予約ID",
-                    "value": str(reservation_id) if reservation_id else "N/A",
-                    "short": True
-                },
-                {
-                    "title": "お客様名",
-                    "value": guest_name or "N/A",
-                    "short": True
-                },
-                {
-                    "title": "メールアドレス",
-                    "value": guest_email or "N/A",
-                    "short": True
-                },
-                {
-                    "title": "電話番号",
-                    "value": guest_phone or "N/A",
-                    "short": True
-                },
-                {
-                    "title": "店舗名",
-                    "value": studio_name or "N/A",
-                    "short": True
-                },
-                {
-                    "title": "予約日時",
-                    "value": f"{reservation_date} {reservation_time}" if reservation_date and reservation_time else "N/A",
-                    "short": True
-                },
-                {
-                    "title": "施術コース",
-                    "value": program_name or "N/A",
-                    "short": False
-                }
-            ]
-        else:  # error
-            color = "danger"  # 赤色
-            title = "❌ 予約失敗"
-            fields = [
-                {
-                    "title": "エラーコード",
-                    "value": error_code or "N/A",
-                    "short": True
-                },
-                {
-                    "title": "エラーメッセージ",
-                    "value": error_message or "N/A",
-                    "short": False
-                },
-                {
-                    "title": "お客様名",
-                    "value": guest_name or "N/A",
-                    "short": True
-                },
-                {
-                    "title": "メールアドレス",
-                    "value": guest_email or "N/A",
-                    "short": True
-                },
-                {
-                    "title": "電話番号",
-                    "value": guest_phone or "N/A",
-                    "short": True
-                },
-                {
-                    "title": "店舗名",
-                    "value": studio_name or "N/A",
-                    "short": True
-                }
-            ]
+        color, title, field_table = _SLACK_NOTIFICATION_STYLES.get(status, _SLACK_ERROR_STYLE)
+        field_values = {
+            "reservation_id": str(reservation_id) if reservation_id else "",
+            "guest_name": guest_name,
+            "guest_email": guest_email,
+            "guest_phone": guest_phone,
+            "studio_name": studio_name,
+            "reservation_datetime": f"{reservation_date} {reservation_time}" if reservation_date and reservation_time else "",
+            "program_name": program_name,
+            "error_code": error_code,
+            "error_message": error_message
+        }
+        fields = [
+            {"title": field_title, "value": field_values[key] or "N/A", "short": short}
+            for field_title, key, short in field_table
+        ]
 
         # フォールバック用のテキストサマリーを生成
         if status == "success":
@@ -1543,24 +2225,16 @@ def send_slack_notification(
                     "title": title,
                     "fields": fields,
                     "footer": "Happle Reservation System",
-                    "ts": int(datetime.now().timestamp())
+                    "ts": int(time.time())
                 }
             ]
         }
         
-        logger.info(f"Sending Slack notification payload: {json.dumps(payload, ensure_ascii=False)}")
-        response = requests.post(
-            webhook_url,
-            json=payload,
-            timeout=5
-        )
-        response.raise_for_status()
-        logger.info(f"Slack notification sent successfully (status: {status}, response_status: {response.status_code})")
+        # ログ出力と送信で同じシリアライズ結果を使う
+        payload_json = _json_dumps_bytes(payload)
+        logger.info("Sending Slack notification payload: %s", _LazyJsonLog(payload_json))
+        _post_slack_payload(_SLACK_WEBHOOK_URL, payload_json, 5, f"Slack notification (status: {status})")
         
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to send Slack notification: {e}, response: {getattr(e, 'response', None)}")
-        if hasattr(e, 'response') and e.response is not None:
-            logger.error(f"Response status: {e.response.status_code}, body: {e.response.text}")
     except Exception as e:
         logger.error(f"Unexpected error sending Slack notification: {e}", exc_info=True)
 
@@ -1698,8 +2372,7 @@ def append_reservation_to_spreadsheet(
             return
         
         # 記録日時（日本時刻 JST = UTC+9）
-        jst = timezone(timedelta(hours=9))
-        recorded_at = datetime.now(jst).strftime("%Y-%m-%d %H:%M:%S")
+        recorded_at = datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
         
         # ステータス
         status_text = "予約成功" if status == "success" else "予約失敗"
@@ -1749,11 +2422,11 @@ def send_spreadsheet_error_to_slack(
     
     予約処理自体には影響を与えずに、エラーを通知するための関数
     """
-    webhook_url = os.environ.get("SLACK_WEBHOOK_URL")
-    
-    if not webhook_url:
+    if not _SLACK_ENABLED:
         return
     
+    webhook_url = _SLACK_WEBHOOK_URL
+    
     try:
         payload = {
             "text": "⚠️ スプレッドシート書き込みエラー",
@@ -1779,14 +2452,12 @@ def send_spreadsheet_error_to_slack(
                         }
                     ],
                     "footer": "予約は正常に完了しています",
-                    "ts": int(datetime.now().timestamp())
+                    "ts": int(time.time())
                 }
             ]
         }
         
-        response = requests.post(webhook_url, json=payload, timeout=5)
-        response.raise_for_status()
-        logger.info(f"Spreadsheet error notification sent to Slack for reservation {reservation_id}")
+        _submit_slack_payload(webhook_url, payload, f"Spreadsheet error notification for reservation {reservation_id}")
         
     except Exception as e:
         logger.error(f"Failed to send spreadsheet error notification to Slack: {e}")
@@ -1814,12 +2485,12 @@ def send_email_log_to_slack(
         reservation_date: 予約日
         reservation_time: 予約時間
     """
-    webhook_url = os.environ.get("SLACK_WEBHOOK_URL")
-    
-    if not webhook_url:
+    if not _SLACK_ENABLED:
         logger.warning("SLACK_WEBHOOK_URL is not set, skipping email log notification")
         return
     
+    webhook_url = _SLACK_WEBHOOK_URL
+    
     try:
         if email_result.get("success"):
             color = "#36a64f"  # 緑色
@@ -1874,7 +2545,7 @@ def send_email_log_to_slack(
                         }
                     ],
                     "footer": "Happle Reservation - Email Service",
-                    "ts": int(datetime.now().timestamp())
+                    "ts": int(time.time())
                 },
                 {
                     "color": "#0066cc",
@@ -1885,12 +2556,8 @@ def send_email_log_to_slack(
             ]
         }
         
-        response = requests.post(webhook_url, json=payload, timeout=10)
-        response.raise_for_status()
-        logger.info(f"Email log notification sent to Slack for reservation {reservation_id}")
+        _submit_slack_payload(webhook_url, payload, f"Email log notification for reservation {reservation_id}", timeout=10)
         
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to send email log to Slack: {e}")
     except Exception as e:
         logger.error(f"Unexpected error sending email log to Slack: {e}")
 
@@ -2211,11 +2878,12 @@ def cache_status():
         return jsonify({"error": "Unauthorized"}), 401
     
     now = datetime.now()
+    now_monotonic = time.monotonic()  # キャッシュ時刻は time.monotonic() で記録している
     
     # choice_scheduleキャッシュの状態
     choice_schedule_entries = []
     for cache_key, cached_time in _choice_schedule_cache_time.items():
-        age_seconds = (now - cached_time).total_seconds()
+        age_seconds = now_monotonic - cached_time
         choice_schedule_entries.append({
             "key": cache_key,
             "age_seconds": round(age_seconds, 1),
@@ -2225,7 +2893,7 @@ def cache_status():
     # choice_schedule_rangeキャッシュの状態
     range_cache_entries = []
     for cache_key, cached_time in _choice_schedule_range_cache_time.items():
-        age_seconds = (now - cached_time).total_seconds()
+        age_seconds = now_monotonic - cached_time
         range_cache_entries.append({
             "key": cache_key,
             "age_seconds": round(age_seconds, 1),
@@ -2247,19 +2915,57 @@ def cache_status():
         "studios_cache": {
             "count": 1 if _studios_cache else 0,
             "ttl_seconds": STUDIOS_CACHE_TTL_SECONDS,
-            "age_seconds": round((now - _studios_cache_time).total_seconds(), 1) if _studios_cache_time else None
+            "age_seconds": round(now_monotonic - _studios_cache_time, 1) if _studios_cache_time else None
         },
         "programs_cache": {
             "count": len(_programs_cache_by_studio),
             "ttl_seconds": PROGRAMS_CACHE_TTL_SECONDS
         },
+        "program_detail_cache": {
+            "count": len(_program_detail_cache),
+            "ttl_seconds": PROGRAM_DETAIL_CACHE_TTL_SECONDS
+        },
+        "instructors_cache": {
+            "count": len(_instructors_cache_by_studio),
+            "ttl_seconds": INSTRUCTORS_CACHE_TTL_SECONDS
+        },
         "studio_rooms_cache": {
             "count": len(_studio_rooms_cache_by_studio),
             "ttl_seconds": STUDIO_ROOMS_CACHE_TTL_SECONDS
+        },
+        "studio_room_spaces_cache": {
+            "count": 1 if _studio_room_spaces_cache else 0,
+            "ttl_seconds": STUDIO_ROOM_SPACES_CACHE_TTL_SECONDS,
+            "age_seconds": round(now_monotonic - _studio_room_spaces_cache_time, 1) if _studio_room_spaces_cache_time else None
         }
     })
 
 
+@app.route("/api/cache/master/clear", methods=["POST"])
+def clear_master_cache():
+    """マスタ詳細キャッシュ（店舗・プログラム・スタジオルーム）とスタッフ一覧キャッシュを破棄
+    
+    hacomonoクライアントのキャッシュに加え、アプリ側のプログラム詳細・スタッフ一覧キャッシュも破棄する。
+    
+    認証: X-Cache-Refresh-Key ヘッダーでシークレットキーを検証
+    """
+    # シークレットキーで認証
+    secret_key = request.headers.get("X-Cache-Refresh-Key")
+    expected_key = os.environ.get("CACHE_REFRESH_SECRET_KEY")
+    
+    if not expected_key or secret_key != expected_key:
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    cleared = get_hacomono_client().clear_master_cache()
+    cleared += len(_program_detail_cache) + len(_instructors_cache_by_studio)
+    _program_detail_cache.clear()
+    _program_detail_cache_time.clear()
+    _instructors_cache_by_studio.clear()
+    _instructors_cache_time_by_studio.clear()
+    logger.info(f"Cleared {cleared} master cache entries")
+    return jsonify({"success": True, "cleared": cleared})
+
+
 # ==================== Webhook API ====================
 
 def verify_hacomono_webhook_signature(body: bytes, x_webhook_event: str, secret: str) -> tuple[bool, str]:
@@ -2289,7 +2995,7 @@ def verify_hacomono_webhook_signature(body: bytes, x_webhook_event: str, secret:
         
         # タイムスタンプの検証（5分以内のリクエストのみ受け付け）
         # hacomonoはJSTでタイムスタンプを送信するため、ローカル時刻で比較
-        current_time = int(datetime.now().timestamp())
+        current_time = int(time.time())
         if abs(current_time - timestamp) > 300:  # 5分 = 300秒
             logger.warning(f"Webhook timestamp too old: {timestamp}, current: {current_time}")
             return False, "Timestamp too old (possible replay attack)"
@@ -2414,6 +3120,33 @@ def hacomono_webhook():
 
 # ==================== 店舗 API ====================
 
+MASTER_DATA_CACHE_CONTROL = "public, max-age=30"  # 全利用者共通のマスタデータ向けの短いブラウザ/CDNキャッシュ
+
+
+def _make_master_data_response(payload: dict, cache_hit: bool):
+    """マスタデータのレスポンスを作成（X-Cache・ETag を付与し、If-None-Match が一致すれば 304）"""
+    body = _json_dumps_bytes(payload)
+    response = app.response_class(body, mimetype="application/json")
+    response.headers["X-Cache"] = "HIT" if cache_hit else "MISS"
+    response.headers["Cache-Control"] = MASTER_DATA_CACHE_CONTROL
+    # 圧縮後も照合できるよう弱いETagを使う（_make_conditional_schedule_response と同様）
+    response.set_etag(_compute_json_etag((body,)), weak=True)
+    return response.make_conditional(request)
+
+
+def _studio_summary(studio: dict) -> dict:
+    """店舗一覧・詳細APIで返す項目のみを抽出"""
+    get = studio.get
+    return {
+        "id": get("id"),
+        "name": get("name"),
+        "code": get("code"),
+        "address": f"{get('prefecture', '')} {get('address1', '')} {get('address2', '')}".strip(),
+        "tel": get("tel"),
+        "business_hours": get("business_hours")
+    }
+
+
 @app.route("/api/studios", methods=["GET"])
 @handle_errors
 def get_studios():
@@ -2424,18 +3157,7 @@ def get_studios():
     studios = get_cached_studios(client)
     
     # 必要な情報のみ抽出
-    result = []
-    for studio in studios:
-        result.append({
-            "id": studio.get("id"),
-            "name": studio.get("name"),
-            "code": studio.get("code"),
-            "address": f"{studio.get('prefecture', '')} {studio.get('address1', '')} {studio.get('address2', '')}".strip(),
-            "tel": studio.get("tel"),
-            "business_hours": studio.get("business_hours")
-        })
-    
-    return jsonify({"studios": result})
+    return jsonify({"studios": [_studio_summary(studio) for studio in studios]})
 
 
 @app.route("/api/studios/<int:studio_id>", methods=["GET"])
@@ -2447,20 +3169,33 @@ def get_studio(studio_id: int):
     
     studio = response.get("data", {}).get("studio", {})
     
-    return jsonify({
-        "studio": {
-            "id": studio.get("id"),
-            "name": studio.get("name"),
-            "code": studio.get("code"),
-            "address": f"{studio.get('prefecture', '')} {studio.get('address1', '')} {studio.get('address2', '')}".strip(),
-            "tel": studio.get("tel"),
-            "business_hours": studio.get("business_hours")
-        }
-    })
+    return jsonify({"studio": _studio_summary(studio)})
 
 
 # ==================== スタッフ API ====================
 
+# スタッフ一覧APIで返す項目（項目名, 値がないときの既定値）
+_INSTRUCTOR_FIELDS = (
+    ("id", None),
+    ("name", None),
+    ("code", None),
+    ("studio_ids", []),
+    ("studio_room_ids", []),  # 予約カテゴリへの紐付け
+    ("program_ids", []),  # プログラムへの紐付け
+    ("selectable_studio_room_details", []),
+    ("is_hide_from_member_site", False),
+)
+
+
+def _get_instructor_fields() -> tuple:
+    """fields パラメータ（例: fields=id,name）を解析し、返す項目を定義順で返す（未指定なら全項目）"""
+    fields = request.args.get("fields")
+    if not fields:
+        return _INSTRUCTOR_FIELDS
+    requested = frozenset(field.strip() for field in fields.split(","))
+    return tuple(item for item in _INSTRUCTOR_FIELDS if item[0] in requested)
+
+
 @app.route("/api/instructors", methods=["GET"])
 @handle_errors
 def get_instructors():
@@ -2469,28 +3204,17 @@ def get_instructors():
     
     studio_id = request.args.get("studio_id", type=int)
     
-    query = {"is_active": True}
-    if studio_id:
-        query["studio_id"] = studio_id
-    
-    response = client.get_instructors(query)
-    
-    instructors = response.get("data", {}).get("instructors", {}).get("list", [])
+    # キャッシュから取得（60秒間有効、店舗ごと）
+    instructors, cache_hit = get_cached_instructors(client, studio_id)
     
-    result = []
-    for instructor in instructors:
-        result.append({
-            "id": instructor.get("id"),
-            "name": instructor.get("name"),
-            "code": instructor.get("code"),
-            "studio_ids": instructor.get("studio_ids", []),
-            "studio_room_ids": instructor.get("studio_room_ids", []),  # 予約カテゴリへの紐付け
-            "program_ids": instructor.get("program_ids", []),  # プログラムへの紐付け
-            "selectable_studio_room_details": instructor.get("selectable_studio_room_details", []),
-            "is_hide_from_member_site": instructor.get("is_hide_from_member_site", False),
-        })
+    # fields パラメータで指定された項目のみ返す（未指定なら全項目）
+    fields = _get_instructor_fields()
+    result = [
+        {field: instructor.get(field, default) for field, default in fields}
+        for instructor in instructors
+    ]
     
-    return jsonify({"instructors": result})
+    return _make_master_data_response({"instructors": result}, cache_hit)
 
 
 # ==================== プログラム API ====================
@@ -2535,13 +3259,11 @@ def get_programs():
 @app.route("/api/programs/<int:program_id>", methods=["GET"])
 @handle_errors
 def get_program(program_id: int):
-    """プログラム詳細を取得"""
+    """プログラム詳細を取得（60秒間キャッシュ）"""
     client = get_hacomono_client()
-    response = client.get_program(program_id)
+    program, cache_hit = get_cached_program(client, program_id)
     
-    program = response.get("data", {}).get("program", {})
-    
-    return jsonify({
+    return _make_master_data_response({
         "program": {
             "id": program.get("id"),
             "name": program.get("name"),
@@ -2561,7 +3283,7 @@ def get_program(program_id: int):
             "selectable_instructor_details": program.get("selectable_instructor_details"),
             "selectable_resource_details": program.get("selectable_resource_details"),
         }
-    })
+    }, cache_hit)
 
 
 @app.route("/api/tickets", methods=["GET"])
@@ -2612,30 +3334,19 @@ def get_available_instructors():
         shift_instructors = schedule.get("shift_instructor", [])
         reserved_instructors = schedule.get("reservation_assign_instructor", [])
         
-        # 開始日時を構築
-        start_datetime = datetime.strptime(f"{date} {start_time}", "%Y-%m-%d %H:%M:%S")
+        # 開始日時を構築（JSTとして解釈し、UNIX時刻で比較する）
+        start_datetime = datetime.fromisoformat(f"{date}T{start_time}")
         end_datetime = start_datetime + timedelta(minutes=duration_minutes)
+        start_ts = start_datetime.replace(tzinfo=JST).timestamp()
+        end_ts = end_datetime.replace(tzinfo=JST).timestamp()
         
         # 予約済みのスタッフIDを取得（時間が重なっているもの）
-        # 休憩ブロック（reservation_typeがBREAKやBLOCKなど）も予約不可として扱う
-        reserved_instructor_ids = set()
-        for reserved in reserved_instructors:
-            try:
-                reserved_start_str = reserved.get("start_at", "")
-                reserved_end_str = reserved.get("end_at", "")
-                if not reserved_start_str or not reserved_end_str:
-                    continue
-                reserved_start = datetime.fromisoformat(reserved_start_str.replace("Z", "+00:00"))
-                reserved_end = datetime.fromisoformat(reserved_end_str.replace("Z", "+00:00"))
-                # 時間が重なっているかチェック
-                # 休憩ブロック（reservation_typeがBREAK、BLOCK、RESTなど）も予約不可として扱う
-                reservation_type = reserved.get("reservation_type", "").upper()
-                is_block = reservation_type in ["BREAK", "BLOCK", "REST", "休憩", "ブロック"]
-                if start_datetime < reserved_end and end_datetime > reserved_start:
-                    reserved_instructor_ids.add(reserved.get("entity_id"))
-            except Exception as e:
-                logger.warning(f"Failed to parse reserved instructor time: {e}")
-                continue
+        # 休憩ブロック（reservation_typeがBREAKやBLOCKなど）も予約と同様に予約不可として扱う
+        # スタッフごとの埋まっている時間帯にまとめ、重なり判定は二分探索で行う
+        reserved_instructor_ids = {
+            entity_id for entity_id, busy_intervals in _build_busy_intervals(reserved_instructors).items()
+            if _overlaps_busy_intervals(busy_intervals, start_ts, end_ts)
+        }
         
         # 空いているスタッフを抽出
         available_instructors = []
@@ -2646,19 +3357,17 @@ def get_available_instructors():
                 instructor_end_str = instructor.get("end_at", "")
                 if not instructor_start_str or not instructor_end_str:
                     continue
-                instructor_start = datetime.fromisoformat(instructor_start_str.replace("Z", "+00:00"))
-                instructor_end = datetime.fromisoformat(instructor_end_str.replace("Z", "+00:00"))
                 
                 # シフト時間内で、予約が入っていないスタッフ
-                if (instructor_start <= start_datetime < instructor_end and 
-                    instructor_id not in reserved_instructor_ids):
+                if (instructor_id not in reserved_instructor_ids and
+                    _iso_to_timestamp(instructor_start_str) <= start_ts < _iso_to_timestamp(instructor_end_str)):
                     available_instructors.append({
                         "id": instructor_id,
                         "start_at": instructor.get("start_at"),
                         "end_at": instructor.get("end_at")
                     })
             except Exception as e:
-                logger.warning(f"Failed to parse instructor time: {e}")
+                logger.warning("Failed to parse instructor time: %s", e)
                 continue
         
         return jsonify({
@@ -2672,35 +3381,75 @@ def get_available_instructors():
 
 # ==================== スケジュール API ====================
 
-# 予約可能なスペースIDのキャッシュ（space_detailsにnoフィールドがあるスペース）
-_reservable_space_ids_cache = None
+def _load_studio_room_spaces(client) -> tuple:
+    """スペース一覧を取得し、予約可能なスペースIDと席数を1回の走査で求めてキャッシュを更新"""
+    global _studio_room_spaces_cache, _studio_room_spaces_cache_time
+    
+    response = client.get("/master/studio-room-spaces")
+    spaces = response.get("data", {}).get("studio_room_spaces", {}).get("list", [])
+    
+    reservable_ids = set()
+    capacities = {}
+    for space in spaces:
+        space_id = space.get("id")
+        space_details = space.get("space_details", [])
+        # noフィールドがあるdetailの数がcapacity（1つ以上あれば予約可能なスペース）
+        valid_count = sum(1 for detail in space_details if detail.get("no") is not None)
+        if valid_count:
+            reservable_ids.add(space_id)
+            capacities[space_id] = valid_count
+            logger.debug(f"Reservable space: ID={space_id} name={space.get('name')}")
+    
+    _studio_room_spaces_cache = (reservable_ids, capacities)
+    _studio_room_spaces_cache_time = time.monotonic()
+    logger.info("Found %s reservable spaces: %s", len(reservable_ids), reservable_ids)
+    return _studio_room_spaces_cache
+
+
+def _refresh_studio_room_spaces(client):
+    """スペース情報をバックグラウンドで再取得（失敗時は古いキャッシュを使い続ける）"""
+    try:
+        _load_studio_room_spaces(client)
+    except Exception as e:
+        logger.warning(f"Failed to refresh studio room spaces: {e}")
+    finally:
+        _studio_room_spaces_refresh_lock.release()
+
 
-def _get_reservable_space_ids(client):
-    """予約可能なスペースIDを取得（space_detailsにnoフィールドがあるもの）"""
-    global _reservable_space_ids_cache
+def get_cached_studio_room_spaces(client):
+    """予約可能なスペースIDと席数をキャッシュ付きで取得（5分間）
+    
+    期限切れ時は古いキャッシュをそのまま返し、再取得はバックグラウンドで1スレッドだけが行う。
     
-    if _reservable_space_ids_cache is not None:
-        return _reservable_space_ids_cache
+    Returns:
+        (reservable_space_ids, space_capacities) のタプル。
+        キャッシュがなく取得にも失敗した場合は None
+    """
+    cached = _studio_room_spaces_cache
+    if cached is not None:
+        if time.monotonic() - _studio_room_spaces_cache_time >= STUDIO_ROOM_SPACES_CACHE_TTL_SECONDS:
+            if _studio_room_spaces_refresh_lock.acquire(blocking=False):
+                try:
+                    run_in_background(_refresh_studio_room_spaces, client)
+                except Exception:
+                    _studio_room_spaces_refresh_lock.release()
+                    raise
+        return cached
     
     try:
-        response = client.get("/master/studio-room-spaces")
-        spaces = response.get("data", {}).get("studio_room_spaces", {}).get("list", [])
-        
-        reservable_ids = set()
-        for space in spaces:
-            space_details = space.get("space_details", [])
-            # space_detailsにnoフィールドがあるかチェック
-            has_no = any(detail.get("no") is not None for detail in space_details)
-            if has_no:
-                reservable_ids.add(space.get("id"))
-                logger.debug(f"Reservable space: ID={space.get('id')} name={space.get('name')}")
-        
-        _reservable_space_ids_cache = reservable_ids
-        logger.info(f"Found {len(reservable_ids)} reservable spaces: {reservable_ids}")
-        return reservable_ids
+        return _load_studio_room_spaces(client)
     except Exception as e:
-        logger.warning(f"Failed to get reservable spaces: {e}, using fallback")
+        logger.warning(f"Failed to get studio room spaces: {e}")
+        return None
+
+
+def _get_reservable_space_ids(client):
+    """予約可能なスペースIDを取得（space_detailsにnoフィールドがあるもの）"""
+    cached = get_cached_studio_room_spaces(client)
+    if cached is None:
+        logger.warning("Failed to get reservable spaces, using fallback")
         return {3}  # フォールバック
+    return cached[0]
 
 
 def _parse_lessons(lessons, studio_id=None, program_id=None, reservable_space_ids=None, 
@@ -2708,55 +3457,67 @@ def _parse_lessons(lessons, studio_id=None, program_id=None, reservable_space_id
     """レッスンデータを解析して整形
     
     Args:
+        studio_id / program_id: 念のための絞り込み。hacomonoのクエリで絞り込める場合はそちらを優先し、ここには渡さない
         space_capacities: {space_id: capacity} スペースIDごとの席数
         reservation_counts: {lesson_id: count} レッスンIDごとの予約数
     """
-    result = []
+    space_capacities = space_capacities or {}
+    reservation_counts = reservation_counts or {}
+    # ループ内で変わらないフィルタ条件は先に確定させておく
+    reservable_space_ids = frozenset(reservable_space_ids) if reservable_space_ids else None
+    
+    # (start_at, 整形済みレッスン) を1回の走査で作り、ソートはキーのみで行う
+    # フィルタで除外されるレッスンについては出力用のdictを作らない
+    tagged = []
     for lesson in lessons:
+        get = lesson.get
+        
         # studio_idフィルタ
-        if studio_id and lesson.get("studio_id") != studio_id:
+        if studio_id and get("studio_id") != studio_id:
             continue
         
         # program_idフィルタ
-        if program_id and lesson.get("program_id") != program_id:
+        if program_id and get("program_id") != program_id:
             continue
         
         # 予約可能なスペースのみフィルタ（space_detailsにnoフィールドがあるスペース）
-        space_id = lesson.get("studio_room_space_id")
-        if reservable_space_ids:
-            if space_id and space_id not in reservable_space_ids:
-                continue
+        space_id = get("studio_room_space_id")
+        if reservable_space_ids is not None and space_id and space_id not in reservable_space_ids:
+            continue
         
         # スペース情報からcapacityを取得
-        if space_capacities and space_id in space_capacities:
-            capacity = space_capacities[space_id]
-        else:
-            capacity = lesson.get("capacity") or lesson.get("max_num") or 5
+        capacity = space_capacities.get(space_id)
+        if capacity is None:
+            capacity = get("capacity") or get("max_num") or 5
         
         # 予約一覧から予約数を取得
-        lesson_id = lesson.get("id")
-        if reservation_counts and lesson_id in reservation_counts:
-            reserved = reservation_counts[lesson_id]
-        else:
-            reserved = lesson.get("reserved_count") or lesson.get("reserved_num") or 0
-        
-        result.append({
+        lesson_id = get("id")
+        reserved = reservation_counts.get(lesson_id)
+        if reserved is None:
+            reserved = get("reserved_count") or get("reserved_num") or 0
+        
+        program = get("program")
+        instructor = get("instructor")
+        start_at = get("start_at")
+        available = max(0, capacity - reserved)  # 空き席数（0未満にはしない）
+        tagged.append((start_at or "", {
             "id": lesson_id,
-            "studio_id": lesson.get("studio_id"),
-            "program_id": lesson.get("program_id"),
-            "program_name": lesson.get("program", {}).get("name") if isinstance(lesson.get("program"), dict) else None,
-            "instructor_id": lesson.get("instructor_id"),
-            "instructor_name": lesson.get("instructor", {}).get("name") if isinstance(lesson.get("instructor"), dict) else None,
-            "start_at": lesson.get("start_at"),
-            "end_at": lesson.get("end_at"),
+            "studio_id": get("studio_id"),
+            "program_id": get("program_id"),
+            "program_name": program.get("name") if isinstance(program, dict) else None,
+            "instructor_id": get("instructor_id"),
+            "instructor_name": instructor.get("name") if isinstance(instructor, dict) else None,
+            "start_at": start_at,
+            "end_at": get("end_at"),
             "capacity": capacity,
             "reserved_count": reserved,
-            "available": max(0, capacity - reserved),
-            "is_reservable": lesson.get("is_reservable", True) and (capacity - reserved) > 0
-        })
+            "available": available,
+            "is_reservable": get("is_reservable", True) and available > 0
+        }))
     
-    # 日付順でソート
-    result.sort(key=lambda x: x.get("start_at", ""))
+    # 日付順でソート（安定ソートのため同時刻は元の順序を維持）
+    tagged.sort(key=itemgetter(0))
+    result = [lesson_data for _, lesson_data in tagged]
     return result
 
 
@@ -2787,45 +3548,50 @@ def get_schedule_all():
 
 def _get_space_capacities(client) -> dict:
     """スペースIDごとの席数を取得"""
-    try:
-        response = client.get_studio_room_spaces()
-        spaces = response.get("data", {}).get("studio_room_spaces", {}).get("list", [])
-        
-        capacities = {}
-        for space in spaces:
-            space_id = space.get("id")
-            space_details = space.get("space_details", [])
-            # noフィールドがあるdetailの数がcapacity
-            valid_details = [d for d in space_details if d.get("no") is not None]
-            if valid_details:
-                capacities[space_id] = len(valid_details)
-        
-        return capacities
-    except Exception as e:
-        logger.warning(f"Failed to get space capacities: {e}")
+    cached = get_cached_studio_room_spaces(client)
+    if cached is None:
         return {}
+    return cached[1]
 
 
-def _get_reservation_counts(client, lesson_ids: list) -> dict:
-    """レッスンIDごとの予約数を取得"""
+# 予約数の集計で取得する最大ページ数（日付の絞り込みが効かなかった場合に全予約を走査しないための上限）
+RESERVATION_COUNT_MAX_PAGES = int(os.environ.get("RESERVATION_COUNT_MAX_PAGES", "50"))
+
+
+def _count_lesson_reservations(client, date_from: str = None, date_to: str = None) -> Counter:
+    """対象期間の予約済み件数をレッスンIDごとに集計
+    
+    対象期間（date_from / date_to）はhacomono側で絞り込み、予約一覧はページ単位で取得しながら数える。
+    status 2=確定, 3=完了 を予約済みとしてカウントする。
+    """
+    query = {}
+    if date_from:
+        query["date_from"] = date_from
+    if date_to:
+        query["date_to"] = date_to
+    return Counter(
+        r.get("studio_lesson_id")
+        for r in client.iter_reservations(query or None, max_pages=RESERVATION_COUNT_MAX_PAGES)
+        if r.get("status") in (2, 3)
+    )
+
+
+def _get_reservation_counts(client, lesson_ids: list, counts_future=None) -> dict:
+    """レッスンIDごとの予約数を取得
+    
+    Args:
+        counts_future: 先行して投入した _count_lesson_reservations の Future（省略時はここで集計）
+    """
     if not lesson_ids:
         return {}
     
     try:
-        # 予約一覧を取得（status=2: 確定済み のみカウント）
-        response = client.get("/reservation/reservations")
-        reservations = response.get("data", {}).get("reservations", {}).get("list", [])
-        
-        counts = {}
-        for r in reservations:
-            lesson_id = r.get("studio_lesson_id")
-            status = r.get("status")
-            # status 2=確定, 3=完了 を予約済みとしてカウント
-            if lesson_id and status in [2, 3]:
-                if lesson_id in lesson_ids:
-                    counts[lesson_id] = counts.get(lesson_id, 0) + 1
-        
-        return counts
+        if counts_future is not None:
+            all_counts = counts_future.result()
+        else:
+            all_counts = _count_lesson_reservations(client)
+        
+        return {lesson_id: all_counts[lesson_id] for lesson_id in frozenset(lesson_ids) if lesson_id in all_counts}
     except Exception as e:
         logger.warning(f"Failed to get reservation counts: {e}")
         return {}
@@ -2848,9 +3614,9 @@ def get_schedule():
     if not end_date:
         end_date = (datetime.now() + timedelta(days=14)).strftime("%Y-%m-%d")
     
-    # 予約可能なスペースIDとcapacityを取得
-    reservable_space_ids = _get_reservable_space_ids(client)
-    space_capacities = _get_space_capacities(client)
+    # 互いに依存しないスペース情報の取得・予約数の集計を、レッスン取得と並列に開始
+    reservable_space_ids_future = _schedule_executor.submit(_get_reservable_space_ids, client)
+    reservation_counts_future = _schedule_executor.submit(_count_lesson_reservations, client, start_date, end_date)
     
     # hacomono APIのdate_from/date_toクエリを使用
     query = {}
@@ -2867,10 +3633,15 @@ def get_schedule():
     # レッスンIDのリストを作成
     lesson_ids = [l.get("id") for l in lessons if l.get("id")]
     
+    # 予約可能なスペースIDとcapacityを取得（capacityは直前の取得でキャッシュ済み）
+    reservable_space_ids = reservable_space_ids_future.result()
+    space_capacities = _get_space_capacities(client)
+    
     # 予約数を取得
-    reservation_counts = _get_reservation_counts(client, lesson_ids)
+    reservation_counts = _get_reservation_counts(client, lesson_ids, reservation_counts_future)
     
-    result = _parse_lessons(lessons, studio_id, program_id, reservable_space_ids,
+    # studio_id はhacomonoのクエリで絞り込み済みのため、ここでは再チェックしない
+    result = _parse_lessons(lessons, None, program_id, reservable_space_ids,
                             space_capacities, reservation_counts)
     
     return jsonify({
@@ -2887,6 +3658,24 @@ def get_schedule():
 
 # ==================== 予約 API ====================
 
+# よくあるエラーコードと日本語メッセージの対応（複数含まれる場合は上にあるものを優先）
+_HACOMONO_ERROR_MESSAGES = {
+    "RSV_000309": "この時間帯は予約できません。営業時間外または予約可能期間外です。",
+    "RSV_000308": "スタッフが設定されていないか、選択したスタッフが無効です。",
+    "RSV_000304": "この時間帯は予約できません。営業時間外または予約枠が満席の可能性があります。",
+    "RSV_000008": "この席は既に予約されています。別の時間帯を選択してください。",
+    "RSV_000005": "予約に必要なチケットがありません。",
+    "RSV_000001": "この枠は既に予約で埋まっています。",
+    "CMN_000051": "必要な情報が不足しています。",
+    "CMN_000025": "電話番号が正しくありません。ハイフンなしの半角数字11桁で入力してください（例: 09012345678）。",
+    "CMN_000022": "このメールアドレスは既に使用されています。",
+    "CMN_000001": "システムエラーが発生しました。スペースの席設定（no）が正しくない可能性があります。",
+}
+
+# 上記エラーコードのいずれかにマッチする正規表現（エラー本文を1回の走査で検索する）
+_HACOMONO_ERROR_CODE_RE = re.compile("|".join(map(re.escape, _HACOMONO_ERROR_MESSAGES)))
+
+
 def _parse_hacomono_error(error: HacomonoAPIError) -> dict:
     """hacomonoエラーをユーザーフレンドリーなメッセージに変換"""
     # response_bodyからエラーコードを抽出
@@ -2896,36 +3685,82 @@ def _parse_hacomono_error(error: HacomonoAPIError) -> dict:
     # response_bodyも含めて検索対象にする
     search_text = f"{error_str} {response_body}"
     
-    # よくあるエラーコードと日本語メッセージの対応
-    error_messages = {
-        "RSV_000309": "この時間帯は予約できません。営業時間外または予約可能期間外です。",
-        "RSV_000308": "スタッフが設定されていないか、選択したスタッフが無効です。",
-        "RSV_000304": "この時間帯は予約できません。営業時間外または予約枠が満席の可能性があります。",
-        "RSV_000008": "この席は既に予約されています。別の時間帯を選択してください。",
-        "RSV_000005": "予約に必要なチケットがありません。",
-        "RSV_000001": "この枠は既に予約で埋まっています。",
-        "CMN_000051": "必要な情報が不足しています。",
-        "CMN_000025": "電話番号が正しくありません。ハイフンなしの半角数字11桁で入力してください（例: 09012345678）。",
-        "CMN_000022": "このメールアドレスは既に使用されています。",
-        "CMN_000001": "システムエラーが発生しました。スペースの席設定（no）が正しくない可能性があります。",
-    }
-    
-    for code, message in error_messages.items():
-        if code in search_text:
-            return {"error_code": code, "user_message": message, "detail": response_body or error_str}
+    found_codes = set(_HACOMONO_ERROR_CODE_RE.findall(search_text))
+    if found_codes:
+        for code, message in _HACOMONO_ERROR_MESSAGES.items():
+            if code in found_codes:
+                return {"error_code": code, "user_message": message, "detail": response_body or error_str}
     
     # エラーコードが見つからない場合、response_bodyからメッセージを抽出
     try:
-        import json
         body_json = json.loads(response_body)
         if body_json.get("errors"):
             api_message = body_json["errors"][0].get("message", "")
             if api_message:
                 return {"error_code": "UNKNOWN", "user_message": api_message, "detail": response_body}
-    except:
+    except (ValueError, TypeError, AttributeError, LookupError):
         pass
     
-    return {"error_code": "UNKNOWN", "user_message": "予約処理中にエラーが発生しました。", "detail": response_body or error_str}
+    return {"error_code": "UNKNOWN", "user_message": "予約処理中にエラーが発生しました。", "detail": response_body or error_str}
+
+
+# 会員の氏名フィールド（姓, 名の順）
+_MEMBER_NAME_KEYS = ("last_name", "first_name")
+_MEMBER_NAME_KANA_KEYS = ("last_name_kana", "first_name_kana")
+
+
+def _member_email_cache_key_for(mail_address: str) -> bytes:
+    """メールアドレスを正規化（小文字化・前後の空白除去）して会員IDキャッシュ用のキーに変換"""
+    normalized = mail_address.strip().lower().encode("utf-8")
+    return hashlib.blake2b(normalized, key=_member_email_cache_key, digest_size=16).digest()
+
+
+def get_cached_member_id(mail_address: str):
+    """登録済みと分かっているメールアドレスの会員IDを返す（キャッシュになければNone）"""
+    if not mail_address:
+        return None
+    email_key = _member_email_cache_key_for(mail_address)
+    with _member_id_by_email_cache_lock:
+        cached_time = _member_id_by_email_cache_time.get(email_key)
+        if cached_time is not None and time.monotonic() - cached_time < MEMBER_EMAIL_CACHE_TTL_SECONDS:
+            return _member_id_by_email_cache.get(email_key)
+    return None
+
+
+def remember_member_id(mail_address: str, member_id: int):
+    """検索・作成で分かったメールアドレスと会員IDの対応をキャッシュ（上限を超えたら古いものから破棄）"""
+    if not mail_address or not member_id:
+        return
+    email_key = _member_email_cache_key_for(mail_address)
+    with _member_id_by_email_cache_lock:
+        _member_id_by_email_cache.pop(email_key, None)
+        _member_id_by_email_cache[email_key] = member_id
+        _member_id_by_email_cache_time[email_key] = time.monotonic()
+        while len(_member_id_by_email_cache) > MEMBER_EMAIL_CACHE_MAX_ENTRIES:
+            oldest = next(iter(_member_id_by_email_cache))
+            _member_id_by_email_cache.pop(oldest, None)
+            _member_id_by_email_cache_time.pop(oldest, None)
+
+
+def _get_members_list(members_response: dict) -> list:
+    """会員検索APIのレスポンスから会員リストを取り出す（{list: [...]} 形式とリスト形式の両方に対応）"""
+    members_data = members_response.get("data", {}).get("members", {})
+    if isinstance(members_data, dict):
+        return members_data.get("list", [])
+    return members_data if isinstance(members_data, list) else []
+
+
+def _format_member_name(member_data: dict, keys: tuple = _MEMBER_NAME_KEYS) -> str:
+    """会員データから「姓 名」形式の表示名を組み立てる（空のフィールドは除外）"""
+    return " ".join(filter(None, (member_data.get(key) for key in keys)))
+
+
+def _generate_member_password() -> str:
+    """ゲスト会員用のランダムパスワードを生成
+    
+    乱数12文字（9バイトをURL安全なBase64で表現）に、記号・大文字・数字を含める固定の接尾辞を付ける。
+    """
+    return secrets.token_urlsafe(9) + "!A1"
 
 
 def _create_guest_member(client, guest_name: str, guest_email: str, guest_phone: str, 
@@ -2943,19 +3778,22 @@ def _create_guest_member(client, guest_name: str, guest_email: str, guest_phone:
         tuple: (member_id, member_ticket_id, generated_password)
                generated_password は新規作成時のみ設定され、既存メンバーの場合は None
     """
-    import secrets
-    import string
     
     member_id = None
     generated_password = None  # 新規登録時のパスワード
     
-    # まず、メールアドレスで既存メンバーを検索
+    # まず、メールアドレスで既存メンバーを検索（直近に登録済みと分かったメールアドレスは検索しない）
+    cached_member_id = get_cached_member_id(guest_email)
+    if cached_member_id is not None:
+        logger.info(f"Found existing member (cached): ID={cached_member_id}, email={guest_email} - rejecting reservation")
+        raise ValueError("このメールアドレスは既に登録されているため、予約できません。別のメールアドレスをご使用ください。")
     try:
         search_response = client.get_members({"keyword": guest_email})
         members = search_response.get("data", {}).get("members", {}).get("list", [])
         for member in members:
             if member.get("mail_address") == guest_email:
                 member_id = member.get("id")
+                remember_member_id(guest_email, member_id)
                 # 既存会員が見つかった場合はエラーを返す
                 logger.info(f"Found existing member: ID={member_id}, email={guest_email} - rejecting reservation")
                 raise ValueError("このメールアドレスは既に登録されているため、予約できません。別のメールアドレスをご使用ください。")
@@ -2986,7 +3824,7 @@ def _create_guest_member(client, guest_name: str, guest_email: str, guest_phone:
             first_name_kana = guest_name_kana or None
         
         # ランダムパスワードを生成
-        random_password = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(12)) + "!A1"
+        random_password = _generate_member_password()
         
         member_data = {
             "last_name": last_name,
@@ -3013,6 +3851,7 @@ def _create_guest_member(client, guest_name: str, guest_email: str, guest_phone:
             raise ValueError("メンバーの作成に失敗しました")
         
         logger.info(f"Created new member ID: {member_id}")
+        remember_member_id(guest_email, member_id)
         # 新規登録成功時にパスワードを保存（メール通知用）
         generated_password = random_password
     
@@ -3029,6 +3868,138 @@ def _create_guest_member(client, guest_name: str, guest_email: str, guest_phone:
     return member_id, member_ticket_id, generated_password
 
 
+def _finalize_fixed_reservation(
+    client: HacomonoClient,
+    reservation_id: int,
+    member_id: int,
+    studio_lesson_id: int,
+    studio_id: int,
+    lesson: dict,
+    lesson_program: dict,
+    lesson_program_id: int,
+    studio_data: dict,
+    studio_contact_info: dict,
+    data: dict,
+    base_url: str,
+    generated_password: str
+):
+    """固定枠予約の作成後処理（確認メール・Slack通知・スプレッドシート記録・店舗スタッフ向けメール）
+    
+    予約作成APIのレスポンスには不要な処理のため、run_in_background から呼び出す。
+    lesson / lesson_program は予約作成前に取得済みのもの（未取得ならNone）。
+    """
+    reservation_date = ""
+    reservation_time = ""
+    duration_minutes = 0
+    studio_name = studio_data.get("name", "")
+    program_name = ""
+    price = 0
+    
+    # 予約確認メールを送信（モック）
+    try:
+        # レッスン情報から詳細を取得（予約作成前に取得済みならそれを使う）
+        if lesson is not None:
+            lesson_data = lesson
+        else:
+            lesson_response = client.get_studio_lesson(studio_lesson_id)
+            lesson_data = lesson_response.get("data", {}).get("studio_lesson", {})
+        
+        # 日時のフォーマット
+        start_at = lesson_data.get("start_at", "")
+        end_at = lesson_data.get("end_at", "")
+        
+        if start_at:
+            try:
+                start_dt = _fromisoformat(start_at)
+                reservation_date = start_dt.strftime("%Y-%m-%d(%a)")
+                reservation_time = start_dt.strftime("%H:%M")
+                if end_at:
+                    end_dt = _fromisoformat(end_at)
+                    duration_minutes = int((end_dt - start_dt).total_seconds() / 60)
+            except:
+                pass
+        
+        # プログラム情報を取得
+        program_id = lesson_data.get("program_id")
+        if program_id:
+            try:
+                if lesson_program is not None and program_id == lesson_program_id:
+                    program_data = lesson_program
+                else:
+                    program_response = client.get_program(program_id)
+                    program_data = program_response.get("data", {}).get("program", {})
+                program_name = program_data.get("name", "")
+                price = program_data.get("price", 0)
+            except:
+                pass
+        
+        # メール送信モック
+        send_reservation_email_mock(
+            reservation_id=reservation_id,
+            member_id=member_id,
+            guest_name=data["guest_name"],
+            guest_email=data["guest_email"],
+            guest_phone=data["guest_phone"],
+            studio_name=studio_name,
+            studio_address=studio_data.get("address", ""),
+            studio_tel=studio_data.get("tel", ""),
+            program_name=program_name,
+            reservation_date=reservation_date,
+            reservation_time=reservation_time,
+            duration_minutes=duration_minutes,
+            price=price,
+            line_url=studio_contact_info.get("line_url", ""),
+            base_url=base_url,
+            studio_contact_info=studio_contact_info,
+            generated_password=generated_password
+        )
+    except Exception as e:
+        logger.warning(f"Failed to send email mock: {e}")
+    
+    # Slack通知（成功）
+    send_slack_notification(
+        status="success",
+        reservation_id=reservation_id,
+        guest_name=data.get("guest_name", ""),
+        guest_email=data.get("guest_email", ""),
+        guest_phone=data.get("guest_phone", ""),
+        studio_name=studio_name,
+        reservation_date=reservation_date,
+        reservation_time=reservation_time,
+        program_name=program_name
+    )
+    
+    # Google Spreadsheetに記録
+    append_reservation_to_spreadsheet(
+        status="success",
+        reservation_id=reservation_id,
+        guest_name=data.get("guest_name", ""),
+        guest_email=data.get("guest_email", ""),
+        guest_phone=data.get("guest_phone", ""),
+        studio_name=studio_name,
+        reservation_date=reservation_date,
+        reservation_time=reservation_time,
+        program_name=program_name,
+        generated_password=generated_password
+    )
+    
+    # 店舗スタッフ向けメール通知（店舗のカスタム属性からメールアドレスを取得）
+    send_staff_notification_email(
+        client=client,
+        studio_id=studio_id,
+        reservation_id=reservation_id,
+        guest_name=data.get("guest_name", ""),
+        guest_email=data.get("guest_email", ""),
+        guest_phone=data.get("guest_phone", ""),
+        studio_name=studio_name,
+        program_name=program_name,
+        reservation_date=reservation_date,
+        reservation_time=reservation_time,
+        duration_minutes=duration_minutes,
+        price=price
+    )
+
+
 @app.route("/api/reservations", methods=["POST"])
 @handle_errors
 def create_reservation():
@@ -3049,16 +4020,17 @@ def create_reservation():
     studio_lesson_id = data["studio_lesson_id"]
     
     # 0. レッスンの日時を取得して予約可能範囲をチェック、プログラムIDも取得
+    lesson = None
     lesson_program_id = None
     try:
         lesson_check = client.get_studio_lesson(studio_lesson_id)
-        lesson_data = lesson_check.get("data", {}).get("studio_lesson", {})
-        lesson_start_at = lesson_data.get("start_at")
-        lesson_program_id = lesson_data.get("program_id")
+        lesson = lesson_check.get("data", {}).get("studio_lesson", {})
+        lesson_start_at = lesson.get("start_at")
+        lesson_program_id = lesson.get("program_id")
         
         if lesson_start_at:
             # ISO形式をdatetimeに変換
-            lesson_datetime = datetime.fromisoformat(lesson_start_at.replace("Z", "+00:00")).replace(tzinfo=None)
+            lesson_datetime = _fromisoformat(lesson_start_at).replace(tzinfo=None)
             is_valid, error_msg = validate_reservation_datetime(lesson_datetime)
             if not is_valid:
                 return jsonify({
@@ -3070,18 +4042,37 @@ def create_reservation():
         logger.warning(f"Failed to validate lesson datetime: {e}")
         # 日時チェックに失敗しても続行（後のAPIで弾かれる）
     
+    # プログラム・スペース・予約済み席はレッスン情報だけで決まるため、まとめて並列に取得を開始
+    # （スペースと予約済み席の取得はメンバー作成と並行して進める）
+    studio_room_space_id = lesson.get("studio_room_space_id") if lesson else None
+    program_future = None
+    space_future = None
+    reservations_future = None
+    if lesson_program_id:
+        program_future = _reservation_executor.submit(client.get_program, lesson_program_id)
+    if studio_room_space_id:
+        space_future = _reservation_executor.submit(client.get_studio_room_space, studio_room_space_id)
+        # 1項目だけのクエリなので dict を作って json.dumps せず、文字列に直接埋め込む（レッスン取得済み = 数値ID）
+        reservations_future = _reservation_executor.submit(
+            client.get, "/reservation/reservations",
+            params={"query": f'{{"studio_lesson_id": {int(studio_lesson_id)}}}'}
+        )
+    # 確認メール用の店舗情報はレッスン・プログラムに依存しないので、ここで先に取得を開始しておく
+    studio_future = _reservation_executor.submit(client.get_studio, data.get("studio_id", 2))
+    
     # 1. プログラムに紐づくチケットIDを取得
     DEFAULT_TICKET_ID = 5  # Web予約用デフォルトチケット
     ticket_id_to_grant = DEFAULT_TICKET_ID
+    lesson_program = None  # 確認メールでも再利用する
     
-    if lesson_program_id:
+    if program_future is not None:
         try:
-            program_response = client.get_program(lesson_program_id)
-            program = program_response.get("data", {}).get("program", {})
+            program_response = program_future.result()
+            program = lesson_program = program_response.get("data", {}).get("program", {})
             
             # デバッグ: プログラムのすべてのチケット関連フィールドをログ出力
             ticket_related_keys = [k for k in program.keys() if 'ticket' in k.lower()]
-            logger.info(f"Program {lesson_program_id} ALL ticket-related keys: {ticket_related_keys}")
+            logger.info("Program %s ALL ticket-related keys: %s", lesson_program_id, ticket_related_keys)
             for key in ticket_related_keys:
                 logger.info(f"  {key}: {program.get(key)}")
             
@@ -3089,7 +4080,7 @@ def create_reservation():
             is_ticket_reserve_limit = program.get("is_ticket_reserve_limit", False)
             ticket_reserve_limit_details = program.get("ticket_reserve_limit_details", [])
             
-            logger.info(f"Program {lesson_program_id} ticket restriction: is_ticket_reserve_limit={is_ticket_reserve_limit}, ticket_reserve_limit_details={ticket_reserve_limit_details}")
+            logger.info("Program %s ticket restriction: is_ticket_reserve_limit=%s, ticket_reserve_limit_details=%s", lesson_program_id, is_ticket_reserve_limit, ticket_reserve_limit_details)
             
             # チケット制限がある場合、制限されたチケットIDを使用
             if is_ticket_reserve_limit and ticket_reserve_limit_details:
@@ -3183,26 +4174,21 @@ def create_reservation():
             "error_code": "MEMBER_CREATE_ERROR"
         }), 400
     
-    # 2. レッスン情報を取得して空き席を決定
+    # 2. レッスン情報（手順0で取得済み）から空き席を決定
     space_no = None
     space_has_valid_no = False
-    available_seats = []
-    studio_room_space_id = None
     
-    try:
-        lesson_response = client.get_studio_lesson(studio_lesson_id)
-        lesson = lesson_response.get("data", {}).get("studio_lesson", {})
-        studio_room_space_id = lesson.get("studio_room_space_id")
+    if lesson is not None:
         logger.info(f"Lesson info: id={studio_lesson_id}, space_id={studio_room_space_id}, is_selectable_space={lesson.get('is_selectable_space')}")
         
-        # スペース情報を直接取得
-        if studio_room_space_id:
+        # スペース情報を直接取得（手順0で投入済みの取得結果を待つ）
+        if space_future is not None:
             try:
-                space_response = client.get_studio_room_space(studio_room_space_id)
+                space_response = space_future.result()
                 space = space_response.get("data", {}).get("studio_room_space", {})
                 
                 space_details = space.get("space_details", [])
-                logger.info(f"Space {studio_room_space_id} details: {space_details}")
+                logger.info("Space %s details: %s", studio_room_space_id, space_details)
                 
                 # 全ての席番号を取得
                 all_seats = []
@@ -3216,8 +4202,7 @@ def create_reservation():
                     # このレッスンの予約済み席を取得
                     reserved_seats = set()
                     try:
-                        reservations_response = client.get("/reservation/reservations", 
-                            params={"query": json.dumps({"studio_lesson_id": studio_lesson_id})})
+                        reservations_response = reservations_future.result()
                         reservations = reservations_response.get("data", {}).get("reservations", {}).get("list", [])
                         for r in reservations:
                             # status 2=確定, 3=完了 を予約済みとしてカウント
@@ -3225,17 +4210,15 @@ def create_reservation():
                                 reserved_no = r.get("no")
                                 if reserved_no:
                                     reserved_seats.add(int(reserved_no))
-                        logger.info(f"Reserved seats for lesson {studio_lesson_id}: {reserved_seats}")
+                        logger.info("Reserved seats for lesson %s: %s", studio_lesson_id, reserved_seats)
                     except Exception as e:
                         logger.warning(f"Failed to get reservations: {e}")
                     
-                    # 空き席を計算
-                    available_seats = [s for s in all_seats if s not in reserved_seats]
-                    logger.info(f"Available seats: {available_seats}")
+                    # 最初の空き席を使用（見つかった時点で探索を打ち切る）
+                    space_no = next((str(seat) for seat in all_seats if seat not in reserved_seats), None)
+                    logger.info(f"First available seat: {space_no} ({len(all_seats)} seats, {len(reserved_seats)} reserved)")
                     
-                    if available_seats:
-                        space_no = str(available_seats[0])  # 最初の空き席を使用
-                    else:
+                    if space_no is None:
                         # 満席
                         # Slack通知（エラー）
                         send_slack_notification(
@@ -3273,8 +4256,8 @@ def create_reservation():
             space_no = data.get("space_no")
             space_has_valid_no = True
             
-    except HacomonoAPIError as e:
-        logger.warning(f"Failed to get lesson info: {e}")
+    else:
+        logger.warning(f"Failed to get lesson info for lesson {studio_lesson_id}")
         space_no = data.get("space_no")
         if space_no:
             space_has_valid_no = True
@@ -3313,7 +4296,7 @@ def create_reservation():
         reservation_data["member_ticket_id"] = member_ticket_id
     
     try:
-        logger.info(f"Creating fixed reservation with data: {reservation_data}")
+        logger.info("Creating fixed reservation with data: %s", reservation_data)
         reservation_response = client.create_reservation(reservation_data)
         reservation = reservation_response.get("data", {}).get("reservation", {})
         logger.info(f"Fixed reservation created: {reservation.get('id')}")
@@ -3341,146 +4324,51 @@ def create_reservation():
             "detail": error_info["detail"]
         }), 400
     
-    # 4. 予約確認メールを送信（モック）
+    # 4. 予約確認メールなどの後処理
     reservation_id = reservation.get("id")
-    try:
-        # レッスン情報から詳細を取得
-        lesson_response = client.get_studio_lesson(studio_lesson_id)
-        lesson_data = lesson_response.get("data", {}).get("studio_lesson", {})
-        
-        # 日時のフォーマット
-        start_at = lesson_data.get("start_at", "")
-        end_at = lesson_data.get("end_at", "")
-        reservation_date = ""
-        reservation_time = ""
-        duration_minutes = 0
-        
-        if start_at:
-            try:
-                start_dt = datetime.fromisoformat(start_at.replace("Z", "+00:00"))
-                reservation_date = start_dt.strftime("%Y-%m-%d(%a)")
-                reservation_time = start_dt.strftime("%H:%M")
-                if end_at:
-                    end_dt = datetime.fromisoformat(end_at.replace("Z", "+00:00"))
-                    duration_minutes = int((end_dt - start_dt).total_seconds() / 60)
-            except:
-                pass
-        
-        # 店舗情報を取得
-        studio_id = data.get("studio_id", 2)
-        studio_name = ""
-        studio_address = ""
-        studio_tel = ""
-        studio_data = {}
-        try:
-            studio_response = client.get_studio(studio_id)
-            studio_data = studio_response.get("data", {}).get("studio", {})
-            studio_name = studio_data.get("name", "")
-            studio_address = studio_data.get("address", "")
-            studio_tel = studio_data.get("tel", "")
-        except:
-            pass
-        
-        # 店舗連絡先情報を取得（パラメータ優先、なければhacomonoからフォールバック）
-        contact_overrides = {
-            "studio_zip": data.get("studio_zip"),
-            "studio_address": data.get("studio_address"),
-            "studio_tel": data.get("studio_tel"),
-            "studio_url": data.get("studio_url"),
-            "studio_email": data.get("studio_email"),
-            "line_url": data.get("line_url")
-        }
-        studio_contact_info = get_studio_contact_info(studio_data, contact_overrides)
-        
-        # プログラム情報を取得
-        program_id = lesson_data.get("program_id")
-        program_name = ""
-        price = 0
-        if program_id:
-            try:
-                program_response = client.get_program(program_id)
-                program_data = program_response.get("data", {}).get("program", {})
-                program_name = program_data.get("name", "")
-                price = program_data.get("price", 0)
-            except:
-                pass
-        
-        # メール送信モック
-        base_url = request.headers.get("Origin", "")
-        line_url = studio_contact_info.get("line_url", "")
-        send_reservation_email_mock(
-            reservation_id=reservation_id,
-            member_id=member_id,
-            guest_name=data["guest_name"],
-            guest_email=data["guest_email"],
-            guest_phone=data["guest_phone"],
-            studio_name=studio_name,
-            studio_address=studio_address,
-            studio_tel=studio_tel,
-            program_name=program_name,
-            reservation_date=reservation_date,
-            reservation_time=reservation_time,
-            duration_minutes=duration_minutes,
-            price=price,
-            line_url=line_url,
-            base_url=base_url,
-            studio_contact_info=studio_contact_info,
-            generated_password=generated_password
-        )
-    except Exception as e:
-        logger.warning(f"Failed to send email mock: {e}")
-    
-    # 認証用ハッシュを生成（フロントエンドに返す）
-    verify_hash_value = generate_verification_hash(data["guest_email"], data["guest_phone"])
-    
-    # 店舗連絡先情報からLINE URLを取得（レスポンスに含める）
-    line_url = studio_contact_info.get("line_url", "") if 'studio_contact_info' in locals() else data.get("line_url", "")
     
-    # Slack通知（成功）
-    send_slack_notification(
-        status="success",
-        reservation_id=reservation_id,
-        guest_name=data.get("guest_name", ""),
-        guest_email=data.get("guest_email", ""),
-        guest_phone=data.get("guest_phone", ""),
-        studio_name=studio_name,
-        reservation_date=reservation_date,
-        reservation_time=reservation_time,
-        program_name=program_name
-    )
+    # 店舗連絡先情報を取得（パラメータ優先、なければhacomonoからフォールバック）
+    # LINE URLはレスポンスにも含めるため、店舗情報（手順0から並行して取得中）だけはここで待つ
+    studio_id = data.get("studio_id", 2)
+    studio_data = {}
+    try:
+        studio_response = studio_future.result()
+        studio_data = studio_response.get("data", {}).get("studio", {})
+    except:
+        pass
+    contact_overrides = {
+        "studio_zip": data.get("studio_zip"),
+        "studio_address": data.get("studio_address"),
+        "studio_tel": data.get("studio_tel"),
+        "studio_url": data.get("studio_url"),
+        "studio_email": data.get("studio_email"),
+        "line_url": data.get("line_url")
+    }
+    studio_contact_info = get_studio_contact_info(studio_data, contact_overrides)
     
-    # Google Spreadsheetに記録
-    append_reservation_to_spreadsheet(
-        status="success",
+    # 確認メール・Slack通知・スプレッドシート記録・店舗スタッフ向けメールはレスポンスを待たせないようバックグラウンドで実行
+    run_in_background(
+        _finalize_fixed_reservation,
+        client=client,
         reservation_id=reservation_id,
-        guest_name=data.get("guest_name", ""),
-        guest_email=data.get("guest_email", ""),
-        guest_phone=data.get("guest_phone", ""),
-        studio_name=studio_name,
-        reservation_date=reservation_date,
-        reservation_time=reservation_time,
-        program_name=program_name,
+        member_id=member_id,
+        studio_lesson_id=studio_lesson_id,
+        studio_id=studio_id,
+        lesson=lesson,
+        lesson_program=lesson_program,
+        lesson_program_id=lesson_program_id,
+        studio_data=studio_data,
+        studio_contact_info=studio_contact_info,
+        data=data,
+        base_url=request.headers.get("Origin", ""),
         generated_password=generated_password
     )
     
-    # 店舗スタッフ向けメール通知（店舗のカスタム属性からメールアドレスを取得）
-    try:
-        send_staff_notification_email(
-            client=client,
-            studio_id=studio_id,
-            reservation_id=reservation_id,
-            guest_name=data.get("guest_name", ""),
-            guest_email=data.get("guest_email", ""),
-            guest_phone=data.get("guest_phone", ""),
-            studio_name=studio_name,
-            program_name=program_name,
-            reservation_date=reservation_date,
-            reservation_time=reservation_time,
-            duration_minutes=duration_minutes,
-            price=price
-        )
-    except Exception as e:
-        logger.warning(f"Failed to send staff notification email: {e}")
+    # 認証用ハッシュを生成（フロントエンドに返す）
+    verify_hash_value = generate_verification_hash(data["guest_email"], data["guest_phone"])
+    
+    # 店舗連絡先情報からLINE URLを取得（レスポンスに含める）
+    line_url = studio_contact_info.get("line_url", "")
     
     return jsonify({
         "success": True,
@@ -3497,182 +4385,161 @@ def create_reservation():
     }), 201
 
 
-@app.route("/api/reservations/<int:reservation_id>", methods=["GET"])
-@handle_errors
-def get_reservation(reservation_id: int):
-    """予約詳細を取得（拡張版）
-    
-    セキュリティのため、member_id + verifyハッシュで認証
-    """
-    client = get_hacomono_client()
+# 予約ステータスの表示名
+_RESERVATION_STATUS_LABELS = {
+    1: "仮予約",
+    2: "確定",
+    3: "完了",
+    4: "キャンセル",
+    5: "無断キャンセル"
+}
+
+
+def _load_verified_reservation(reservation_id: int, include_details: bool):
+    """予約と関連情報を取得し、member_id + verifyハッシュで閲覧権限を検証
     
+    Returns:
+        (bundle, member_info, error_response)
+        検証に失敗した場合は error_response に (レスポンス, ステータスコード) が入る
+    """
     # 認証パラメータを取得
     provided_member_id = request.args.get("member_id", type=int)
     provided_verify = request.args.get("verify")
     
     if not provided_member_id or not provided_verify:
-        return jsonify({
+        return None, None, (jsonify({
             "error": "認証情報が不足しています",
             "message": "正しいリンクからアクセスしてください"
-        }), 400
+        }), 400)
     
-    response = client.get_reservation(reservation_id)
-    
-    reservation = response.get("data", {}).get("reservation", {})
+    # 検証に必要な予約とメンバーだけを先に取得（関連情報は検証後に取得する）
+    client = get_hacomono_client()
+    bundle = client.get_reservation_bundle(reservation_id)
+    reservation = bundle["reservation"]
     
     # 予約のmember_idと一致するか確認
     actual_member_id = reservation.get("member_id")
     if actual_member_id != provided_member_id:
         logger.warning(f"Member ID mismatch for reservation {reservation_id}: provided={provided_member_id}, actual={actual_member_id}")
-        return jsonify({
+        return None, None, (jsonify({
             "error": "認証に失敗しました",
             "message": "正しいリンクからアクセスしてください"
-        }), 403
-    
-    # 予約ステータスの日本語変換
-    status_map = {
-        1: "仮予約",
-        2: "確定",
-        3: "完了",
-        4: "キャンセル",
-        5: "無断キャンセル"
-    }
-    status = reservation.get("status")
-    status_label = status_map.get(status, "不明")
+        }), 403)
     
-    # 関連情報を取得
+    # メンバー情報でハッシュを検証
     member_info = {}
-    studio_info = {}
-    program_info = {}
-    lesson_info = {}
-    
-    # メンバー情報を取得してハッシュを検証
     member_id = reservation.get("member_id")
     if member_id:
-        try:
-            member_response = client.get_member(member_id)
-            member_data = member_response.get("data", {}).get("member", {})
-            member_email = member_data.get("mail_address", "")
-            member_phone = member_data.get("tel", "")
-            
-            # ハッシュ検証
-            if not verify_hash(member_email, member_phone, provided_verify):
-                logger.warning(f"Hash verification failed for reservation {reservation_id}, member {member_id}")
-                return jsonify({
-                    "error": "認証に失敗しました",
-                    "message": "正しいリンクからアクセスしてください"
-                }), 403
-            
-            member_info = {
-                "id": member_id,
-                "name": f"{member_data.get('last_name', '')} {member_data.get('first_name', '')}".strip(),
-                "name_kana": f"{member_data.get('last_name_kana', '')} {member_data.get('first_name_kana', '')}".strip(),
-                "email": member_email,
-                "phone": member_phone
-            }
-        except Exception as e:
-            logger.warning(f"Failed to get member info: {e}")
-            return jsonify({
+        member_data = bundle["member"]
+        if member_data is None:
+            return None, None, (jsonify({
                 "error": "認証処理中にエラーが発生しました",
                 "message": "時間をおいて再度お試しください"
-            }), 500
+            }), 500)
+        member_email = member_data.get("mail_address", "")
+        member_phone = member_data.get("tel", "")
+        
+        # ハッシュ検証
+        if not verify_hash(member_email, member_phone, provided_verify, member_id):
+            logger.warning(f"Hash verification failed for reservation {reservation_id}, member {member_id}")
+            return None, None, (jsonify({
+                "error": "認証に失敗しました",
+                "message": "正しいリンクからアクセスしてください"
+            }), 403)
+        
+        member_info = {
+            "id": member_id,
+            "name": _format_member_name(member_data),
+            "name_kana": _format_member_name(member_data, _MEMBER_NAME_KANA_KEYS),
+            "email": member_email,
+            "phone": member_phone
+        }
+    
+    if include_details:
+        # 関連情報はクライアント側で並列に取得される
+        client.load_reservation_details(bundle)
+    
+    return bundle, member_info, None
+
+
+def _format_reservation_details(bundle: dict) -> dict:
+    """予約に関連するレッスン・プログラム・店舗情報をレスポンス用に整形"""
+    reservation = bundle["reservation"]
+    studio_info = {}
+    program_info = {}
+    lesson_info = {}
     
     # レッスン情報（固定枠の場合）
-    studio_lesson_id = reservation.get("studio_lesson_id")
-    if studio_lesson_id:
-        try:
-            lesson_response = client.get_studio_lesson(studio_lesson_id)
-            lesson_data = lesson_response.get("data", {}).get("studio_lesson", {})
-            lesson_info = {
-                "id": studio_lesson_id,
-                "date": lesson_data.get("date"),
-                "start_at": lesson_data.get("start_at"),
-                "end_at": lesson_data.get("end_at"),
-                "program_id": lesson_data.get("program_id"),
-                "studio_id": lesson_data.get("studio_id")
-            }
-            
-            # プログラム情報
-            program_id = lesson_data.get("program_id")
-            if program_id:
-                try:
-                    program_response = client.get_program(program_id)
-                    program_data = program_response.get("data", {}).get("program", {})
-                    program_info = {
-                        "id": program_id,
-                        "name": program_data.get("name", ""),
-                        "description": program_data.get("description", ""),
-                        "duration": program_data.get("duration", 0),
-                        "price": program_data.get("price", 0)
-                    }
-                except Exception as e:
-                    logger.warning(f"Failed to get program info: {e}")
-            
-            # 店舗情報
-            studio_id = lesson_data.get("studio_id")
-            if studio_id:
-                try:
-                    studio_response = client.get_studio(studio_id)
-                    studio_data = studio_response.get("data", {}).get("studio", {})
-                    studio_info = {
-                        "id": studio_id,
-                        "name": studio_data.get("name", ""),
-                        "code": studio_data.get("code", ""),
-                        "address": studio_data.get("address", ""),
-                        "tel": studio_data.get("tel", "")
-                    }
-                except Exception as e:
-                    logger.warning(f"Failed to get studio info: {e}")
-        except Exception as e:
-            logger.warning(f"Failed to get lesson info: {e}")
+    lesson_data = bundle["lesson"]
+    if lesson_data is not None:
+        lesson_info = {
+            "id": reservation.get("studio_lesson_id"),
+            "date": lesson_data.get("date"),
+            "start_at": lesson_data.get("start_at"),
+            "end_at": lesson_data.get("end_at"),
+            "program_id": lesson_data.get("program_id"),
+            "studio_id": lesson_data.get("studio_id")
+        }
     
-    # 自由枠予約の場合（studio_room_idがある）
-    studio_room_id = reservation.get("studio_room_id")
-    if studio_room_id and not studio_lesson_id:
-        try:
-            # スタジオルーム情報から店舗IDを取得
-            room_response = client.get_studio_room(studio_room_id)
-            room_data = room_response.get("data", {}).get("studio_room", {})
-            studio_id = room_data.get("studio_id")
-            
-            if studio_id:
-                studio_response = client.get_studio(studio_id)
-                studio_data = studio_response.get("data", {}).get("studio", {})
-                studio_info = {
-                    "id": studio_id,
-                    "name": studio_data.get("name", ""),
-                    "code": studio_data.get("code", ""),
-                    "address": studio_data.get("address", ""),
-                    "tel": studio_data.get("tel", "")
-                }
-            
-            # プログラム情報（予約に含まれている場合）
-            program_id = reservation.get("program_id")
-            if program_id:
-                try:
-                    program_response = client.get_program(program_id)
-                    program_data = program_response.get("data", {}).get("program", {})
-                    program_info = {
-                        "id": program_id,
-                        "name": program_data.get("name", ""),
-                        "description": program_data.get("description", ""),
-                        "duration": program_data.get("duration", 0),
-                        "price": program_data.get("price", 0)
-                    }
-                except Exception as e:
-                    logger.warning(f"Failed to get program info: {e}")
-        except Exception as e:
-            logger.warning(f"Failed to get room/studio info: {e}")
+    # プログラム情報（固定枠はレッスン、自由枠は予約に含まれるプログラムID）
+    program_data = bundle["program"]
+    if program_data is not None:
+        program_info = {
+            "id": (lesson_data or reservation).get("program_id"),
+            "name": program_data.get("name", ""),
+            "description": program_data.get("description", ""),
+            "duration": program_data.get("duration", 0),
+            "price": program_data.get("price", 0)
+        }
+    
+    # 店舗情報（固定枠はレッスン、自由枠はスタジオルームの店舗ID）
+    studio_data = bundle["studio"]
+    if studio_data is not None:
+        studio_info = {
+            "id": (lesson_data or bundle["studio_room"]).get("studio_id"),
+            "name": studio_data.get("name", ""),
+            "code": studio_data.get("code", ""),
+            "address": studio_data.get("address", ""),
+            "tel": studio_data.get("tel", "")
+        }
+    
+    return {
+        "studio": studio_info,
+        "program": program_info,
+        "lesson": lesson_info
+    }
+
+
+@app.route("/api/reservations/<int:reservation_id>", methods=["GET"])
+@handle_errors
+def get_reservation(reservation_id: int):
+    """予約詳細を取得（拡張版）
+    
+    セキュリティのため、member_id + verifyハッシュで認証
+    
+    クエリパラメータ:
+        minimal: "1" の場合は予約とメンバー情報だけを返す
+                 （店舗・プログラム・レッスンを取得済みの画面で、ステータスだけ更新する場合に使う）
+    """
+    minimal = request.args.get("minimal") == "1"
+    bundle, member_info, error_response = _load_verified_reservation(reservation_id, include_details=not minimal)
+    if error_response:
+        return error_response
+    reservation = bundle["reservation"]
+    
+    # 予約ステータスの日本語変換
+    status = reservation.get("status")
+    status_label = _RESERVATION_STATUS_LABELS.get(status, "不明")
     
     # キャンセル可能かどうかを判定（ステータスが確定の場合のみ）
     is_cancelable = status == 2
     
-    return jsonify({
+    response = {
         "reservation": {
             "id": reservation.get("id"),
-            "member_id": member_id,
-            "studio_lesson_id": studio_lesson_id,
-            "studio_room_id": studio_room_id,
+            "member_id": reservation.get("member_id"),
+            "studio_lesson_id": reservation.get("studio_lesson_id"),
+            "studio_room_id": reservation.get("studio_room_id"),
             "program_id": reservation.get("program_id"),
             "status": status,
             "status_label": status_label,
@@ -3682,11 +4549,11 @@ def get_reservation(reservation_id: int):
             "created_at": reservation.get("created_at"),
             "is_cancelable": is_cancelable
         },
-        "member": member_info,
-        "studio": studio_info,
-        "program": program_info,
-        "lesson": lesson_info
-    })
+        "member": member_info
+    }
+    if not minimal:
+        response.update(_format_reservation_details(bundle))
+    return jsonify(response)
 
 
 @app.route("/api/reservations/choice", methods=["POST"])
@@ -3710,10 +4577,11 @@ def create_choice_reservation():
     guest_phone = data["guest_phone"]
     guest_note = data.get("guest_note", "")
     
-    # 0. 予約日時が有効範囲内かチェック
+    # 0. 予約日時が有効範囲内かチェック（外部APIを呼ぶ前に弾く）
+    reservation_datetime = None
     try:
-        # "yyyy-MM-dd HH:mm:ss.fff" 形式をパース
-        reservation_datetime = datetime.strptime(start_at.split(".")[0], "%Y-%m-%d %H:%M:%S")
+        # "yyyy-MM-dd HH:mm:ss.fff" 形式をパース（以降のスタッフ空き判定でもこの値を使う）
+        reservation_datetime = parse_jst_start_at(start_at)
         is_valid, error_msg = validate_reservation_datetime(reservation_datetime)
         if not is_valid:
             return jsonify({
@@ -3743,31 +4611,22 @@ def create_choice_reservation():
         last_name_kana = name_kana
         first_name_kana = ""
     
-    # 1. まず既存のメンバーを検索
+    # 1. まず既存のメンバーを検索（直近に登録済みと分かったメールアドレスは検索しない）
     member_id = None
     generated_password = None  # 新規登録時に生成されたパスワード（メール通知用）
     try:
-        logger.info(f"Searching for existing member with email: {guest_email}")
-        members_response = client.get_members({"mail_address": guest_email})
-        members_data = members_response.get("data", {}).get("members", {})
-        # APIレスポンスは {members: {list: [...], total_count: N, ...}} 形式
-        if isinstance(members_data, dict):
-            members_list = members_data.get("list", [])
-            if members_list and len(members_list) > 0:
-                # 既存会員が見つかった場合はエラーを返す
+        member_id = get_cached_member_id(guest_email)
+        if member_id is None:
+            logger.info(f"Searching for existing member with email: {guest_email}")
+            # APIレスポンスは {members: {list: [...], total_count: N, ...}} 形式
+            members_list = _get_members_list(client.get_members({"mail_address": guest_email}))
+            if members_list:
                 member_id = members_list[0].get("id")
-                logger.info(f"Found existing member ID: {member_id} - rejecting reservation")
-                return jsonify({
-                    "success": False,
-                    "error": "このメールアドレスは既に登録されています。",
-                    "message": "このメールアドレスは既に登録されているため、予約できません。別のメールアドレスをご使用ください。",
-                    "error_code": "EXISTING_MEMBER"
-                }), 400
+                remember_member_id(guest_email, member_id)
             else:
                 logger.info(f"No existing member found for email: {guest_email}")
-        elif isinstance(members_data, list) and len(members_data) > 0:
+        if member_id is not None:
             # 既存会員が見つかった場合はエラーを返す
-            member_id = members_data[0].get("id")
             logger.info(f"Found existing member ID: {member_id} - rejecting reservation")
             return jsonify({
                 "success": False,
@@ -3786,7 +4645,7 @@ def create_choice_reservation():
 
     # デバッグ: プログラムのすべてのチケット関連フィールドをログ出力
     ticket_related_keys = [k for k in program.keys() if 'ticket' in k.lower()]
-    logger.info(f"Program {program_id} ALL ticket-related keys: {ticket_related_keys}")
+    logger.info("Program %s ALL ticket-related keys: %s", program_id, ticket_related_keys)
     for key in ticket_related_keys:
         logger.info(f"  {key}: {program.get(key)}")
 
@@ -3794,7 +4653,7 @@ def create_choice_reservation():
     is_ticket_reserve_limit = program.get("is_ticket_reserve_limit", False)
     ticket_reserve_limit_details = program.get("ticket_reserve_limit_details", [])
 
-    logger.info(f"Program {program_id} ticket restriction: is_ticket_reserve_limit={is_ticket_reserve_limit}, ticket_reserve_limit_details={ticket_reserve_limit_details}")
+    logger.info("Program %s ticket restriction: is_ticket_reserve_limit=%s, ticket_reserve_limit_details=%s", program_id, is_ticket_reserve_limit, ticket_reserve_limit_details)
 
     # チケットIDを決定
     DEFAULT_TICKET_ID = 5  # Web予約用デフォルトチケット
@@ -3829,9 +4688,10 @@ def create_choice_reservation():
         # 指定された日時の空いているスタッフを取得
         try:
             # start_atから日付を抽出
-            from zoneinfo import ZoneInfo
-            jst = ZoneInfo("Asia/Tokyo")
-            start_datetime = datetime.strptime(start_at, "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=jst)
+            # 冒頭の日時チェックでパース済みの値を再利用
+            if reservation_datetime is None:
+                raise ValueError(f"Invalid start_at format: {start_at}")
+            start_datetime = reservation_datetime.replace(tzinfo=JST)
             date_str = start_datetime.strftime("%Y-%m-%d")
             selectable_instructor_details = program.get("selectable_instructor_details", [])
 
@@ -3846,7 +4706,7 @@ def create_choice_reservation():
                     items = first_detail.get("items", [])
                     # items は { instructor_id, instructor_code, ... } の配列
                     selectable_instructor_ids = set(item.get("instructor_id") for item in items if item.get("instructor_id"))
-                    logger.info(f"Program {program_id} has selectable instructors (type={detail_type}): {selectable_instructor_ids}")
+                    logger.info("Program %s has selectable instructors (type=%s): %s", program_id, detail_type, selectable_instructor_ids)
 
             # choice/scheduleから空いているスタッフを取得（30秒間キャッシュ）
             schedule = get_cached_choice_schedule(client, studio_room_id, date_str)
@@ -3855,8 +4715,8 @@ def create_choice_reservation():
             studio_room_service = schedule.get("studio_room_service", {})
             studio_id = studio_room_service.get("studio_id")
 
-            # スタッフのスタジオ紐付け情報を取得
-            instructor_studio_map = get_cached_instructor_studio_map(client)
+            # スタッフのスタジオ紐付け情報を取得（所属判定用に frozenset 化したもの）
+            instructor_studio_sets = get_instructor_studio_sets(get_cached_instructor_studio_map(client))
 
             # 利用可能なスタッフを取得
             shift_instructors = schedule.get("shift_instructor", [])
@@ -3864,28 +4724,13 @@ def create_choice_reservation():
 
             # 予定ブロック（休憩ブロック）を取得してスタッフの予約情報に統合
             try:
-                shift_slots_response = client.get_shift_slots({"studio_id": studio_id, "date": date_str})
-                shift_slots_data = shift_slots_response.get("data", {}).get("shift_slots", {})
-                shift_slots = shift_slots_data.get("list", []) if isinstance(shift_slots_data, dict) else shift_slots_data
-
-                # 予定ブロックをスタッフと設備に分類
-                resource_blocks = []
-                for slot in shift_slots:
-                    entity_type = slot.get("entity_type", "").upper()
-                    if entity_type == "INSTRUCTOR":
-                        reserved_instructors.append({
-                            "entity_id": slot.get("entity_id"),
-                            "start_at": slot.get("start_at"),
-                            "end_at": slot.get("end_at"),
-                            "reservation_type": "SHIFT_SLOT"
-                        })
-                    elif entity_type == "RESOURCE":
-                        resource_blocks.append({
-                            "entity_id": slot.get("entity_id"),
-                            "start_at": slot.get("start_at"),
-                            "end_at": slot.get("end_at"),
-                            "reservation_type": "SHIFT_SLOT"
-                        })
+                # 直前に追加された予定ブロックとの重複を見落とさないよう、キャッシュを使わずに取得する
+                shift_slots = get_cached_shift_slots(client, studio_id, date_str, bypass_cache=True)
+
+                # 予定ブロックのうちスタッフ分だけを予約情報に加える（設備の空きはここでは判定しない）
+                # reserved_instructors はキャッシュされたスケジュールのリストなので、変更せずに新しいリストを作る
+                instructor_blocks, _ = _split_shift_slot_reservations(shift_slots)
+                reserved_instructors = reserved_instructors + instructor_blocks
                 logger.info(f"Fetched {len(shift_slots)} shift slots for reservation validation")
             except Exception as e:
                 logger.warning(f"Failed to get shift slots for reservation validation: {e}")
@@ -3898,57 +4743,35 @@ def create_choice_reservation():
             # 予約したい時間帯
             proposed_end = start_datetime + timedelta(minutes=service_minutes)
 
-            # 予約済みのスタッフIDを取得（インターバルを考慮）
-            # 休憩ブロック（reservation_typeがBREAK、BLOCK、SHIFT_SLOTなど）も予約不可として扱う
-            reserved_instructor_ids = set()
-            for reserved in reserved_instructors:
-                try:
-                    reserved_start_str = reserved.get("start_at", "")
-                    reserved_end_str = reserved.get("end_at", "")
-                    if not reserved_start_str or not reserved_end_str:
-                        continue
-                    # ISO8601形式の日時をパース（タイムゾーン情報を処理してJSTに統一）
-                    reserved_start = datetime.fromisoformat(reserved_start_str.replace("Z", "+00:00")).astimezone(jst)
-                    reserved_end = datetime.fromisoformat(reserved_end_str.replace("Z", "+00:00")).astimezone(jst)
-
-                    # 休憩ブロック（SHIFT_SLOT含む）の場合はインターバルを考慮せず、そのままブロック
-                    reservation_type = reserved.get("reservation_type", "").upper()
-                    is_block = reservation_type in ["BREAK", "BLOCK", "REST", "SHIFT_SLOT", "休憩", "ブロック"]
-
-                    if is_block:
-                        # 休憩ブロックの場合は、その時間帯をそのままブロック
-                        block_start = reserved_start
-                        block_end = reserved_end
-                    else:
-                        # 既存予約のブロック範囲（インターバル含む）
-                        # before_interval: 予約開始前のブロック時間
-                        # after_interval: 予約終了後のブロック時間
-                        block_start = reserved_start - timedelta(minutes=before_interval)
-                        block_end = reserved_end + timedelta(minutes=after_interval)
-
-                    # 予約したい時間帯がブロック範囲と重複するかチェック
-                    if start_datetime < block_end and proposed_end > block_start:
-                        reserved_instructor_ids.add(reserved.get("entity_id"))
-                except Exception as e:
-                    logger.warning(f"Failed to parse reserved instructor time: {e}")
-                    continue
-
-            # 空いているスタッフを抽出（スタジオ紐付け & プログラム選択可能スタッフもチェック）
-            available_instructors = []
+            # 予約済み・休憩ブロックをスタッフごとの埋まっている時間帯（UNIX時刻）に1回だけ変換する
+            # 休憩ブロック（reservation_typeがBREAK、BLOCK、SHIFT_SLOTなど）はインターバルを考慮せずそのままブロック
+            # 既存予約は before_interval（予約開始前）・after_interval（予約終了後）分広げたブロック範囲で判定する
+            busy_intervals_by_instructor = _build_busy_intervals(reserved_instructors, before_interval, after_interval)
+            start_ts = start_datetime.timestamp()
+            proposed_end_ts = proposed_end.timestamp()
+
+            def has_conflict(instructor_id) -> bool:
+                """スタッフの既存予約・休憩ブロックが予約したい時間帯と重複するか"""
+                busy_intervals = busy_intervals_by_instructor.get(instructor_id)
+                return busy_intervals is not None and _overlaps_busy_intervals(busy_intervals, start_ts, proposed_end_ts)
+
+            # 空いているスタッフを探す（スタジオ紐付け & プログラム選択可能スタッフもチェック）
+            # プログラムで選択可能なスタッフだけを先に集合演算で絞り込み、シフト順に見て最初に空いているスタッフを使う
+            candidate_instructor_ids = {i.get("instructor_id") for i in shift_instructors}
+            if selectable_instructor_ids is not None:
+                candidate_instructor_ids &= selectable_instructor_ids
+            conflicted_instructor_ids = set()
             for instructor in shift_instructors:
                 instructor_id = instructor.get("instructor_id")
+                if instructor_id not in candidate_instructor_ids or instructor_id in conflicted_instructor_ids:
+                    continue
                 try:
-                    # プログラムの選択可能スタッフにいるかチェック
-                    if selectable_instructor_ids is not None and instructor_id not in selectable_instructor_ids:
-                        logger.debug(f"Instructor {instructor_id} not in program's selectable instructors, skipping")
-                        continue
-
                     # スタッフがスタジオに紐付けられているかチェック
                     # hacomonoのロジック: studio_idsが空 = 全店舗対応可能
-                    instructor_studio_ids = instructor_studio_map.get(instructor_id, [])
+                    instructor_studio_ids = instructor_studio_sets.get(instructor_id)
                     if instructor_studio_ids and studio_id and studio_id not in instructor_studio_ids:
                         # 特定のスタジオに紐付けられているが、このスタジオではない
-                        logger.debug(f"Instructor {instructor_id} not associated with studio {studio_id}, skipping")
+                        logger.debug("Instructor %s not associated with studio %s, skipping", instructor_id, studio_id)
                         continue
                     # 空配列の場合は制限なし（全店舗OK）なのでスキップしない
 
@@ -3956,21 +4779,24 @@ def create_choice_reservation():
                     instructor_end_str = instructor.get("end_at", "")
                     if not instructor_start_str or not instructor_end_str:
                         continue
-                    # JSTに統一して比較
-                    instructor_start = datetime.fromisoformat(instructor_start_str.replace("Z", "+00:00")).astimezone(jst)
-                    instructor_end = datetime.fromisoformat(instructor_end_str.replace("Z", "+00:00")).astimezone(jst)
+                    # UNIX時刻に変換して比較（シフトはキャッシュされたスケジュールの文字列なのでパース結果を再利用）
+                    instructor_start_ts = _iso_to_timestamp(instructor_start_str)
+                    instructor_end_ts = _iso_to_timestamp(instructor_end_str)
 
                     # シフト時間内にコースが収まり、予約が入っていないスタッフ
-                    if (instructor_start <= start_datetime and proposed_end <= instructor_end and
-                        instructor_id not in reserved_instructor_ids):
-                        available_instructors.append(instructor_id)
+                    if not (instructor_start_ts <= start_ts and proposed_end_ts <= instructor_end_ts):
+                        continue
+                    if has_conflict(instructor_id):
+                        conflicted_instructor_ids.add(instructor_id)
+                        continue
+                    instructor_ids = [instructor_id]
+                    break
                 except Exception as e:
-                    logger.warning(f"Failed to parse instructor time: {e}")
+                    logger.warning("Failed to parse instructor time: %s", e)
                     continue
 
-            if available_instructors:
-                instructor_ids = available_instructors[:1]  # 最初の1名を使用
-                logger.info(f"Found available instructors: {available_instructors}, using: {instructor_ids}")
+            if instructor_ids:
+                logger.info("Found available instructor: %s", instructor_ids)
             else:
                 # 空いているスタッフが見つからない場合はエラー
                 logger.error(f"No available instructors found for studio_room_id={studio_room_id}, date={date_str}, time={start_at}")
@@ -4016,9 +4842,7 @@ def create_choice_reservation():
 
     # 4. すべてのバリデーション成功後、既存メンバーがいなければ新規作成
     if not member_id:
-        import secrets
-        import string
-        random_password = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(12)) + "!A1"
+        random_password = _generate_member_password()
         
         # 生年月日: リクエストから取得、なければ環境変数、なければNone（空白）
         birthday_value = data.get("birthday") or MEMBER_DEFAULT_BIRTHDAY or None
@@ -4041,10 +4865,11 @@ def create_choice_reservation():
             member_data["birthday"] = birthday_value
         
         try:
-            logger.info(f"Creating member with data: {member_data}")
+            logger.info("Creating member with data: %s", member_data)
             member_response = client.create_member(member_data)
             member_id = member_response.get("data", {}).get("member", {}).get("id")
             logger.info(f"Created new member ID: {member_id}")
+            remember_member_id(guest_email, member_id)
             # 新規登録成功時にパスワードを保存（メール通知用）
             generated_password = random_password
         except HacomonoAPIError as e:
@@ -4052,15 +4877,19 @@ def create_choice_reservation():
             logger.error(f"Member creation API response body: {e.response_body}")
             error_info = _parse_hacomono_error(e)
             # メールアドレスが既に使用されている場合、再度検索を試みる
+            # （キャッシュに対応があれば検索しない）
             if error_info["error_code"] == "CMN_000022":
-                try:
-                    members_response = client.get_members({"mail_address": guest_email})
-                    members = members_response.get("data", {}).get("members", [])
-                    if members:
-                        member_id = members[0].get("id")
-                        logger.info(f"Found existing member on retry ID: {member_id}")
-                except HacomonoAPIError:
-                    pass
+                member_id = get_cached_member_id(guest_email)
+                if member_id is None:
+                    try:
+                        members = _get_members_list(client.get_members({"mail_address": guest_email}))
+                        if members:
+                            member_id = members[0].get("id")
+                            remember_member_id(guest_email, member_id)
+                    except HacomonoAPIError:
+                        pass
+                if member_id:
+                    logger.info(f"Found existing member on retry ID: {member_id}")
             
             if not member_id:
                 # Slack通知（エラー）
@@ -4108,7 +4937,7 @@ def create_choice_reservation():
         reservation_data["is_send_mail"] = data["is_send_mail"]
     
     try:
-        logger.info(f"Creating choice reservation with data: {reservation_data}")
+        logger.info("Creating choice reservation with data: %s", reservation_data)
         reservation_response = client.create_choice_reservation(reservation_data)
         reservation = reservation_response.get("data", {}).get("reservation", {})
         logger.info(f"Choice reservation created: {reservation.get('id')}")
@@ -4147,11 +4976,11 @@ def create_choice_reservation():
         
         if start_at_str:
             try:
-                start_dt = datetime.fromisoformat(start_at_str.replace("Z", "+00:00"))
+                start_dt = _fromisoformat(start_at_str)
                 reservation_date = start_dt.strftime("%Y-%m-%d(%a)")
                 reservation_time = start_dt.strftime("%H:%M")
                 if end_at_str:
-                    end_dt = datetime.fromisoformat(end_at_str.replace("Z", "+00:00"))
+                    end_dt = _fromisoformat(end_at_str)
                     duration_minutes = int((end_dt - start_dt).total_seconds() / 60)
             except:
                 pass
@@ -4182,16 +5011,9 @@ def create_choice_reservation():
         }
         studio_contact_info = get_studio_contact_info(studio_data, contact_overrides)
         
-        # プログラム情報を取得
-        program_name = ""
-        price = 0
-        try:
-            program_response = client.get_program(program_id)
-            program_data = program_response.get("data", {}).get("program", {})
-            program_name = program_data.get("name", "")
-            price = program_data.get("price", 0)
-        except:
-            pass
+        # プログラム情報（チケット判定時に取得済みのものを再利用）
+        program_name = program.get("name", "")
+        price = program.get("price", 0)
         
         # メール送信モック
         base_url = request.headers.get("Origin", "")
@@ -4320,23 +5142,22 @@ def create_choice_reservation():
     )
     
     # 店舗スタッフ向けメール通知（店舗のカスタム属性からメールアドレスを取得）
-    try:
-        send_staff_notification_email(
-            client=client,
-            studio_id=studio_id,
-            reservation_id=reservation_id,
-            guest_name=guest_name,
-            guest_email=guest_email,
-            guest_phone=guest_phone,
-            studio_name=studio_name,
-            program_name=program_name,
-            reservation_date=reservation_date,
-            reservation_time=reservation_time,
-            duration_minutes=duration_minutes,
-            price=price
-        )
-    except Exception as e:
-        logger.warning(f"Failed to send staff notification email: {e}")
+    # 店舗情報の取得とSES送信はレスポンスを待たせないようバックグラウンドで実行
+    run_in_background(
+        send_staff_notification_email,
+        client=client,
+        studio_id=studio_id,
+        reservation_id=reservation_id,
+        guest_name=guest_name,
+        guest_email=guest_email,
+        guest_phone=guest_phone,
+        studio_name=studio_name,
+        program_name=program_name,
+        reservation_date=reservation_date,
+        reservation_time=reservation_time,
+        duration_minutes=duration_minutes,
+        price=price
+    )
     
     return jsonify({
         "success": True,
@@ -4366,7 +5187,8 @@ def cancel_reservation(reservation_id: int):
     """
     client = get_hacomono_client()
     
-    data = request.get_json() or {}
+    # 不正なJSONは空として扱い、下の必須チェックで400を返す（パース結果はリクエスト内でキャッシュされる）
+    data = request.get_json(silent=True) or {}
     member_id = data.get("member_id")
     provided_verify = data.get("verify")
     
@@ -4393,11 +5215,11 @@ def cancel_reservation(reservation_id: int):
         member_data = member_response.get("data", {}).get("member", {})
         member_email = member_data.get("mail_address", "")
         member_phone = member_data.get("tel", "")
-        guest_name = f"{member_data.get('last_name', '')} {member_data.get('first_name', '')}".strip()
+        guest_name = _format_member_name(member_data)
         guest_email = member_email
         guest_phone = member_phone
         
-        if not verify_hash(member_email, member_phone, provided_verify):
+        if not verify_hash(member_email, member_phone, provided_verify, member_id):
             logger.warning(f"Hash verification failed for reservation {reservation_id}, member {member_id}")
             return jsonify({
                 "success": False,
@@ -4412,8 +5234,10 @@ def cancel_reservation(reservation_id: int):
             "message": "認証処理中にエラーが発生しました"
         }), 500
     
-    # キャンセル前に予約情報を取得（通知用）
+    # キャンセル前に予約情報を取得（通知用・キャッシュ無効化用）
     studio_id = None
+    studio_room_id = None
+    start_at = ""
     studio_name = ""
     program_name = ""
     reservation_date = ""
@@ -4426,7 +5250,7 @@ def cancel_reservation(reservation_id: int):
         start_at = reservation_data.get("start_at", "")
         if start_at:
             try:
-                start_dt = datetime.fromisoformat(start_at.replace("Z", "+00:00"))
+                start_dt = _fromisoformat(start_at)
                 reservation_date = start_dt.strftime("%Y-%m-%d(%a)")
                 reservation_time = start_dt.strftime("%H:%M")
             except:
@@ -4488,23 +5312,30 @@ def cancel_reservation(reservation_id: int):
     # キャンセルを実行
     response = client.cancel_reservation(member_id, [reservation_id])
     
-    # キャンセル通知メールを送信（店舗のカスタム属性からメールアドレスを取得）
-    if studio_id:
+    # 自由枠の空きが変わるため、予約日のスケジュールキャッシュを無効化（予定ブロック・レッスンのキャッシュは予約で変わらないため対象外）
+    if studio_room_id and start_at:
         try:
-            send_cancel_notification_email(
-                client=client,
-                studio_id=studio_id,
-                reservation_id=reservation_id,
-                guest_name=guest_name,
-                guest_email=guest_email,
-                guest_phone=guest_phone,
-                studio_name=studio_name,
-                program_name=program_name,
-                reservation_date=reservation_date,
-                reservation_time=reservation_time
-            )
+            cancelled_date = _parse_iso_datetime(start_at).astimezone(JST).strftime("%Y-%m-%d")
+            invalidate_choice_schedule_cache(studio_room_id, cancelled_date)
         except Exception as e:
-            logger.warning(f"Failed to send cancel notification email: {e}")
+            logger.warning(f"Failed to invalidate choice schedule cache after cancel: {e}")
+    
+    # キャンセル通知メールを送信（店舗のカスタム属性からメールアドレスを取得）
+    # 店舗情報の取得とSES送信はレスポンスを待たせないようバックグラウンドで実行
+    if studio_id:
+        run_in_background(
+            send_cancel_notification_email,
+            client=client,
+            studio_id=studio_id,
+            reservation_id=reservation_id,
+            guest_name=guest_name,
+            guest_email=guest_email,
+            guest_phone=guest_phone,
+            studio_name=studio_name,
+            program_name=program_name,
+            reservation_date=reservation_date,
+            reservation_time=reservation_time
+        )
 
     # Slack通知（キャンセル）
     try:
@@ -4534,6 +5365,60 @@ def cancel_reservation(reservation_id: int):
 FIXED_SLOT_BEFORE_INTERVAL_MINUTES = 30
 FIXED_SLOT_AFTER_INTERVAL_MINUTES = 30
 
+# スケジュールAPIの include パラメータで選択できるセクションと、対応するレスポンスのキー
+SCHEDULE_INCLUDE_SECTIONS = {
+    "lessons": ("fixed_slot_lessons",),
+    "blocks": ("reservation_assign_instructor", "reservation_assign_resource", "shift_slots"),
+    "map": ("instructor_studio_map",),
+}
+SCHEDULE_INCLUDE_ALL = frozenset(SCHEDULE_INCLUDE_SECTIONS)
+
+
+def _get_schedule_includes() -> frozenset:
+    """include パラメータ（例: include=lessons,blocks,map）を解析（未指定なら全セクション）"""
+    include = request.args.get("include")
+    if not include:
+        return SCHEDULE_INCLUDE_ALL
+    return frozenset(section.strip() for section in include.split(",")) & SCHEDULE_INCLUDE_ALL
+
+
+def _get_schedule_excluded_keys(includes: frozenset) -> frozenset:
+    """include で指定されなかったセクションのレスポンスキーを返す"""
+    return frozenset(
+        key
+        for section, keys in SCHEDULE_INCLUDE_SECTIONS.items() if section not in includes
+        for key in keys
+    )
+
+
+SCHEDULE_CACHE_CONTROL = "private, no-cache"  # 予約直後の空き状況を古く見せないよう毎回ETagで再検証させる
+
+
+def _compute_json_etag(chunks) -> str:
+    """シリアライズ済みJSON（bytesの断片）からETagを計算"""
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _make_conditional_schedule_response(response, etag: str):
+    """ETagを付与し、If-None-Match が一致すれば 304 Not Modified にする
+    
+    圧縮後も同じETagで照合できるよう弱いETagを使う（flask-compress は強いETagにのみ圧縮方式を付加する）。
+    """
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = SCHEDULE_CACHE_CONTROL
+    return response.make_conditional(request)
+
+
+def _set_schedule_included_header(response, includes: frozenset):
+    """レスポンスに含めたセクションを X-Happle-Included ヘッダーで返す"""
+    response.headers["X-Happle-Included"] = ",".join(
+        section for section in SCHEDULE_INCLUDE_SECTIONS if section in includes
+    )
+    return response
+
 
 @app.route("/api/choice-schedule", methods=["GET"])
 @handle_errors
@@ -4544,7 +5429,6 @@ def get_choice_schedule():
     - hacomono APIへの複数リクエストを並列実行（ThreadPoolExecutor使用）
     - キャッシュ可能なデータ（instructors, resources）は60秒間キャッシュ
     """
-    import time
     start_time = time.perf_counter()
     
     client = get_hacomono_client()
@@ -4560,6 +5444,10 @@ def get_choice_schedule():
     if not date:
         date = datetime.now().strftime("%Y-%m-%d")
     
+    includes = _get_schedule_includes()
+    include_lessons = "lessons" in includes
+    include_blocks = "blocks" in includes
+    
     try:
         # 1. 自由枠スケジュールを取得（これは最初に必要 - studio_idを取得するため）
         # 30秒間キャッシュを使用
@@ -4591,31 +5479,25 @@ def get_choice_schedule():
         if actual_studio_id:
             # 並列実行する関数を定義
             def fetch_studio_lessons():
-                """固定枠レッスンを取得"""
+                """固定枠レッスンを取得（60秒間キャッシュ）"""
                 try:
-                    lessons_response = client.get_studio_lessons(
-                        query={"studio_id": actual_studio_id},
-                        date_from=date,
-                        date_to=date,
-                        fetch_all=True
-                    )
-                    return lessons_response.get("data", {}).get("studio_lessons", {}).get("list", [])
+                    return get_cached_studio_lessons(client, actual_studio_id, date, date)
                 except Exception as e:
                     logger.warning(f"Failed to get fixed slot lessons: {e}")
                     return []
             
             def fetch_shift_slots():
-                """予定ブロック（休憩ブロック）を取得"""
+                """予定ブロック（休憩ブロック）を取得（60秒間キャッシュ）"""
                 try:
-                    shift_slots_response = client.get_shift_slots({"studio_id": actual_studio_id, "date": date})
-                    shift_slots_data = shift_slots_response.get("data", {}).get("shift_slots", {})
-                    return shift_slots_data.get("list", []) if isinstance(shift_slots_data, dict) else shift_slots_data
+                    return get_cached_shift_slots(client, actual_studio_id, date)
                 except Exception as e:
                     logger.warning(f"Failed to get shift slots: {e}")
                     return []
             
             def fetch_instructor_studio_map():
                 """スタッフのスタジオ紐付け情報を取得（キャッシュ付き）"""
+                if "map" not in includes:
+                    return {}
                 return get_cached_instructor_studio_map(client)
             
             def fetch_resources_info():
@@ -4660,75 +5542,60 @@ def get_choice_schedule():
             
             # 固定枠レッスンを処理
             for lesson in lessons:
-                fixed_slot_lessons.append({
-                    "id": lesson.get("id"),
-                    "start_at": lesson.get("start_at"),
-                    "end_at": lesson.get("end_at"),
-                    "instructor_id": lesson.get("instructor_id"),
-                    "instructor_ids": lesson.get("instructor_ids", []),
-                    "program_id": lesson.get("program_id"),
-                    "studio_id": lesson.get("studio_id"),
-                    "capacity": lesson.get("capacity", 0)
-                })
+                # レッスンのフィールドは1回だけ取り出して使い回す
+                lesson_id = lesson.get("id")
+                start_at_str = lesson.get("start_at")
+                end_at_str = lesson.get("end_at")
+                lesson_instructor_id = lesson.get("instructor_id")
+                lesson_instructor_ids = lesson.get("instructor_ids", [])
+                
+                if include_lessons:
+                    fixed_slot_lessons.append({
+                        "id": lesson_id,
+                        "start_at": start_at_str,
+                        "end_at": end_at_str,
+                        "instructor_id": lesson_instructor_id,
+                        "instructor_ids": lesson_instructor_ids,
+                        "program_id": lesson.get("program_id"),
+                        "studio_id": lesson.get("studio_id"),
+                        "capacity": lesson.get("capacity", 0)
+                    })
+                
+                if not include_blocks:
+                    continue
                 
                 # 固定枠レッスンの担当スタッフを予約として追加（前後のブロック時間を含む）
-                instructor_ids = lesson.get("instructor_ids", [])
-                if not instructor_ids and lesson.get("instructor_id"):
-                    instructor_ids = [lesson.get("instructor_id")]
+                instructor_ids = [i for i in (lesson_instructor_ids or [lesson_instructor_id]) if i]
+                if not instructor_ids or not start_at_str or not end_at_str:
+                    continue
                 
-                for instructor_id in instructor_ids:
-                    if instructor_id:
-                        start_at_str = lesson.get("start_at")
-                        end_at_str = lesson.get("end_at")
-                        
-                        if start_at_str and end_at_str:
-                            try:
-                                start_at = datetime.fromisoformat(start_at_str.replace("Z", "+00:00"))
-                                end_at = datetime.fromisoformat(end_at_str.replace("Z", "+00:00"))
-                                
-                                blocked_start = start_at - timedelta(minutes=FIXED_SLOT_BEFORE_INTERVAL_MINUTES)
-                                blocked_end = end_at + timedelta(minutes=FIXED_SLOT_AFTER_INTERVAL_MINUTES)
-                                
-                                fixed_slot_reservations.append({
-                                    "entity_id": instructor_id,
-                                    "entity_type": "INSTRUCTOR",
-                                    "start_at": blocked_start.isoformat(),
-                                    "end_at": blocked_end.isoformat(),
-                                    "original_start_at": start_at_str,
-                                    "original_end_at": end_at_str,
-                                    "studio_lesson_id": lesson.get("id"),
-                                    "reservation_type": "FIXED_SLOT_LESSON",
-                                    "before_interval": FIXED_SLOT_BEFORE_INTERVAL_MINUTES,
-                                    "after_interval": FIXED_SLOT_AFTER_INTERVAL_MINUTES
-                                })
-                            except Exception as e:
-                                logger.warning(f"Failed to parse lesson time: {e}")
+                # ブロック時間はレッスンごとに1回だけ計算し、担当スタッフ全員で共有
+                try:
+                    blocked_start_iso, blocked_end_iso = _fixed_slot_block_times(start_at_str, end_at_str)
+                except Exception as e:
+                    logger.warning(f"Failed to parse lesson time: {e}")
+                    continue
+                
+                # スタッフごとに異なるのは entity_id だけなので、共通部分を1つ作って展開する
+                lesson_block = {
+                    "entity_type": ENTITY_TYPE_INSTRUCTOR,
+                    "start_at": blocked_start_iso,
+                    "end_at": blocked_end_iso,
+                    "original_start_at": start_at_str,
+                    "original_end_at": end_at_str,
+                    "studio_lesson_id": lesson_id,
+                    "reservation_type": RESERVATION_TYPE_FIXED_SLOT_LESSON,
+                    "before_interval": FIXED_SLOT_BEFORE_INTERVAL_MINUTES,
+                    "after_interval": FIXED_SLOT_AFTER_INTERVAL_MINUTES
+                }
+                fixed_slot_reservations.extend(
+                    {"entity_id": instructor_id, **lesson_block} for instructor_id in instructor_ids
+                )
             
             logger.info(f"Found {len(fixed_slot_lessons)} fixed slot lessons and {len(fixed_slot_reservations)} instructor blocks for {date}")
             
             # 予定ブロックをスタッフと設備に分類
-            for slot in shift_slots:
-                entity_type = slot.get("entity_type", "").upper()
-                if entity_type == "INSTRUCTOR":
-                    shift_slot_reservations.append({
-                        "entity_id": slot.get("entity_id"),
-                        "entity_type": "INSTRUCTOR",
-                        "start_at": slot.get("start_at"),
-                        "end_at": slot.get("end_at"),
-                        "reservation_type": "SHIFT_SLOT",
-                        "title": slot.get("title", ""),
-                        "description": slot.get("description", "")
-                    })
-                elif entity_type == "RESOURCE":
-                    resource_shift_slot_reservations.append({
-                        "entity_id": slot.get("entity_id"),
-                        "entity_type": "RESOURCE",
-                        "start_at": slot.get("start_at"),
-                        "end_at": slot.get("end_at"),
-                        "reservation_type": "SHIFT_SLOT",
-                        "title": slot.get("title", ""),
-                        "description": slot.get("description", "")
-                    })
+            shift_slot_reservations, resource_shift_slot_reservations = _split_shift_slot_reservations(shift_slots)
             
             logger.info(f"Found {len(shift_slots)} shift slots ({len(shift_slot_reservations)} instructor, {len(resource_shift_slot_reservations)} resource) for {date}")
             if program_id:
@@ -4745,32 +5612,98 @@ def get_choice_schedule():
         
         logger.info(f"[PERF] Total get_choice_schedule: {time.perf_counter() - start_time:.3f}s")
         
-        return jsonify({
-            "schedule": {
-                "date": date,
-                "studio_id": actual_studio_id,  # スタジオIDも返す
-                "studio_room_service": schedule.get("studio_room_service"),
-                "shift": schedule.get("shift"),
-                "shift_studio_business_hour": schedule.get("shift_studio_business_hour", []),
-                "shift_instructor": schedule.get("shift_instructor", []),
-                "reservation_assign_instructor": all_instructor_reservations,
-                "reservation_assign_resource": all_resource_reservations,  # 設備の予約情報
-                "resources_info": resources_info,  # 設備情報（同時予約可能数を含む）
-                "fixed_slot_lessons": fixed_slot_lessons,
-                "fixed_slot_interval": {
-                    "before_minutes": FIXED_SLOT_BEFORE_INTERVAL_MINUTES,
-                    "after_minutes": FIXED_SLOT_AFTER_INTERVAL_MINUTES
-                },
-                "instructor_studio_map": instructor_studio_map,  # スタッフのスタジオ紐付け
-                "shift_slots": shift_slots,  # 予定ブロック（休憩ブロック）
-                "program_reservation_count": program_reservation_count  # その日のプログラム予約数
-            }
-        })
+        schedule_data = {
+            "date": date,
+            "studio_id": actual_studio_id,  # スタジオIDも返す
+            "studio_room_service": schedule.get("studio_room_service"),
+            "shift": schedule.get("shift"),
+            "shift_studio_business_hour": schedule.get("shift_studio_business_hour", []),
+            "shift_instructor": schedule.get("shift_instructor", []),
+            "reservation_assign_instructor": all_instructor_reservations,
+            "reservation_assign_resource": all_resource_reservations,  # 設備の予約情報
+            "resources_info": resources_info,  # 設備情報（同時予約可能数を含む）
+            "fixed_slot_lessons": fixed_slot_lessons,
+            "fixed_slot_interval": {
+                "before_minutes": FIXED_SLOT_BEFORE_INTERVAL_MINUTES,
+                "after_minutes": FIXED_SLOT_AFTER_INTERVAL_MINUTES
+            },
+            "instructor_studio_map": instructor_studio_map,  # スタッフのスタジオ紐付け
+            "shift_slots": shift_slots,  # 予定ブロック（休憩ブロック）
+            "program_reservation_count": program_reservation_count  # その日のプログラム予約数
+        }
+        for key in _get_schedule_excluded_keys(includes):
+            del schedule_data[key]
+        
+        response = _set_schedule_included_header(jsonify({"schedule": schedule_data}), includes)
+        return _make_conditional_schedule_response(response, _compute_json_etag((response.get_data(),)))
     except HacomonoAPIError as e:
         logger.error(f"Failed to get choice schedule: {e}")
         return jsonify({"error": "Failed to get schedule", "message": str(e)}), 400
 
 
+def _get_valid_choice_schedule_range_cache(cache_key: str):
+    """有効期限内のchoice-schedule-rangeキャッシュを返す（なければNone）"""
+    cached_data = _choice_schedule_range_cache.get(cache_key)
+    cached_time = _choice_schedule_range_cache_time.get(cache_key)
+    if (cached_data is not None and
+        cached_time is not None and
+        time.monotonic() - cached_time < CHOICE_SCHEDULE_RANGE_CACHE_TTL_SECONDS):
+        return cached_data
+    return None
+
+
+def _get_choice_schedule_range_lock(cache_key: str) -> threading.Lock:
+    """キャッシュキーに対応するロックを取得（固定数のロックからキーのハッシュで選ぶ）"""
+    return _choice_schedule_range_locks[hash(cache_key) % CHOICE_SCHEDULE_RANGE_LOCK_STRIPES]
+
+
+def _serialize_choice_schedule_range(response_data: dict) -> list:
+    """rangeレスポンスを日付ごとのJSON断片（bytes）に分割してシリアライズ
+    
+    全体を1つの巨大な文字列にせず、日付単位の断片のままストリーミングで返すために使う。
+    """
+    chunks = []
+    for i, (key, value) in enumerate(response_data.items()):
+        prefix = (b"{" if i == 0 else b",") + _json_dumps_bytes(key) + b":"
+        if key == "schedules" and isinstance(value, dict):
+            chunks.append(prefix + b"{")
+            for j, (date, schedule) in enumerate(value.items()):
+                chunks.append((b"," if j else b"") + _json_dumps_bytes(date) + b":" + _json_dumps_bytes(schedule))
+            chunks.append(b"}")
+        else:
+            chunks.append(prefix + _json_dumps_bytes(value))
+    chunks.append(b"}")
+    return chunks
+
+
+def _choice_schedule_range_json_response(cache_key: str, response_data: dict, includes: frozenset = SCHEDULE_INCLUDE_ALL):
+    """rangeレスポンスをJSONでストリーミング返却（同じキャッシュデータならシリアライズ済みの断片を再利用）
+    
+    include で一部のセクションだけが指定された場合は、キャッシュデータから該当キーを除いて都度シリアライズする。
+    """
+    if includes == SCHEDULE_INCLUDE_ALL:
+        cached_body = _choice_schedule_range_body_cache.get(cache_key)
+        if cached_body is not None and cached_body[0] is response_data:
+            chunks, etag = cached_body[1], cached_body[2]
+        else:
+            chunks = _serialize_choice_schedule_range(response_data)
+            etag = _compute_json_etag(chunks)
+            _choice_schedule_range_body_cache[cache_key] = (response_data, chunks, etag)
+    else:
+        excluded_keys = _get_schedule_excluded_keys(includes)
+        chunks = _serialize_choice_schedule_range({
+            **response_data,
+            "schedules": {
+                date: {k: v for k, v in schedule.items() if k not in excluded_keys} if schedule else schedule
+                for date, schedule in response_data["schedules"].items()
+            }
+        })
+        etag = _compute_json_etag(chunks)
+    response = app.response_class(iter(chunks), mimetype=app.json.mimetype)
+    _set_schedule_included_header(response, includes)
+    return _make_conditional_schedule_response(response, etag)
+
+
 @app.route("/api/choice-schedule-range", methods=["GET"])
 @handle_errors
 def get_choice_schedule_range():
@@ -4779,8 +5712,6 @@ def get_choice_schedule_range():
     7日分のスケジュールを1回のリクエストで取得。
     完全なレスポンスをキャッシュして高速化。
     """
-    global _choice_schedule_range_cache, _choice_schedule_range_cache_time
-    
     studio_room_id = request.args.get("studio_room_id", type=int)
     program_id = request.args.get("program_id", type=int)
     date_from = request.args.get("date_from")
@@ -4792,31 +5723,43 @@ def get_choice_schedule_range():
     if not date_from:
         date_from = datetime.now().strftime("%Y-%m-%d")
     
+    try:
+        start_date = datetime.fromisoformat(date_from)
+        end_date = datetime.fromisoformat(date_to) if date_to else start_date + timedelta(days=6)
+    except ValueError:
+        return jsonify({"error": "Invalid date format (expected YYYY-MM-DD)"}), 400
+    
     if not date_to:
-        date_to = (datetime.strptime(date_from, "%Y-%m-%d") + timedelta(days=6)).strftime("%Y-%m-%d")
+        date_to = end_date.strftime("%Y-%m-%d")
+    
+    if (end_date - start_date).days >= CHOICE_SCHEDULE_RANGE_MAX_DAYS:
+        return jsonify({"error": f"Date range must be {CHOICE_SCHEDULE_RANGE_MAX_DAYS} days or less"}), 400
+    
+    includes = _get_schedule_includes()
     
     # キャッシュキーを生成
     cache_key = f"{studio_room_id}:{date_from}:{date_to}:{program_id or 'none'}"
-    now = datetime.now()
     
     # キャッシュチェック
-    cached_data = _choice_schedule_range_cache.get(cache_key)
-    cached_time = _choice_schedule_range_cache_time.get(cache_key)
-    
-    if (cached_data is not None and 
-        cached_time is not None and
-        (now - cached_time).total_seconds() < CHOICE_SCHEDULE_RANGE_CACHE_TTL_SECONDS):
+    cached_data = _get_valid_choice_schedule_range_cache(cache_key)
+    if cached_data is not None:
         logger.debug(f"Using cached choice-schedule-range for {cache_key}")
-        return jsonify(cached_data)
+        return _choice_schedule_range_json_response(cache_key, cached_data, includes)
     
-    # キャッシュミス - refresh関数を使用
+    # キャッシュミス - refresh関数を使用（同じキーの同時リクエストは1回の取得にまとめる）
     client = get_hacomono_client()
     
     try:
-        response_data = refresh_choice_schedule_range_cache(
-            client, studio_room_id, date_from, date_to, program_id
-        )
-        return jsonify(response_data)
+        with _get_choice_schedule_range_lock(cache_key):
+            response_data = _get_valid_choice_schedule_range_cache(cache_key)
+            if response_data is None:
+                response_data = refresh_choice_schedule_range_cache(
+                    client, studio_room_id, date_from, date_to, program_id
+                )
+        return _choice_schedule_range_json_response(cache_key, response_data, includes)
+    except InstructorStudioMapUnavailableError:
+        # 紐付け情報なしのスケジュールは返さない（handle_errors で 503 にする）
+        raise
     except Exception as e:
         logger.error(f"Failed to get choice schedule range: {e}")
         return jsonify({"error": "Failed to get schedule range", "message": str(e)}), 500
@@ -4828,7 +5771,8 @@ def get_choice_reserve_context():
     """自由枠予約コンテキストを取得（予約可否を事前確認）"""
     client = get_hacomono_client()
     
-    data = request.get_json()
+    # 不正なJSONも本文なしとして400を返す（パース結果はリクエスト内でキャッシュされる）
+    data = request.get_json(silent=True)
     if not data:
         return jsonify({"error": "Missing request body"}), 400
     
@@ -4856,11 +5800,11 @@ def get_choice_reserve_context():
     if instructor_ids:
         context_data["instructor_ids"] = instructor_ids
     
-    logger.info(f"Calling choice reserve context with: {context_data}")
+    logger.info("Calling choice reserve context with: %s", context_data)
     
     try:
         response = client.get_choice_reserve_context(context_data)
-        logger.info(f"Choice reserve context response: {response}")
+        logger.info("Choice reserve context response: %s", response)
         
         context = response.get("data", {}).get("choice_reserve_context", {})
         
@@ -4893,7 +5837,7 @@ def get_choice_reserve_context():
             is_reservable = position in ["TICKET", "PLAN"] or (position == "DENY" and len(non_ticket_errors) == 0)
             error_message = None
         
-        logger.info(f"Reservability check: position={position}, instructors={instructors}, is_reservable={is_reservable}, errors={errors}")
+        logger.info("Reservability check: position=%s, instructors=%s, is_reservable=%s, errors=%s", position, instructors, is_reservable, errors)
         
         # 予約可否の判定情報を返す
         return jsonify({
@@ -10,11 +10,82 @@ import json
 import logging
 import threading
 import requests
-from typing import Optional, Dict, Any, List
+from urllib3.util.retry import Retry
+from typing import Optional, Dict, Any, List, Iterator
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+
+# 高速JSONパーサ（未インストール時は requests 標準のデコードを使用）
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# hacomono API へのリクエストタイムアウト（秒）: (接続, 読み込み)
+# 接続できないホストは早めに諦め、応答の遅いAPI（一覧取得など）は従来どおり待つ
+REQUEST_TIMEOUT_SECONDS = (3.05, 20)
+# 同一ホストへの並列リクエスト（日付ごとのスケジュール取得など）で再利用するコネクション数
+CONNECTION_POOL_MAXSIZE = 20
+# 429 を受けて絞ったレートを元に戻すまでの時間（秒）
+RATE_LIMIT_RECOVERY_SECONDS = 30.0
+# 店舗・プログラム・スタジオルームの詳細（ほぼ変更されないマスタ）をキャッシュする時間（秒）と最大件数
+MASTER_CACHE_TTL_SECONDS = 60
+MASTER_CACHE_MAXSIZE = 1024
+
+# 予約の関連情報（レッスン・プログラム・店舗など）を並列に取得するスレッドプール（全クライアントで共有）
+# 1リクエストで同時に最大3件取得するため、同時リクエスト数（WORKER_THREADS、gunicorn の --threads）の3倍を確保する
+_bundle_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("BUNDLE_EXECUTOR_MAX_WORKERS", int(os.environ.get("WORKER_THREADS", "8")) * 3)),
+    thread_name_prefix="hacomono-bundle"
+)
+
+
+class TokenBucket:
+    """トークンバケット方式のレートリミッター（スレッドセーフ）
+    
+    rate（件/秒）でトークンを補充し、最大 burst 件までまとめてリクエストを許可する。
+    429 を受けた場合は penalize() でレートを半減し、RATE_LIMIT_RECOVERY_SECONDS かけて
+    元のレートまで線形に回復させる（AIMD）。
+    """
+    
+    def __init__(self, rate: float, burst: int):
+        self.base_rate = rate
+        self.burst = burst
+        self._rate = rate
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        """経過時間に応じてレートを回復し、トークンを補充（ロック内で呼ぶ）"""
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        if self._rate < self.base_rate:
+            recovery = self.base_rate * elapsed / RATE_LIMIT_RECOVERY_SECONDS
+            self._rate = min(self.base_rate, self._rate + recovery)
+        self._tokens = min(self.burst, self._tokens + elapsed * self._rate)
+    
+    def acquire(self):
+        """トークンを1つ取得（足りなければ補充されるまで待機）"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        # 待機はロック外で行い、他スレッドは自分の順番（負のトークン）を計算できるようにする
+        if wait > 0:
+            time.sleep(wait)
+    
+    def penalize(self):
+        """429 を受けたときにレートを半減する"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._rate = max(self.base_rate / 16, self._rate / 2)
+            logger.warning(f"hacomono rate limit hit, throttling to {self._rate:.2f} req/s")
+
 
 class HacomonoClient:
     """hacomono Admin API クライアント"""
@@ -35,18 +106,53 @@ class HacomonoClient:
         self.client_secret = client_secret
         self.admin_domain = admin_domain or f"{brand_code}-admin.hacomono.jp"
         
+        # 認証ヘッダーはトークン更新時にだけ作り直す（更新はロックで1スレッドに限定）
+        self._auth_headers = {"Authorization": f"Bearer {access_token}"}
+        self._token_lock = threading.Lock()
+        
         self.base_url = f"https://{brand_code}.admin.egw.hacomono.app/api/v2"
         self.token_url = f"https://{self.admin_domain}/api/oauth/token"
         
-        # Rate limiting (スレッドセーフ対応)
-        self._last_request_time: Dict[str, float] = {}
-        self._rate_limit_lock = threading.Lock()
+        # Rate limiting（メソッドごとのトークンバケット、スレッドセーフ）
         self._rate_limits = {
-            "GET": 10,  # 10 requests per second
-            "POST": 2,
-            "PUT": 2,
-            "DELETE": 2
+            "GET": TokenBucket(rate=10, burst=20),  # 10 requests per second
+            "POST": TokenBucket(rate=2, burst=2),
+            "PUT": TokenBucket(rate=2, burst=2),
+            "DELETE": TokenBucket(rate=2, burst=2)
         }
+        
+        # HTTP セッション（Keep-Alive で TCP/TLS 接続を並列リクエスト間で再利用）
+        # 固定のヘッダーはセッションに持たせ、リクエストごとには認証ヘッダーだけを渡す
+        self._session = requests.Session()
+        # 接続エラーと 502/503/504 は GET（冪等）だけバックオフ付きで再送する
+        # （429 とトークン切れの 401 は _request で扱う。予約作成などの POST は二重登録を避けるため再送しない）
+        # 再送はトークンバケットを通らないため回数を絞り、読み込みタイムアウトは再送しない
+        # （読み込みタイムアウト20秒の再送でワーカーを長時間ふさがないようにする）
+        self._session.mount(
+            "https://",
+            requests.adapters.HTTPAdapter(
+                pool_connections=2,
+                pool_maxsize=CONNECTION_POOL_MAXSIZE,
+                max_retries=Retry(
+                    total=2,
+                    connect=2,
+                    read=0,
+                    status=1,
+                    backoff_factor=0.2,
+                    status_forcelist=[502, 503, 504],
+                    allowed_methods=frozenset({"GET"}),
+                    raise_on_status=False
+                )
+            )
+        )
+        self._session.headers.update({
+            "X-Requested-With": "XMLHttpRequest",
+            "Content-Type": "application/json"
+        })
+        
+        # マスタ詳細のTTL付きLRUキャッシュ（エンドポイント -> (取得時刻, レスポンス)）
+        self._master_cache: Dict[str, tuple] = {}
+        self._master_cache_lock = threading.Lock()
     
     @classmethod
     def from_env(cls) -> "HacomonoClient":
@@ -61,36 +167,19 @@ class HacomonoClient:
         )
     
     def _get_headers(self) -> Dict[str, str]:
-        """リクエストヘッダーを取得"""
-        return {
-            "Authorization": f"Bearer {self.access_token}",
-            "X-Requested-With": "XMLHttpRequest",
-            "Content-Type": "application/json"
-        }
+        """リクエストヘッダーを取得（X-Requested-With / Content-Type はセッションの既定ヘッダー）"""
+        return self._auth_headers
     
     def _rate_limit(self, method: str):
         """Rate limiting を適用（スレッドセーフ）"""
-        key = method.upper()
-        limit = self._rate_limits.get(key, 10)
-        min_interval = 1.0 / limit
-        
-        with self._rate_limit_lock:
-            now = time.time()
-            last_time = self._last_request_time.get(key, 0)
-            elapsed = now - last_time
-            
-            if elapsed < min_interval:
-                sleep_time = min_interval - elapsed
-                time.sleep(sleep_time)
-            
-            self._last_request_time[key] = time.time()
+        self._rate_limits.get(method.upper(), self._rate_limits["GET"]).acquire()
     
     def _handle_response(self, response: requests.Response) -> Dict[str, Any]:
         """レスポンスを処理"""
         if response.status_code == 401:
             # Token expired, try to refresh
             if self.refresh_token and self.client_id and self.client_secret:
-                self._refresh_access_token()
+                self._refresh_access_token(response.request.headers.get("Authorization"))
                 raise TokenRefreshedError("Token was refreshed, please retry")
             raise AuthenticationError("Access token is invalid or expired")
         
@@ -105,13 +194,29 @@ class HacomonoClient:
                 response_body=response.text
             )
         
+        if ORJSON_AVAILABLE:
+            # bytes から直接デコード（テキストへの変換を省く）
+            return orjson.loads(response.content)
         return response.json()
     
-    def _refresh_access_token(self):
-        """アクセストークンを更新"""
+    def _refresh_access_token(self, stale_authorization: Optional[str] = None):
+        """アクセストークンを更新
+        
+        Args:
+            stale_authorization: 401 を受けたリクエストの Authorization ヘッダー。
+                ほかのスレッドが既に更新済みなら、リフレッシュトークンを消費せずに戻る
+        """
         if not all([self.refresh_token, self.client_id, self.client_secret]):
             raise AuthenticationError("Cannot refresh token: missing credentials")
         
+        with self._token_lock:
+            if stale_authorization is not None and stale_authorization != self._auth_headers["Authorization"]:
+                logger.info("Access token was already refreshed by another request")
+                return
+            self._refresh_access_token_locked()
+    
+    def _refresh_access_token_locked(self):
+        """アクセストークンを更新（_token_lock を保持して呼ぶ）"""
         data = {
             "grant_type": "refresh_token",
             "refresh_token": self.refresh_token,
@@ -119,10 +224,11 @@ class HacomonoClient:
             "client_secret": self.client_secret
         }
         
-        response = requests.post(
+        response = self._session.post(
             self.token_url,
             json=data,
-            headers={"Content-Type": "application/json"}
+            headers={"Content-Type": "application/json"},
+            timeout=REQUEST_TIMEOUT_SECONDS
         )
         
         if not response.ok:
@@ -132,6 +238,7 @@ class HacomonoClient:
         self.access_token = token_data["access_token"]
         if "refresh_token" in token_data:
             self.refresh_token = token_data["refresh_token"]
+        self._auth_headers = {"Authorization": f"Bearer {self.access_token}"}
         
         logger.info("Access token refreshed successfully")
     
@@ -149,12 +256,13 @@ class HacomonoClient:
         url = f"{self.base_url}{endpoint}"
         
         try:
-            response = requests.request(
+            response = self._session.request(
                 method=method,
                 url=url,
                 headers=self._get_headers(),
                 params=params,
-                json=data if data else None
+                json=data if data else None,
+                timeout=REQUEST_TIMEOUT_SECONDS
             )
             return self._handle_response(response)
         except TokenRefreshedError:
@@ -162,6 +270,8 @@ class HacomonoClient:
                 return self._request(method, endpoint, params, data, retry_count - 1)
             raise
         except RateLimitError as e:
+            # 以降のリクエストも含めて送信レートを絞る
+            self._rate_limits.get(method.upper(), self._rate_limits["GET"]).penalize()
             if retry_count > 0:
                 time.sleep(e.retry_after)
                 return self._request(method, endpoint, params, data, retry_count - 1)
@@ -183,6 +293,30 @@ class HacomonoClient:
         """DELETEリクエスト"""
         return self._request("DELETE", endpoint, data=data)
     
+    def _get_master(self, endpoint: str) -> Dict[str, Any]:
+        """マスタ詳細を MASTER_CACHE_TTL_SECONDS の間キャッシュして取得（LRU、最大 MASTER_CACHE_MAXSIZE 件）"""
+        now = time.monotonic()
+        with self._master_cache_lock:
+            cached = self._master_cache.pop(endpoint, None)
+            if cached is not None and now - cached[0] < MASTER_CACHE_TTL_SECONDS:
+                # 末尾に入れ直して最近使ったエントリにする
+                self._master_cache[endpoint] = cached
+                return cached[1]
+        
+        result = self.get(endpoint)
+        with self._master_cache_lock:
+            self._master_cache[endpoint] = (now, result)
+            while len(self._master_cache) > MASTER_CACHE_MAXSIZE:
+                self._master_cache.pop(next(iter(self._master_cache)))
+        return result
+    
+    def clear_master_cache(self) -> int:
+        """マスタ詳細のキャッシュを破棄し、破棄した件数を返す"""
+        with self._master_cache_lock:
+            count = len(self._master_cache)
+            self._master_cache.clear()
+        return count
+    
     # ==================== マスタ API ====================
     
     def get_studios(self, query: Optional[Dict] = None) -> Dict[str, Any]:
@@ -193,8 +327,8 @@ class HacomonoClient:
         return self.get("/master/studios", params=params)
     
     def get_studio(self, studio_id: int) -> Dict[str, Any]:
-        """店舗を取得"""
-        return self.get(f"/master/studios/{studio_id}")
+        """店舗を取得（MASTER_CACHE_TTL_SECONDS の間キャッシュ）"""
+        return self._get_master(f"/master/studios/{studio_id}")
     
     def get_programs(self, query: Optional[Dict] = None) -> Dict[str, Any]:
         """プログラム一覧を取得"""
@@ -203,9 +337,13 @@ class HacomonoClient:
             params["query"] = json.dumps(query)
         return self.get("/master/programs", params=params)
     
-    def get_program(self, program_id: int) -> Dict[str, Any]:
-        """プログラムを取得"""
-        return self.get(f"/master/programs/{program_id}")
+    def get_program(self, program_id: int, use_cache: bool = True) -> Dict[str, Any]:
+        """プログラムを取得（use_cache=True なら MASTER_CACHE_TTL_SECONDS の間キャッシュ）
+        
+        呼び出し側で独自にキャッシュする場合は use_cache=False で二重にキャッシュしない。
+        """
+        endpoint = f"/master/programs/{program_id}"
+        return self._get_master(endpoint) if use_cache else self.get(endpoint)
     
     def get_studio_lessons(
         self, 
@@ -280,8 +418,8 @@ class HacomonoClient:
         return self.get("/master/studio-rooms", params=params)
     
     def get_studio_room(self, studio_room_id: int) -> Dict[str, Any]:
-        """スタジオルームを取得"""
-        return self.get(f"/master/studio-rooms/{studio_room_id}")
+        """スタジオルームを取得（MASTER_CACHE_TTL_SECONDS の間キャッシュ）"""
+        return self._get_master(f"/master/studio-rooms/{studio_room_id}")
     
     def get_studio_room_spaces(self, studio_room_id: int = None) -> Dict[str, Any]:
         """スタジオルームのスペース一覧を取得"""
@@ -324,10 +462,114 @@ class HacomonoClient:
             params["query"] = json.dumps(query)
         return self.get("/reservation/reservations", params=params)
     
+    def iter_reservations(
+        self,
+        query: Optional[Dict] = None,
+        page_size: int = 100,
+        max_pages: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """予約一覧を全ページ分、1件ずつ返す
+        
+        ページ単位で取得しながら返すため、全件をまとめたリストは作らない。
+        最終ページ（total_page に達したか、page_size 未満のページ）で終了し、
+        max_pages を指定した場合はそのページ数で警告を記録して打ち切る。
+        
+        Args:
+            query: 検索クエリ
+            page_size: 1ページあたりの取得件数
+            max_pages: 取得する最大ページ数（None の場合は上限なし）
+        """
+        params = {"length": page_size}
+        if query:
+            params["query"] = json.dumps(query)
+        
+        page = 1
+        while True:
+            params["page"] = page
+            result = self.get("/reservation/reservations", params=params)
+            reservations = result.get("data", {}).get("reservations", {})
+            page_list = reservations.get("list", [])
+            yield from page_list
+            if page >= reservations.get("total_page", 1) or len(page_list) < page_size:
+                return
+            if max_pages is not None and page >= max_pages:
+                logger.warning(f"Stopped listing reservations after {page} pages (query: {query})")
+                return
+            page += 1
+    
     def get_reservation(self, reservation_id: int) -> Dict[str, Any]:
         """予約を取得"""
         return self.get(f"/reservation/reservations/{reservation_id}")
     
+    def get_reservation_bundle(self, reservation_id: int) -> Dict[str, Any]:
+        """予約とメンバーを取得（関連情報は load_reservation_details で後から取得する）
+        
+        閲覧権限の検証に必要な予約とメンバーだけを先に取得し、検証に失敗したリクエストで
+        レッスン・スタジオルーム・プログラム・店舗まで問い合わせないようにします。
+        予約自体の取得失敗は例外として送出し、メンバーの取得に失敗した場合は None になります。
+        
+        Args:
+            reservation_id: 予約ID
+        
+        Returns:
+            { "reservation": ..., "member": ..., "lesson": None, "studio_room": None, "program": None, "studio": None }
+        """
+        reservation = self.get_reservation(reservation_id).get("data", {}).get("reservation", {})
+        bundle = {"reservation": reservation, "member": None, "lesson": None,
+                  "studio_room": None, "program": None, "studio": None}
+        member_id = reservation.get("member_id")
+        if member_id:
+            bundle["member"] = self._fetch_bundle_item("member", self.get_member, member_id)
+        return bundle
+    
+    def load_reservation_details(self, bundle: Dict[str, Any]) -> Dict[str, Any]:
+        """get_reservation_bundle の結果にレッスン・スタジオルーム・プログラム・店舗を追加
+        
+        互いに依存しない取得を2段に分けて並列に発行します。取得に失敗した項目は None になります。
+        
+        Args:
+            bundle: get_reservation_bundle の戻り値（この辞書を更新して返す）
+        """
+        reservation = bundle["reservation"]
+        studio_lesson_id = reservation.get("studio_lesson_id")
+        studio_room_id = reservation.get("studio_room_id") if not studio_lesson_id else None
+        # 自由枠のプログラムIDは予約に含まれているため、1段目で取得できる
+        program_id = reservation.get("program_id") if studio_room_id else None
+        
+        fetch = self._fetch_bundle_item
+        # 1段目: レッスン（固定枠）またはスタジオルーム（自由枠）
+        futures = {}
+        if studio_lesson_id:
+            futures["lesson"] = _bundle_executor.submit(fetch, "studio_lesson", self.get_studio_lesson, studio_lesson_id)
+        if studio_room_id:
+            futures["studio_room"] = _bundle_executor.submit(fetch, "studio_room", self.get_studio_room, studio_room_id)
+        if program_id:
+            futures["program"] = _bundle_executor.submit(fetch, "program", self.get_program, program_id)
+        
+        # 2段目: レッスン／スタジオルームから決まるプログラム・店舗
+        parent = None
+        if "lesson" in futures:
+            parent = bundle["lesson"] = futures.pop("lesson").result()
+            if parent and parent.get("program_id"):
+                futures["program"] = _bundle_executor.submit(fetch, "program", self.get_program, parent["program_id"])
+        elif "studio_room" in futures:
+            parent = bundle["studio_room"] = futures.pop("studio_room").result()
+        if parent and parent.get("studio_id"):
+            futures["studio"] = _bundle_executor.submit(fetch, "studio", self.get_studio, parent["studio_id"])
+        
+        for name, future in futures.items():
+            bundle[name] = future.result()
+        return bundle
+    
+    @staticmethod
+    def _fetch_bundle_item(key: str, method, entity_id: int) -> Optional[Dict[str, Any]]:
+        """関連情報を1件取得（失敗時は警告を記録して None を返す）"""
+        try:
+            return method(entity_id).get("data", {}).get(key, {})
+        except Exception as e:
+            logger.warning(f"Failed to get {key} info: {e}")
+            return None
+    
     def get_reservation_context(self, params: Dict) -> Dict[str, Any]:
         """予約詳細コンテキストを取得"""
         query_params = {"query": json.dumps(params)}
@@ -0,0 +1,11 @@
+"""テスト共通設定（backend ディレクトリのモジュールを import できるようにする）"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# app の import 時にhacomonoへは接続しないが、クライアント作成に必要な環境変数を用意しておく
+os.environ.setdefault("HACOMONO_ACCESS_TOKEN", "test-token")
@@ -0,0 +1,87 @@
+"""予約済み時間帯の重なり判定（_build_busy_intervals / _overlaps_busy_intervals）のテスト"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import app
+
+BASE = datetime(2026, 1, 5, 9, 0, tzinfo=timezone.utc)
+
+
+def _iso(minutes: int) -> str:
+    return (BASE + timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _ts(minutes: int) -> float:
+    return (BASE + timedelta(minutes=minutes)).timestamp()
+
+
+def _reservation(start: int, end: int, entity_id: int = 1, reservation_type: str = None) -> dict:
+    return {"entity_id": entity_id, "start_at": _iso(start), "end_at": _iso(end), "reservation_type": reservation_type}
+
+
+def _overlaps(reservations: list, start: int, end: int, entity_id: int = 1, **kwargs) -> bool:
+    busy = app._build_busy_intervals(reservations, **kwargs).get(entity_id)
+    return busy is not None and app._overlaps_busy_intervals(busy, _ts(start), _ts(end))
+
+
+def test_touching_intervals_do_not_overlap():
+    reservations = [_reservation(60, 120)]
+    assert not _overlaps(reservations, 0, 60)
+    assert not _overlaps(reservations, 120, 180)
+    assert _overlaps(reservations, 59, 61)
+    assert _overlaps(reservations, 119, 121)
+
+
+def test_touching_busy_intervals_are_merged():
+    busy = app._build_busy_intervals([_reservation(0, 60), _reservation(60, 120)])[1]
+    assert busy == ([_ts(0)], [_ts(120)])
+    assert _overlaps([_reservation(0, 60), _reservation(60, 120)], 50, 70)
+
+
+def test_zero_length_busy_interval():
+    reservations = [_reservation(60, 60)]
+    assert _overlaps(reservations, 30, 90)
+    assert not _overlaps(reservations, 0, 60)
+    assert not _overlaps(reservations, 60, 120)
+
+
+def test_unsorted_input():
+    reservations = [_reservation(300, 360), _reservation(0, 30), _reservation(120, 180), _reservation(150, 240)]
+    busy = app._build_busy_intervals(reservations)[1]
+    assert busy == ([_ts(0), _ts(120), _ts(300)], [_ts(30), _ts(240), _ts(360)])
+    assert _overlaps(reservations, 200, 210)
+    assert not _overlaps(reservations, 240, 300)
+
+
+def test_intervals_are_widened_except_for_block_types():
+    reservations = [
+        _reservation(60, 120, reservation_type="CHOICE"),
+        _reservation(300, 360, reservation_type=app.RESERVATION_TYPE_SHIFT_SLOT),
+    ]
+    assert _overlaps(reservations, 0, 50, before_minutes=15, after_minutes=15)
+    assert _overlaps(reservations, 130, 180, before_minutes=15, after_minutes=15)
+    assert not _overlaps(reservations, 240, 300, before_minutes=15, after_minutes=15)
+    assert not _overlaps(reservations, 360, 420, before_minutes=15, after_minutes=15)
+
+
+def test_entities_are_kept_separate():
+    reservations = [_reservation(60, 120, entity_id=1), _reservation(0, 240, entity_id=2)]
+    assert not _overlaps(reservations, 0, 60, entity_id=1)
+    assert _overlaps(reservations, 0, 60, entity_id=2)
+
+
+def test_matches_pairwise_overlap_check():
+    rng = random.Random(20261016)
+    for _ in range(500):
+        intervals = []
+        for _ in range(rng.randint(0, 8)):
+            start = rng.randint(0, 600)
+            intervals.append((start, start + rng.randint(0, 120)))
+        reservations = [_reservation(start, end) for start, end in intervals]
+        busy = app._build_busy_intervals(reservations).get(1, ([], []))
+        for _ in range(20):
+            start = rng.randint(0, 720)
+            end = start + rng.randint(1, 120)
+            expected = any(start < r_end and r_start < end for r_start, r_end in intervals)
+            assert app._overlaps_busy_intervals(busy, _ts(start), _ts(end)) == expected
@@ -0,0 +1,58 @@
+"""HacomonoClient のページ送りのテスト（hacomonoへは接続しない）"""
+
+import json
+
+from hacomono_client import HacomonoClient
+
+
+class _PagedClient(HacomonoClient):
+    """予約一覧APIのレスポンスをページごとに差し替えたクライアント"""
+
+    def __init__(self, pages: list, total_page: int):
+        super().__init__(brand_code="test", access_token="test-token")
+        self.pages = pages
+        self.total_page = total_page
+        self.requested_pages = []
+
+    def get(self, endpoint, params=None):
+        page = params["page"]
+        self.requested_pages.append(page)
+        return {"data": {"reservations": {"list": self.pages[page - 1], "total_page": self.total_page}}}
+
+
+def _page(start: int, size: int) -> list:
+    return [{"id": i} for i in range(start, start + size)]
+
+
+def test_iter_reservations_stops_on_short_page():
+    # total_page が実際より大きく返っても、page_size 未満のページで終了する
+    client = _PagedClient([_page(0, 3), _page(3, 3), _page(6, 1), _page(7, 3)], total_page=10)
+    reservations = list(client.iter_reservations({"date_from": "2026-01-01"}, page_size=3))
+    assert [r["id"] for r in reservations] == list(range(7))
+    assert client.requested_pages == [1, 2, 3]
+
+
+def test_iter_reservations_stops_at_total_page():
+    client = _PagedClient([_page(0, 2), _page(2, 2), _page(4, 2)], total_page=2)
+    assert len(list(client.iter_reservations(page_size=2))) == 4
+    assert client.requested_pages == [1, 2]
+
+
+def test_iter_reservations_stops_at_max_pages():
+    client = _PagedClient([_page(i * 2, 2) for i in range(10)], total_page=10)
+    assert len(list(client.iter_reservations(page_size=2, max_pages=3))) == 6
+    assert client.requested_pages == [1, 2, 3]
+
+
+def test_iter_reservations_sends_query_and_page_size():
+    seen = []
+
+    class _Client(_PagedClient):
+        def get(self, endpoint, params=None):
+            seen.append((endpoint, dict(params)))
+            return super().get(endpoint, params)
+
+    client = _Client([_page(0, 1)], total_page=1)
+    list(client.iter_reservations({"date_from": "2026-01-01"}, page_size=50))
+    assert seen == [("/reservation/reservations",
+                     {"length": 50, "page": 1, "query": json.dumps({"date_from": "2026-01-01"})})]
@@ -0,0 +1,47 @@
+"""TokenBucket（hacomonoへのリクエストのレート制限）のテスト"""
+
+import hacomono_client
+from hacomono_client import TokenBucket
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_allows_burst_then_paces(monkeypatch):
+    clock = _FakeClock()
+    monkeypatch.setattr(hacomono_client.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(hacomono_client.time, "sleep", clock.sleep)
+
+    bucket = TokenBucket(rate=2, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [0.5]
+
+
+def test_token_bucket_penalize_halves_rate_and_recovers(monkeypatch):
+    clock = _FakeClock()
+    monkeypatch.setattr(hacomono_client.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(hacomono_client.time, "sleep", clock.sleep)
+
+    bucket = TokenBucket(rate=8, burst=1)
+    bucket.penalize()
+    assert bucket._rate == 4
+    for _ in range(10):
+        bucket.penalize()
+    assert bucket._rate == 8 / 16
+
+    clock.now += hacomono_client.RATE_LIMIT_RECOVERY_SECONDS
+    bucket.acquire()
+    assert bucket._rate == 8
@@ -0,0 +1,60 @@
+"""予約確認URLの認証ハッシュ（v2 / 旧方式）のテスト"""
+
+import hashlib
+
+import app
+
+EMAIL = "Guest@Example.com "
+PHONE = "090-1234 5678"
+
+
+def _legacy_reference(email: str, phone: str) -> str:
+    """旧実装（SHA256 + ソルト、先頭16文字）と同じ計算"""
+    normalized_phone = phone.replace("-", "").replace(" ", "").strip()
+    data = f"{email.lower().strip()}:{normalized_phone}:{app.VERIFICATION_SALT}"
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def test_v2_hash_is_accepted():
+    verify = app.generate_verification_hash(EMAIL, PHONE)
+    assert verify.startswith(app.VERIFICATION_HASH_PREFIX)
+    assert app.verify_hash(EMAIL, PHONE, verify)
+    assert app.verify_hash("guest@example.com", "09012345678", verify)
+
+
+def test_legacy_hash_is_accepted():
+    verify = _legacy_reference(EMAIL, PHONE)
+    assert app._generate_legacy_verification_hash(EMAIL, PHONE) == verify
+    assert app.verify_hash(EMAIL, PHONE, verify)
+
+
+def test_legacy_hash_keeps_old_phone_normalization():
+    phone = "090　1234\t5678"
+    assert app._generate_legacy_verification_hash(EMAIL, phone) == _legacy_reference(EMAIL, phone)
+    assert app.verify_hash(EMAIL, phone, _legacy_reference(EMAIL, phone))
+
+
+def test_v2_hash_issued_with_old_phone_normalization_is_accepted():
+    phone = "090　1234-5678"
+    old_verify = app._generate_v2_verification_hash(EMAIL, phone, app._LEGACY_PHONE_STRIP_TABLE)
+    assert old_verify != app.generate_verification_hash(EMAIL, phone)
+    assert app.verify_hash(EMAIL, phone, old_verify)
+
+
+def test_tampered_hash_is_rejected():
+    verify = app.generate_verification_hash(EMAIL, PHONE)
+    tampered = verify[:-1] + ("0" if verify[-1] != "0" else "1")
+    assert not app.verify_hash(EMAIL, PHONE, tampered)
+    assert not app.verify_hash(EMAIL, PHONE, verify[len(app.VERIFICATION_HASH_PREFIX):])
+    assert not app.verify_hash(EMAIL, PHONE, _legacy_reference(EMAIL, PHONE)[:-1] + "x")
+    assert not app.verify_hash("other@example.com", PHONE, verify)
+
+
+def test_member_digest_cache_follows_changed_contact_details():
+    member_id = 987654
+    verify = app.generate_verification_hash(EMAIL, PHONE)
+    assert app.verify_hash(EMAIL, PHONE, verify, member_id)
+    assert app.verify_hash(EMAIL, PHONE, verify, member_id)
+    assert not app.verify_hash("changed@example.com", PHONE, verify, member_id)
+    assert app.verify_hash("changed@example.com", PHONE,
+                           app.generate_verification_hash("changed@example.com", PHONE), member_id)
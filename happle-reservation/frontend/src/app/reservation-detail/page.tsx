@@ -3,7 +3,7 @@
 import { useEffect, useState, Suspense } from 'react'
 import { useSearchParams, useRouter } from 'next/navigation'
 import Link from 'next/link'
-import { getReservationDetail, cancelReservation, ReservationDetail } from '@/lib/api'
+import { getReservationDetail, getReservationSummary, cancelReservation, ReservationDetail } from '@/lib/api'
 
 function ReservationDetailContent() {
   const searchParams = useSearchParams()
@@ -75,14 +75,15 @@ function ReservationDetailContent() {
       if (result.success) {
         setCancelSuccess(true)
         setShowCancelConfirm(false)
-        // 予約情報を再取得
-        const refreshResult = await getReservationDetail(
+        // 予約ステータスを再取得（店舗・プログラム・レッスンは表示中のものを使う）
+        const refreshResult = await getReservationSummary(
           parseInt(reservationId),
           parseInt(memberId),
           verifyHash
         )
-        if (refreshResult.data) {
-          setDetail(refreshResult.data)
+        const summary = refreshResult.data
+        if (summary) {
+          setDetail(prev => (prev ? { ...prev, ...summary } : prev))
         }
       } else {
         alert(result.error || 'キャンセルに失敗しました')
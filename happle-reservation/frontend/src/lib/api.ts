@@ -558,6 +558,26 @@ export async function getReservationDetail(
   return { data: response.data }
 }
 
+// 予約とメンバー情報だけを取得（店舗・プログラム・レッスンを取得済みの画面でステータスを更新する場合に使う）
+export async function getReservationSummary(
+  reservationId: number,
+  memberId: number,
+  verify: string
+): Promise<{ data?: Pick<ReservationDetail, 'reservation' | 'member'>; error?: string; message?: string }> {
+  const params = new URLSearchParams({
+    member_id: memberId.toString(),
+    verify: verify,
+    minimal: '1'
+  })
+  const response = await fetchApi<Pick<ReservationDetail, 'reservation' | 'member'>>(
+    `/api/reservations/${reservationId}?${params.toString()}`
+  )
+  if (response.error) {
+    return { error: response.error, message: response.message }
+  }
+  return { data: response.data }
+}
+
 export async function cancelReservation(
   reservationId: number,
   memberId: number,